@@ -1,16 +1,97 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from typing import Optional
+import json
 import os
-import aiofiles
+import time
+import uuid
 from datetime import datetime
 
 from app.models.user import User
 from app.api.routes.auth import get_current_user
 from app.services.ai_service import ai_service
+from app.services.ai_cache import ai_result_cache
+from app.services.image_preprocess import image_preprocessor
+from app.services.pdf_ingest import pdf_ingestor
+from app.services.receipt_parser import receipt_parser
+from app.services.ai_jobs import (
+    ai_job_queue, accepted_response, serialize_job, JobContext, TERMINAL_STATUSES
+)
 from app.core.config import settings
+from app.core.database import get_database
+from app.core.uploads import save_upload
 
 router = APIRouter()
 
+# SSE akışında veritabanı yoklama aralığı ve bağlantıyı canlı tutma süresi
+JOB_EVENTS_POLL_SECONDS = 1.0
+JOB_EVENTS_KEEPALIVE_SECONDS = 15.0
+
+
+@ai_job_queue.handler("analyze_receipt")
+async def _analyze_receipt_job(ctx: JobContext):
+    payment_amount = ctx.payload.get("payment_amount")
+    await ctx.progress(10, "Dekont analiz ediliyor")
+    payment_info = {"amount": payment_amount} if payment_amount else None
+    return await ai_service.analyze_receipt(ctx.payload["file_path"], payment_info)
+
+
+async def _get_user_job(job_id: str, current_user: User):
+    job = await ai_job_queue.get(get_database(), job_id)
+    if not job or (job.get("created_by") != current_user.id and current_user.role != "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="İş bulunamadı"
+        )
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_ai_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Arka plan AI işinin durumunu getir"""
+    job = await _get_user_job(job_id, current_user)
+    return serialize_job(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_ai_job_events(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Arka plan AI işinin ilerlemesini SSE ile akıt (iş bitince akış kapanır)"""
+    job = await _get_user_job(job_id, current_user)
+
+    async def events():
+        current = job
+        last_state = None
+        last_sent = time.monotonic()
+        while current:
+            data = serialize_job(current)
+            state = (data["status"], data["progress"], data["stage"])
+            if state != last_state:
+                last_state = state
+                last_sent = time.monotonic()
+                payload = json.dumps(jsonable_encoder(data), ensure_ascii=False)
+                yield f"event: {data['status']}\ndata: {payload}\n\n"
+            elif time.monotonic() - last_sent >= JOB_EVENTS_KEEPALIVE_SECONDS:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+
+            if data["status"] in TERMINAL_STATUSES:
+                return
+            await ai_job_queue.wait_for_change(JOB_EVENTS_POLL_SECONDS)
+            current = await ai_job_queue.get(get_database(), job_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/health")
 async def ai_health_check():
     """AI servislerinin durumunu kontrol et"""
@@ -29,7 +110,11 @@ async def ai_health_check():
             "configuration": {
                 "api_key_configured": api_key_configured,
                 "api_key_length": len(settings.gemini_api_key) if settings.gemini_api_key else 0
-            }
+            },
+            "cache": ai_result_cache.stats(),
+            "image_preprocessing": image_preprocessor.stats(),
+            "pdf": pdf_ingestor.stats(),
+            "receipt_parser": receipt_parser.stats()
         }
     except Exception as e:
         return {
@@ -62,6 +147,7 @@ async def process_payment_description(
 async def analyze_receipt(
     file: UploadFile = File(...),
     payment_amount: Optional[float] = Form(None),
+    run_async: bool = Query(False, alias="async", description="Arka planda işle, iş kimliği döndür"),
     current_user: User = Depends(get_current_user)
 ):
     """Dekont/fatura görselini AI ile analiz et"""
@@ -79,22 +165,24 @@ async def analyze_receipt(
             detail="Sadece JPEG, PNG ve PDF dosyaları desteklenir"
         )
 
-    # Dosya boyutu kontrolü
-    if file.size > settings.max_file_size:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Dosya boyutu çok büyük (maksimum 10MB)"
-        )
-
     try:
         # Dosyayı geçici olarak kaydet
         file_extension = file.filename.split(".")[-1]
-        temp_filename = f"temp_receipt_{int(datetime.utcnow().timestamp())}.{file_extension}"
+        temp_filename = f"temp_receipt_{int(datetime.utcnow().timestamp())}_{uuid.uuid4().hex[:8]}.{file_extension}"
         temp_file_path = os.path.join(settings.upload_dir, temp_filename)
 
-        async with aiofiles.open(temp_file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        await save_upload(file, temp_file_path)
+
+        if run_async:
+            # Analiz worker'da yapılır; geçici dosyayı iş bitince kuyruk siler
+            job = await ai_job_queue.submit(
+                get_database(),
+                "analyze_receipt",
+                {"file_path": temp_file_path, "payment_amount": payment_amount},
+                current_user.id,
+                cleanup_files=[temp_file_path]
+            )
+            return accepted_response(job)
 
         # AI analizi
         payment_info = {"amount": payment_amount} if payment_amount else None
@@ -108,6 +196,8 @@ async def analyze_receipt(
 
         return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         # Geçici dosyayı temizle
         try:
@@ -146,9 +236,7 @@ async def analyze_check(
         temp_filename = f"temp_check_{int(datetime.utcnow().timestamp())}.{file_extension}"
         temp_file_path = os.path.join(settings.upload_dir, temp_filename)
 
-        async with aiofiles.open(temp_file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        await save_upload(file, temp_file_path)
 
         # AI analizi
         result = await ai_service.analyze_check(temp_file_path)
@@ -161,6 +249,8 @@ async def analyze_check(
 
         return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         # Geçici dosyayı temizle
         try:
@@ -5,25 +5,43 @@ from app.models.user import Token, UserCreate, User
 from app.core.security import verify_password, create_access_token, verify_token, get_password_hash
 from app.core.config import settings
 from app.core.database import get_database
+from app.core.user_cache import user_cache
 
 router = APIRouter()
 security = HTTPBearer()
 
+# Claims-only yolda User oluşturmak için token'da bulunması gereken alanlar
+USER_CLAIMS = ("uid", "role", "name", "created_at")
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
     """Get current authenticated user"""
-    db = get_database()
     payload = verify_token(credentials.credentials)
     username = payload.get("sub")
     
-    user_data = await db.users.find_one({"username": username})
-    if not user_data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
+    # İmzalı token'daki bilgilere güven (eski token'larda alanlar yoksa DB yoluna düş)
+    if settings.auth_trust_token_claims and all(claim in payload for claim in USER_CLAIMS):
+        return User(
+            _id=payload["uid"],
+            username=username,
+            name=payload["name"],
+            role=payload["role"],
+            created_at=payload["created_at"]
         )
     
-    # Convert ObjectId to string
-    user_data["_id"] = str(user_data["_id"])
+    user_data = user_cache.get(username)
+    if user_data is None:
+        db = get_database()
+        user_data = await db.users.find_one({"username": username}, {"password_hash": 0})
+        if not user_data:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        
+        # Convert ObjectId to string
+        user_data["_id"] = str(user_data["_id"])
+        user_cache.set(username, user_data)
+    
     return User(**user_data)
 
 async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
@@ -73,6 +91,7 @@ async def register(
     
     result = await db.users.insert_one(user_data)
     user_data["_id"] = str(result.inserted_id)
+    user_cache.invalidate(username)
     
     return User(**user_data)
 
@@ -90,8 +109,15 @@ async def login(username: str = Form(...), password: str = Form(...)):
         )
     
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
+    created_at = user.get("created_at")
     access_token = create_access_token(
-        data={"sub": user["username"], "role": user["role"]},
+        data={
+            "sub": user["username"],
+            "role": user["role"],
+            "uid": str(user["_id"]),
+            "name": user.get("name", user["username"]),
+            "created_at": created_at.isoformat() if hasattr(created_at, "isoformat") else created_at
+        },
         expires_delta=access_token_expires
     )
     
@@ -149,6 +175,8 @@ async def update_user_credentials(
         {"$set": update_data, "$currentDate": {"updated_at": True}}
     )
     
+    user_cache.invalidate(username, new_username)
+    
     if result.modified_count == 0:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 
 from app.models.bank_account import (
@@ -12,6 +12,10 @@ from app.models.bank_account import (
 from app.models.user import User
 from app.api.routes.auth import get_current_user
 from app.core.database import get_database
+from app.services.ledger_rollups import record_transaction
+from app.services.report_cache import bump_data_version
+from app.services.balance_service import adjust_bank_balance
+from app.services.balance_history import MAX_BALANCE_POINTS, balance_history, period_count, total_by_currency
 
 router = APIRouter()
 
@@ -51,6 +55,79 @@ async def get_bank_accounts_summary(
     
     return accounts
 
+def _history_range(start_date: Optional[datetime], end_date: Optional[datetime], granularity: str) -> Tuple[datetime, datetime]:
+    """Varsayılan aralık: son 30 gün"""
+    end_date = end_date or datetime.utcnow()
+    start_date = start_date or end_date - timedelta(days=30)
+    # Tarihler naive UTC saklanır
+    start_date, end_date = (
+        value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+        for value in (start_date, end_date)
+    )
+    if start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Başlangıç tarihi bitiş tarihinden sonra olamaz"
+        )
+    if period_count(start_date, end_date, granularity) > MAX_BALANCE_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Aralık en fazla {MAX_BALANCE_POINTS} nokta içerebilir, daha geniş bir periyot seçin"
+        )
+    return start_date, end_date
+
+@router.get("/balance-history")
+async def get_balance_history(
+    start_date: Optional[datetime] = Query(None, description="Başlangıç tarihi (varsayılan: 30 gün önce)"),
+    end_date: Optional[datetime] = Query(None, description="Bitiş tarihi (varsayılan: bugün)"),
+    granularity: str = Query("day", pattern="^(day|week|month)$", description="day, week veya month"),
+    current_user: User = Depends(get_current_user)
+):
+    """Tüm hesapların dönem sonu bakiyeleri ve para birimi bazında toplamlar"""
+    db = get_database()
+    start_date, end_date = _history_range(start_date, end_date, granularity)
+    
+    history = await balance_history(db, start_date, end_date, granularity)
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "granularity": granularity,
+        "accounts": history,
+        "totals": total_by_currency(history)
+    }
+
+@router.get("/{account_id}/balance-history")
+async def get_account_balance_history(
+    account_id: str,
+    start_date: Optional[datetime] = Query(None, description="Başlangıç tarihi (varsayılan: 30 gün önce)"),
+    end_date: Optional[datetime] = Query(None, description="Bitiş tarihi (varsayılan: bugün)"),
+    granularity: str = Query("day", pattern="^(day|week|month)$", description="day, week veya month"),
+    current_user: User = Depends(get_current_user)
+):
+    """Hesabın gün / hafta / ay sonu bakiyeleri"""
+    db = get_database()
+    
+    if not ObjectId.is_valid(account_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Geçersiz hesap ID"
+        )
+    
+    start_date, end_date = _history_range(start_date, end_date, granularity)
+    history = await balance_history(db, start_date, end_date, granularity, [account_id])
+    if not history:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hesap bulunamadı"
+        )
+    
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "granularity": granularity,
+        **history[0]
+    }
+
 @router.get("/{account_id}", response_model=BankAccount)
 async def get_bank_account(
     account_id: str,
@@ -107,6 +184,7 @@ async def create_bank_account(
     })
     
     result = await db.bank_accounts.insert_one(account_dict)
+    await bump_data_version(db, "bank_accounts")
     
     # Oluşturulan hesabı getir
     created_account = await db.bank_accounts.find_one({"_id": result.inserted_id})
@@ -151,6 +229,7 @@ async def update_bank_account(
             {"_id": ObjectId(account_id)},
             {"$set": update_data}
         )
+        await bump_data_version(db, "bank_accounts")
     
     # Güncellenmiş hesabı getir
     updated_account = await db.bank_accounts.find_one({"_id": ObjectId(account_id)})
@@ -190,6 +269,7 @@ async def delete_bank_account(
     # TODO: Bu hesapla ilgili işlemler varsa silmeyi engelle
     
     await db.bank_accounts.delete_one({"_id": ObjectId(account_id)})
+    await bump_data_version(db, "bank_accounts")
     
     return {"message": "Hesap başarıyla silindi"}
 
@@ -215,22 +295,14 @@ async def update_account_balance(
             detail="Geçersiz hesap ID"
         )
     
-    account = await db.bank_accounts.find_one({"_id": ObjectId(account_id)})
+    account = await adjust_bank_balance(db, account_id, amount)
     if not account:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Hesap bulunamadı"
         )
     
-    new_balance = account["current_balance"] + amount
-    
-    await db.bank_accounts.update_one(
-        {"_id": ObjectId(account_id)},
-        {"$set": {
-            "current_balance": new_balance,
-            "updated_at": datetime.utcnow()
-        }}
-    )
+    new_balance = account["current_balance"]
     
     # İşlem geçmişine kaydet (transactions collection)
     from app.models.transaction import TransactionCreate, TransactionType, TransactionStatus
@@ -261,10 +333,11 @@ async def update_account_balance(
     })
     
     transaction_result = await db.transactions.insert_one(transaction_dict)
+    await record_transaction(db, transaction_dict)
     
     return {
         "message": "Bakiye güncellendi ve işlem kaydedildi",
-        "old_balance": account["current_balance"],
+        "old_balance": new_balance - amount,
         "new_balance": new_balance,
         "amount": amount,
         "transaction_id": str(transaction_result.inserted_id)
@@ -329,6 +402,7 @@ async def recalculate_balance(
             "updated_at": datetime.utcnow()
         }}
     )
+    await bump_data_version(db, "bank_accounts")
     
     return {
         "message": "Bakiye yeniden hesaplandı",
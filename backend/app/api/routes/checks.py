@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query, File, UploadFile
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 from bson import ObjectId
 import os
-import aiofiles
+import uuid
 
 from app.models.check import (
     Check,
@@ -20,11 +20,46 @@ from app.models.check import (
 from app.models.user import User
 from app.api.routes.auth import get_current_user
 from app.core.database import get_database
+from app.core.uploads import save_upload
+from app.core.pagination import paginate
 from app.core.config import settings
 from app.services.ai_service import ai_service
+from app.services.ai_jobs import ai_job_queue, accepted_response, JobContext
+from app.services.balance_service import adjust_bank_balance
+from app.services.blob_store import release_file
 
 router = APIRouter()
 
+
+def _check_analysis_result(ai_result: dict) -> CheckAnalysisResult:
+    """AI çıktısını CheckAnalysisResult formatına dönüştür"""
+    if ai_result.get("success"):
+        return CheckAnalysisResult(
+            success=True,
+            extracted_amount=ai_result.get("amount"),
+            extracted_check_number=ai_result.get("check_number"),
+            extracted_bank=ai_result.get("bank_name"),
+            extracted_date=datetime.fromisoformat(ai_result.get("date")) if ai_result.get("date") else None,
+            extracted_due_date=datetime.fromisoformat(ai_result.get("due_date")) if ai_result.get("due_date") else None,
+            extracted_drawer=ai_result.get("drawer_name"),
+            extracted_payee=ai_result.get("payee_name"),
+            confidence_score=ai_result.get("confidence_score", 0.0),
+            raw_text=str(ai_result)
+        )
+    return CheckAnalysisResult(
+        success=False,
+        error_message=ai_result.get("error", "Çek analizi başarısız"),
+        confidence_score=0.0
+    )
+
+
+@ai_job_queue.handler("analyze_check_image")
+async def _analyze_check_image_job(ctx: JobContext):
+    await ctx.progress(10, "Çek görseli analiz ediliyor")
+    ai_result = await ai_service.analyze_check(ctx.payload["file_path"])
+    return _check_analysis_result(ai_result).model_dump(mode="json")
+
+
 def calculate_days_to_due(due_date: datetime) -> tuple[int, bool]:
     """Vadeye kaç gün kaldığını hesaplar"""
     today = date.today()
@@ -66,6 +101,8 @@ async def get_checks(
     due_soon: bool = Query(False, description="Yakın vadeli çekler (30 gün)"),
     limit: int = Query(50, le=100, description="Maksimum kayıt sayısı"),
     skip: int = Query(0, ge=0, description="Atlanacak kayıt sayısı"),
+    cursor: Optional[str] = Query(None, description="Sonraki sayfa imleci (X-Next-Cursor başlığı)"),
+    response: Response = None,
     current_user: User = Depends(get_current_user)
 ):
     """Çekleri listele"""
@@ -86,9 +123,9 @@ async def get_checks(
         filter_query["due_date"] = {"$gte": datetime.utcnow(), "$lte": future_date}
     
     checks = []
-    cursor = db.checks.find(filter_query).sort("due_date", 1).skip(skip).limit(limit)
+    docs = await paginate(db.checks, filter_query, "due_date", 1, limit, skip, cursor, response)
     
-    async for check in cursor:
+    for check in docs:
         check["_id"] = str(check["_id"])
         check = update_check_status(check)
         checks.append(Check(**check))
@@ -427,10 +464,10 @@ async def delete_check(
             detail="Bu çeke ait işlemler var. Önce işlemleri silmelisiniz."
         )
     
-    # Çek resmi varsa sil
+    # Çek resmi varsa referansını bırak
     if check.get("receipt_url"):
         try:
-            os.remove(check["receipt_url"])
+            await release_file(db, check["receipt_url"])
         except:
             pass
     
@@ -540,20 +577,12 @@ async def create_check_operation(
     # Banka hesabına para girişi (tahsil işlemlerinde)
     if operation_data.bank_account_id and operation_data.operation_type in ["cash", "early_cash"]:
         if ObjectId.is_valid(operation_data.bank_account_id):
-            bank_account = await db.bank_accounts.find_one({"_id": ObjectId(operation_data.bank_account_id)})
-            if bank_account:
-                cash_amount = operation_data.amount or check["amount"]
-                if operation_data.fees:
-                    cash_amount -= operation_data.fees
-                
-                new_balance = bank_account["current_balance"] + cash_amount
-                await db.bank_accounts.update_one(
-                    {"_id": ObjectId(operation_data.bank_account_id)},
-                    {"$set": {
-                        "current_balance": new_balance,
-                        "updated_at": now
-                    }}
-                )
+            cash_amount = operation_data.amount or check["amount"]
+            if operation_data.fees:
+                cash_amount -= operation_data.fees
+            
+            # Hesap yoksa güncelleme yapılmaz
+            await adjust_bank_balance(db, operation_data.bank_account_id, cash_amount)
     
     # Oluşturulan işlemi getir
     created_operation = await db.check_operations.find_one({"_id": result.inserted_id})
@@ -564,6 +593,7 @@ async def create_check_operation(
 @router.post("/analyze-image", response_model=CheckAnalysisResult)
 async def analyze_check_image(
     file: UploadFile = File(...),
+    run_async: bool = Query(False, alias="async", description="Arka planda işle, iş kimliği döndür"),
     current_user: User = Depends(get_current_user)
 ):
     """Çek resmini AI ile analiz et"""
@@ -581,22 +611,24 @@ async def analyze_check_image(
             detail="Sadece JPEG ve PNG dosyaları desteklenir"
         )
 
-    # Dosya boyutu kontrolü
-    if file.size > settings.max_file_size:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Dosya boyutu çok büyük (maksimum 10MB)"
-        )
-
     try:
         # Dosyayı geçici olarak kaydet
         file_extension = file.filename.split(".")[-1]
-        temp_filename = f"temp_check_{int(datetime.utcnow().timestamp())}.{file_extension}"
+        temp_filename = f"temp_check_{int(datetime.utcnow().timestamp())}_{uuid.uuid4().hex[:8]}.{file_extension}"
         temp_file_path = os.path.join(settings.upload_dir, temp_filename)
 
-        async with aiofiles.open(temp_file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        await save_upload(file, temp_file_path)
+
+        if run_async:
+            # Analiz worker'da yapılır; geçici dosyayı iş bitince kuyruk siler
+            job = await ai_job_queue.submit(
+                get_database(),
+                "analyze_check_image",
+                {"file_path": temp_file_path},
+                current_user.id,
+                cleanup_files=[temp_file_path]
+            )
+            return accepted_response(job)
 
         # AI analizi
         ai_result = await ai_service.analyze_check(temp_file_path)
@@ -607,29 +639,10 @@ async def analyze_check_image(
         except:
             pass
 
-        # Sonucu CheckAnalysisResult formatına dönüştür
-        if ai_result.get("success"):
-            result = CheckAnalysisResult(
-                success=True,
-                extracted_amount=ai_result.get("amount"),
-                extracted_check_number=ai_result.get("check_number"),
-                extracted_bank=ai_result.get("bank_name"),
-                extracted_date=datetime.fromisoformat(ai_result.get("date")) if ai_result.get("date") else None,
-                extracted_due_date=datetime.fromisoformat(ai_result.get("due_date")) if ai_result.get("due_date") else None,
-                extracted_drawer=ai_result.get("drawer_name"),
-                extracted_payee=ai_result.get("payee_name"),
-                confidence_score=ai_result.get("confidence_score", 0.0),
-                raw_text=str(ai_result)
-            )
-        else:
-            result = CheckAnalysisResult(
-                success=False,
-                error_message=ai_result.get("error", "Çek analizi başarısız"),
-                confidence_score=0.0
-            )
-
-        return result
+        return _check_analysis_result(ai_result)
 
+    except HTTPException:
+        raise
     except Exception as e:
         # Geçici dosyayı temizle
         try:
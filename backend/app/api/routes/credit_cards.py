@@ -17,6 +17,7 @@ from app.models.credit_card import (
 from app.models.user import User
 from app.api.routes.auth import get_current_user
 from app.core.database import get_database
+from app.services.balance_service import charge_credit_card, pay_credit_card
 
 router = APIRouter()
 
@@ -352,14 +353,6 @@ async def create_card_transaction(
             detail="Kredi kartı bulunamadı"
         )
     
-    # Limit kontrolü
-    new_used_amount = card["used_amount"] + transaction_data.amount
-    if new_used_amount > card["limit"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Limit aşımı! Mevcut limit: {card['limit']}, Kullanılan: {card['used_amount']}, Yeni işlem: {transaction_data.amount}"
-        )
-    
     now = datetime.utcnow()
     
     # Taksit tutarını hesapla
@@ -373,20 +366,17 @@ async def create_card_transaction(
         "updated_at": now
     })
     
-    # İşlemi kaydet
-    result = await db.credit_card_transactions.insert_one(transaction_dict)
-    
-    # Kredi kartının kullanılan tutarını güncelle
-    await db.credit_cards.update_one(
-        {"_id": ObjectId(card_id)},
-        {"$set": {
-            "used_amount": new_used_amount,
-            "updated_at": now
-        }}
-    )
+    # Limit kontrolü, kullanılan tutarın artırılması ve işlemin kaydı (tek oturumda)
+    transaction_id = await charge_credit_card(db, card_id, transaction_data.amount, transaction_dict)
+    if transaction_id is None:
+        card = await db.credit_cards.find_one({"_id": ObjectId(card_id)}) or card
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Limit aşımı! Mevcut limit: {card['limit']}, Kullanılan: {card['used_amount']}, Yeni işlem: {transaction_data.amount}"
+        )
     
     # Oluşturulan işlemi getir
-    created_transaction = await db.credit_card_transactions.find_one({"_id": result.inserted_id})
+    created_transaction = await db.credit_card_transactions.find_one({"_id": transaction_id})
     created_transaction["_id"] = str(created_transaction["_id"])
     
     return CreditCardTransaction(**created_transaction)
@@ -420,13 +410,6 @@ async def create_card_payment(
             detail="Kredi kartı bulunamadı"
         )
     
-    # Ödeme tutarı kontrolü
-    if payment_data.amount > card["used_amount"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Ödeme tutarı kullanılan tutardan fazla olamaz. Kullanılan: {card['used_amount']}"
-        )
-    
     now = datetime.utcnow()
     
     payment_dict = payment_data.model_dump()
@@ -435,35 +418,21 @@ async def create_card_payment(
         "created_at": now
     })
     
-    # Ödemeyi kaydet
-    result = await db.credit_card_payments.insert_one(payment_dict)
-    
-    # Kredi kartının kullanılan tutarını güncelle
-    new_used_amount = card["used_amount"] - payment_data.amount
-    await db.credit_cards.update_one(
-        {"_id": ObjectId(card_id)},
-        {"$set": {
-            "used_amount": new_used_amount,
-            "updated_at": now
-        }}
-    )
-    
     # Banka hesabından para çıkışı (eğer belirtilmişse)
-    if payment_data.bank_account_id:
-        if ObjectId.is_valid(payment_data.bank_account_id):
-            bank_account = await db.bank_accounts.find_one({"_id": ObjectId(payment_data.bank_account_id)})
-            if bank_account:
-                new_balance = bank_account["current_balance"] - payment_data.amount
-                await db.bank_accounts.update_one(
-                    {"_id": ObjectId(payment_data.bank_account_id)},
-                    {"$set": {
-                        "current_balance": new_balance,
-                        "updated_at": now
-                    }}
-                )
+    bank_account_id = payment_data.bank_account_id if payment_data.bank_account_id and ObjectId.is_valid(payment_data.bank_account_id) else None
+    
+    # Ödeme tutarı kontrolü, kullanılan tutarın düşülmesi, ödemenin kaydı ve
+    # banka çıkışı (tek oturumda)
+    payment_id = await pay_credit_card(db, card_id, payment_data.amount, payment_dict, bank_account_id=bank_account_id)
+    if payment_id is None:
+        card = await db.credit_cards.find_one({"_id": ObjectId(card_id)}) or card
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ödeme tutarı kullanılan tutardan fazla olamaz. Kullanılan: {card['used_amount']}"
+        )
     
     # Oluşturulan ödemeyi getir
-    created_payment = await db.credit_card_payments.find_one({"_id": result.inserted_id})
+    created_payment = await db.credit_card_payments.find_one({"_id": payment_id})
     created_payment["_id"] = str(created_payment["_id"])
     
     return CreditCardPayment(**created_payment)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 from bson import ObjectId
@@ -18,6 +18,8 @@ from app.models.debt import (
 from app.models.user import User
 from app.api.routes.auth import get_current_user
 from app.core.database import get_database
+from app.core.pagination import paginate
+from app.services.balance_service import pay_debt
 
 router = APIRouter()
 
@@ -61,6 +63,8 @@ async def get_debts(
     overdue_only: bool = Query(False, description="Sadece vadesi geçmiş borçlar"),
     limit: int = Query(50, le=100, description="Maksimum kayıt sayısı"),
     skip: int = Query(0, ge=0, description="Atlanacak kayıt sayısı"),
+    cursor: Optional[str] = Query(None, description="Sonraki sayfa imleci (X-Next-Cursor başlığı)"),
+    response: Response = None,
     current_user: User = Depends(get_current_user)
 ):
     """Borçları listele"""
@@ -78,9 +82,9 @@ async def get_debts(
         filter_query["due_date"] = {"$lt": datetime.utcnow()}
     
     debts = []
-    cursor = db.debts.find(filter_query).sort("due_date", 1).skip(skip).limit(limit)
+    docs = await paginate(db.debts, filter_query, "due_date", 1, limit, skip, cursor, response)
     
-    async for debt in cursor:
+    for debt in docs:
         debt["_id"] = str(debt["_id"])
         debt = update_debt_status(debt)
         debts.append(Debt(**debt))
@@ -438,14 +442,6 @@ async def create_debt_payment(
             detail="Borç bulunamadı"
         )
     
-    # Ödeme tutarı kontrolü
-    remaining_amount = debt["amount"] - debt.get("paid_amount", 0)
-    if payment_data.amount > remaining_amount:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Ödeme tutarı kalan tutardan fazla olamaz. Kalan: {remaining_amount}"
-        )
-    
     now = datetime.utcnow()
     
     payment_dict = payment_data.model_dump()
@@ -454,51 +450,33 @@ async def create_debt_payment(
         "created_at": now
     })
     
-    # Ödemeyi kaydet
-    result = await db.debt_payments.insert_one(payment_dict)
-    
-    # Borcun ödenen tutarını güncelle
-    new_paid_amount = debt.get("paid_amount", 0) + payment_data.amount
-    new_payment_count = debt.get("payment_count", 0) + 1
-    
-    await db.debts.update_one(
-        {"_id": ObjectId(debt_id)},
-        {"$set": {
-            "paid_amount": new_paid_amount,
-            "last_payment_date": payment_data.payment_date,
-            "payment_count": new_payment_count,
-            "updated_at": now
-        }}
-    )
-    
     # Banka hesabından para çıkışı (eğer belirtilmişse)
-    if payment_data.bank_account_id:
-        if ObjectId.is_valid(payment_data.bank_account_id):
-            bank_account = await db.bank_accounts.find_one({"_id": ObjectId(payment_data.bank_account_id)})
-            if bank_account:
-                new_balance = bank_account["current_balance"] - payment_data.amount
-                await db.bank_accounts.update_one(
-                    {"_id": ObjectId(payment_data.bank_account_id)},
-                    {"$set": {
-                        "current_balance": new_balance,
-                        "updated_at": now
-                    }}
-                )
-    
-    # Borç durumunu güncelle
-    updated_debt = await db.debts.find_one({"_id": ObjectId(debt_id)})
-    updated_debt = update_debt_status(updated_debt)
-    
-    await db.debts.update_one(
-        {"_id": ObjectId(debt_id)},
-        {"$set": {
-            "status": updated_debt["status"],
-            "remaining_amount": updated_debt["remaining_amount"]
-        }}
+    bank_account_id = payment_data.bank_account_id if payment_data.bank_account_id and ObjectId.is_valid(payment_data.bank_account_id) else None
+    
+    def status_fields(updated: dict) -> dict:
+        """Borç durumunu güncelle"""
+        updated = update_debt_status(dict(updated))
+        return {"status": updated["status"], "remaining_amount": updated["remaining_amount"]}
+    
+    # Ödeme tutarı kontrolü, ödenen tutarın artırılması, ödemenin kaydı, banka
+    # çıkışı ve borç durumu (tek oturumda)
+    paid = await pay_debt(
+        db, debt_id, payment_data.amount, payment_dict,
+        extra_set={"last_payment_date": payment_data.payment_date},
+        bank_account_id=bank_account_id,
+        status_fields=status_fields
     )
+    if paid is None:
+        debt = await db.debts.find_one({"_id": ObjectId(debt_id)}) or debt
+        remaining_amount = debt["amount"] - debt.get("paid_amount", 0)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ödeme tutarı kalan tutardan fazla olamaz. Kalan: {remaining_amount}"
+        )
+    _, payment_id = paid
     
     # Oluşturulan ödemeyi getir
-    created_payment = await db.debt_payments.find_one({"_id": result.inserted_id})
+    created_payment = await db.debt_payments.find_one({"_id": payment_id})
     created_payment["_id"] = str(created_payment["_id"])
     
     return DebtPayment(**created_payment)
\ No newline at end of file
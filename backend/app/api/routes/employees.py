@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
 from typing import List, Optional
 import os
-import aiofiles
 import logging
 from datetime import datetime, timedelta
 from bson import ObjectId
@@ -15,6 +14,7 @@ from app.models.employee import (
 from app.api.routes.auth import get_current_user
 from app.core.database import get_database
 from app.core.config import settings
+from app.services.blob_store import release_file, store_upload
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -417,23 +417,10 @@ async def upload_employee_document(
                 detail="Sadece JPG, PNG ve PDF dosyaları desteklenir"
             )
         
-        if file.size > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Dosya boyutu 10MB'dan büyük olamaz"
-            )
-        
-        # Dosyayı kaydet
+        # Dosyayı içerik adresli depoya kaydet (aynı belge tek kopya tutulur)
         file_extension = file.filename.split(".")[-1]
         filename = f"employee_{employee_id}_{document_type}_{int(datetime.utcnow().timestamp())}.{file_extension}"
-        file_path = os.path.join("uploads/employee_documents", filename)
-        
-        # Klasörü oluştur
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        file_path = await store_upload(db, file, file_extension)
         
         # Belge kaydını oluştur
         document = EmployeeDocument(
@@ -459,10 +446,10 @@ async def upload_employee_document(
         raise
     except Exception as e:
         logger.error(f"Belge yüklenirken hata: {e}")
-        # Hata durumunda dosyayı sil
+        # Hata durumunda dosya referansını bırak
         try:
             if 'file_path' in locals():
-                os.remove(file_path)
+                await release_file(db, file_path)
         except:
             pass
         
@@ -667,11 +654,11 @@ async def delete_employee_document(
                 detail="Belge bulunamadı"
             )
         
-        # Dosyayı sil
+        # Dosya referansını bırak
         file_path = document_to_remove.get("file_path")
-        if file_path and os.path.exists(file_path):
+        if file_path:
             try:
-                os.remove(file_path)
+                await release_file(db, file_path)
             except Exception as e:
                 logger.error(f"Dosya silinirken hata: {e}")
         
@@ -723,11 +710,10 @@ async def delete_employee(
                 detail="Çalışan bulunamadı"
             )
         
-        # Belgelerini sil
+        # Belge referanslarını bırak
         for document in employee.get("documents", []):
             try:
-                if os.path.exists(document["file_path"]):
-                    os.remove(document["file_path"])
+                await release_file(db, document["file_path"])
             except:
                 pass
         
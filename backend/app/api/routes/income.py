@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from typing import List, Optional
 from datetime import datetime, timedelta
 from bson import ObjectId
@@ -23,6 +23,7 @@ from app.models.income import (
 from app.models.user import User
 from app.api.routes.auth import get_current_user
 from app.core.database import get_database
+from app.core.pagination import paginate
 
 router = APIRouter()
 
@@ -513,6 +514,8 @@ async def get_income_records(
     end_date: Optional[datetime] = Query(None, description="Bitiş tarihi"),
     limit: int = Query(50, le=100, description="Maksimum kayıt sayısı"),
     skip: int = Query(0, ge=0, description="Atlanacak kayıt sayısı"),
+    cursor: Optional[str] = Query(None, description="Sonraki sayfa imleci (X-Next-Cursor başlığı)"),
+    response: Response = None,
     current_user: User = Depends(get_current_user)
 ):
     """Gelir kayıtlarını listele"""
@@ -533,9 +536,9 @@ async def get_income_records(
         filter_query["expected_date"] = date_filter
     
     records = []
-    cursor = db.income_records.find(filter_query).sort("expected_date", -1).skip(skip).limit(limit)
+    docs = await paginate(db.income_records, filter_query, "expected_date", -1, limit, skip, cursor, response)
     
-    async for record in cursor:
+    for record in docs:
         record["_id"] = str(record["_id"])
         records.append(IncomeRecord(**record))
     
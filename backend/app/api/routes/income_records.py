@@ -1,7 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, Response, status, File, UploadFile, Form
 from typing import List, Optional
-import os
-import aiofiles
 import logging
 from datetime import datetime, timedelta
 from bson import ObjectId
@@ -13,7 +11,12 @@ from app.models.income_record import (
 )
 from app.api.routes.auth import get_current_user
 from app.core.database import get_database
+from app.core.pagination import paginate
 from app.core.config import settings
+from app.services.ledger_rollups import record_transaction
+from app.services.report_cache import bump_data_version
+from app.services.balance_service import adjust_bank_balance
+from app.services.blob_store import release_file, store_upload
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -80,24 +83,8 @@ async def create_income_record(
                     detail="Sadece JPG, PNG ve PDF dosyaları desteklenir"
                 )
             
-            # Dosya boyutu kontrolü (10MB)
-            if receipt_file.size > 10 * 1024 * 1024:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Dosya boyutu 10MB'dan büyük olamaz"
-                )
-            
-            # Dosyayı kaydet
-            file_extension = receipt_file.filename.split(".")[-1]
-            filename = f"income_receipt_{int(datetime.utcnow().timestamp())}.{file_extension}"
-            file_path = os.path.join("uploads/income_receipts", filename)
-            
-            # Klasörü oluştur
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            
-            async with aiofiles.open(file_path, 'wb') as f:
-                content = await receipt_file.read()
-                await f.write(content)
+            # Dosyayı içerik adresli depoya kaydet (aynı dekont tek kopya tutulur)
+            file_path = await store_upload(db, receipt_file)
         
         # Gelir kaydını oluştur
         try:
@@ -187,10 +174,10 @@ async def create_income_record(
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         
-        # Hata durumunda dosyayı sil
-        if file_path and os.path.exists(file_path):
+        # Hata durumunda dosya referansını bırak
+        if file_path:
             try:
-                os.remove(file_path)
+                await release_file(db, file_path)
             except:
                 pass
         
@@ -207,6 +194,8 @@ async def get_income_records(
     end_date: Optional[str] = None,
     limit: int = 50,
     skip: int = 0,
+    cursor: Optional[str] = None,
+    response: Response = None,
     current_user: User = Depends(get_current_user)
 ):
     """Gelir kayıtlarını listele"""
@@ -230,10 +219,10 @@ async def get_income_records(
             }
         
         # Kayıtları getir
-        cursor = db.income_records.find(query).sort("created_at", -1).skip(skip).limit(limit)
+        docs = await paginate(db.income_records, query, "created_at", -1, limit, skip, cursor, response)
         records = []
         
-        async for record in cursor:
+        for record in docs:
             # Banka hesabı bilgisini getir
             bank_account = await db.bank_accounts.find_one({"_id": ObjectId(record["bank_account_id"])})
             bank_account_name = bank_account.get("bank_name", "Bilinmiyor") if bank_account else "Bilinmiyor"
@@ -253,6 +242,8 @@ async def get_income_records(
         
         return records
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -351,26 +342,34 @@ async def get_income_statistics(
                 "payment_count": company["payment_count"]
             })
         
-        # Aylık trend (son 6 ay)
+        # Aylık trend (son 6 ay) - tek gruplama sorgusu
+        month_starts = [current_month_start]
+        for _ in range(5):
+            month_starts.insert(0, (month_starts[0] - timedelta(days=1)).replace(day=1))
+        
+        month_pipeline = [
+            {
+                "$match": {
+                    "status": IncomeRecordStatus.VERIFIED.value,
+                    "income_date": {"$gte": month_starts[0]}
+                }
+            },
+            {
+                "$group": {
+                    "_id": {"$dateToString": {"format": "%Y-%m", "date": "$income_date"}},
+                    "total": {"$sum": "$amount"},
+                    "count": {"$sum": 1}
+                }
+            }
+        ]
+        month_totals = {doc["_id"]: doc async for doc in db.income_records.aggregate(month_pipeline)}
+        
         monthly_trend = []
-        for i in range(6):
-            month_start = (now.replace(day=1) - timedelta(days=i*30)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(seconds=1)
-            
-            month_pipeline = [
-                {
-                    "$match": {
-                        "status": IncomeRecordStatus.VERIFIED.value,
-                        "income_date": {"$gte": month_start, "$lte": month_end}
-                    }
-                },
-                {"$group": {"_id": None, "total": {"$sum": "$amount"}, "count": {"$sum": 1}}}
-            ]
-            month_result = await db.income_records.aggregate(month_pipeline).to_list(1)
-            month_data = month_result[0] if month_result else {"total": 0, "count": 0}
-            
-            monthly_trend.insert(0, {
-                "month": month_start.strftime("%Y-%m"),
+        for month_start in month_starts:
+            month_key = month_start.strftime("%Y-%m")
+            month_data = month_totals.get(month_key, {"total": 0, "count": 0})
+            monthly_trend.append({
+                "month": month_key,
                 "total_amount": month_data["total"],
                 "record_count": month_data["count"]
             })
@@ -542,10 +541,10 @@ async def delete_income_record(
                 detail="Onaylanmış kayıtları silmek için admin yetkisi gerekli"
             )
         
-        # Dosyayı sil
-        if record.get("receipt_file") and os.path.exists(record["receipt_file"]):
+        # Dosya referansını bırak
+        if record.get("receipt_file"):
             try:
-                os.remove(record["receipt_file"])
+                await release_file(db, record["receipt_file"])
             except:
                 pass
         
@@ -567,30 +566,16 @@ async def update_bank_account_balance(db, bank_account_id: str, amount: float, c
     try:
         logger.info(f"Updating bank account balance: account_id={bank_account_id}, amount={amount}, currency={currency}")
         
-        # Banka hesabını getir
-        bank_account = await db.bank_accounts.find_one({"_id": ObjectId(bank_account_id)})
-        if not bank_account:
-            logger.warning(f"Bank account not found: {bank_account_id}")
-            return
-        
-        logger.info(f"Current bank account: {bank_account.get('bank_name', 'Unknown')}, current_balance={bank_account.get('current_balance', 0)}, currency={bank_account.get('currency', 'Unknown')}")
-        
         # Aynı para birimindeyse direkt ekle, değilse dönüştürme gerekli
-        if bank_account.get("currency") == currency:
-            old_balance = bank_account.get("current_balance", 0)
-            new_balance = old_balance + amount
-            logger.info(f"Updating balance from {old_balance} to {new_balance}")
-            
-            result = await db.bank_accounts.update_one(
-                {"_id": ObjectId(bank_account_id)},
-                {"$set": {"current_balance": new_balance}}
-            )
-            
-            if result.modified_count > 0:
-                logger.info(f"Bank account balance updated successfully")
-            else:
-                logger.warning(f"Bank account balance update failed - no documents modified")
+        updated_account = await adjust_bank_balance(db, bank_account_id, amount, currency=currency)
+        if updated_account:
+            new_balance = updated_account.get("current_balance", 0)
+            logger.info(f"Bank account balance updated from {new_balance - amount} to {new_balance}")
         else:
+            bank_account = await db.bank_accounts.find_one({"_id": ObjectId(bank_account_id)}, {"currency": 1})
+            if not bank_account:
+                logger.warning(f"Bank account not found: {bank_account_id}")
+                return
             logger.warning(f"Currency mismatch: bank account currency {bank_account.get('currency')} vs income currency {currency}")
         
         # TODO: Farklı para birimleri için döviz çevirme mantığı eklenebilir
@@ -636,6 +621,7 @@ async def create_income_transaction(db, income_record, income_record_id, created
                 }
                 
                 person_result = await db.people.insert_one(person_data)
+                await bump_data_version(db, "people")
                 person_id = str(person_result.inserted_id)
         
         # Transaction kaydı oluştur
@@ -660,6 +646,7 @@ async def create_income_transaction(db, income_record, income_record_id, created
         }
         
         result = await db.transactions.insert_one(transaction_data)
+        await record_transaction(db, transaction_data)
         logger.info(f"Income transaction created: {result.inserted_id}")
         return result.inserted_id
         
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 from bson import ObjectId
 
 from app.models.notification import (
@@ -12,18 +12,18 @@ from app.models.notification import (
     NotificationStats,
     NotificationPreferences,
     NotificationType,
-    NotificationPriority,
-    NotificationStatus,
-    NotificationChannel
+    NotificationStatus
 )
 from app.models.user import User
-from app.api.routes.auth import get_current_user
+from app.api.routes.auth import get_current_user, get_admin_user
 from app.core.database import get_database
+from app.core.pagination import paginate
 from app.core.errors import (
     validate_object_id,
     raise_not_found,
     raise_bad_request
 )
+from app.services.notification_delivery import notification_delivery
 
 router = APIRouter()
 
@@ -34,6 +34,8 @@ async def get_notifications(
     unread_only: bool = Query(False, description="Sadece okunmamışlar"),
     limit: int = Query(50, le=100, description="Maksimum kayıt sayısı"),
     skip: int = Query(0, ge=0, description="Atlanacak kayıt sayısı"),
+    cursor: Optional[str] = Query(None, description="Sonraki sayfa imleci (X-Next-Cursor başlığı)"),
+    response: Response = None,
     current_user: User = Depends(get_current_user)
 ):
     """Kullanıcının bildirimlerini listele"""
@@ -50,9 +52,9 @@ async def get_notifications(
         filter_query["read_at"] = None
     
     notifications = []
-    cursor = db.notifications.find(filter_query).sort("created_at", -1).skip(skip).limit(limit)
+    docs = await paginate(db.notifications, filter_query, "created_at", -1, limit, skip, cursor, response)
     
-    async for notification in cursor:
+    for notification in docs:
         summary = NotificationSummary(
             id=str(notification["_id"]),
             title=notification["title"],
@@ -151,7 +153,6 @@ async def get_notification_stats(
 @router.post("/", response_model=Notification)
 async def create_notification(
     notification_data: NotificationCreate,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """Yeni bildirim oluştur"""
@@ -168,12 +169,9 @@ async def create_notification(
     
     result = await db.notifications.insert_one(notification_dict)
     
-    # Background task ile bildirim gönder
-    background_tasks.add_task(
-        send_notification,
-        str(result.inserted_id),
-        notification_data.channels
-    )
+    # Dış kanallar (e-posta, SMS, push) outbox üzerinden arka planda gönderilir
+    notification_dict["_id"] = result.inserted_id
+    await notification_delivery.enqueue(db, [notification_dict])
     
     # Oluşturulan bildirimi getir
     created_notification = await db.notifications.find_one({"_id": result.inserted_id})
@@ -288,6 +286,13 @@ async def delete_notification(
     
     return {"message": "Bildirim silindi"}
 
+@router.get("/delivery/stats")
+async def get_delivery_stats(
+    current_user: User = Depends(get_admin_user)
+):
+    """Kanal bazında bildirim gönderim kuyruğu durumu (admin)"""
+    return await notification_delivery.stats(get_database())
+
 @router.get("/preferences", response_model=NotificationPreferences)
 async def get_notification_preferences(
     current_user: User = Depends(get_current_user)
@@ -327,110 +332,3 @@ async def update_notification_preferences(
     )
     
     return preferences_data
-
-# Background task functions
-async def send_notification(notification_id: str, channels: List[NotificationChannel]):
-    """Bildirimi gönder (background task)"""
-    db = get_database()
-    
-    try:
-        notification = await db.notifications.find_one({"_id": ObjectId(notification_id)})
-        if not notification:
-            return
-        
-        success = True
-        errors = []
-        
-        # Her kanal için gönderim yap
-        for channel in channels:
-            try:
-                if channel == NotificationChannel.IN_APP:
-                    # In-app notification already stored in database
-                    pass
-                elif channel == NotificationChannel.EMAIL:
-                    await send_email_notification(notification)
-                elif channel == NotificationChannel.SMS:
-                    await send_sms_notification(notification)
-                elif channel == NotificationChannel.PUSH:
-                    await send_push_notification(notification)
-            except Exception as e:
-                success = False
-                errors.append(f"{channel}: {str(e)}")
-        
-        # Update notification status
-        now = datetime.utcnow()
-        update_data = {
-            "sent_at": now,
-            "delivery_attempts": notification.get("delivery_attempts", 0) + 1,
-            "last_delivery_attempt": now,
-            "updated_at": now
-        }
-        
-        if success:
-            update_data["status"] = NotificationStatus.SENT
-        else:
-            update_data["status"] = NotificationStatus.FAILED
-            update_data["delivery_errors"] = notification.get("delivery_errors", []) + errors
-        
-        await db.notifications.update_one(
-            {"_id": ObjectId(notification_id)},
-            {"$set": update_data}
-        )
-        
-    except Exception as e:
-        # Log error
-        print(f"Error sending notification {notification_id}: {e}")
-
-async def send_email_notification(notification: dict):
-    """E-posta bildirimi gönder"""
-    # E-posta gönderim implementasyonu
-    # Bu kısım gerçek e-posta servisi ile entegre edilebilir
-    print(f"Email notification sent: {notification['title']}")
-
-async def send_sms_notification(notification: dict):
-    """SMS bildirimi gönder"""
-    # SMS gönderim implementasyonu
-    print(f"SMS notification sent: {notification['title']}")
-
-async def send_push_notification(notification: dict):
-    """Push bildirimi gönder"""
-    # Push notification gönderim implementasyonu
-    print(f"Push notification sent: {notification['title']}")
-
-# Scheduler functions for automated notifications
-async def create_payment_due_notifications():
-    """Vade yaklaşan ödemeler için bildirim oluştur"""
-    db = get_database()
-    
-    # 3 gün sonrası vade olan ödeme emirleri
-    three_days_later = datetime.utcnow() + timedelta(days=3)
-    due_payments = db.payment_orders.find({
-        "status": "approved",
-        "due_date": {
-            "$gte": datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0),
-            "$lte": three_days_later.replace(hour=23, minute=59, second=59, microsecond=999999)
-        }
-    })
-    
-    async for payment in due_payments:
-        # Check if notification already exists
-        existing = await db.notifications.find_one({
-            "type": NotificationType.PAYMENT_DUE,
-            "related_entity_id": str(payment["_id"]),
-            "user_id": payment["created_by"]
-        })
-        
-        if not existing:
-            notification_data = NotificationCreate(
-                title="Ödeme Vadesi Yaklaşıyor",
-                message=f"{payment['recipient_name']} için {payment['amount']} TL ödeme vadesi yaklaşıyor.",
-                type=NotificationType.PAYMENT_DUE,
-                priority=NotificationPriority.HIGH,
-                user_id=payment["created_by"],
-                related_entity_type="payment_order",
-                related_entity_id=str(payment["_id"]),
-                action_url=f"/payment-orders/{payment['_id']}",
-                action_text="Detayları Görüntüle"
-            )
-            
-            await db.notifications.insert_one(notification_data.model_dump())
\ No newline at end of file
@@ -1,9 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query, File, UploadFile, Form
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 import os
-import aiofiles
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,13 +18,16 @@ from app.models.payment_order import (
 from app.models.user import User
 from app.api.routes.auth import get_current_user, get_admin_user, get_user_or_admin
 from app.core.database import get_database
-from app.core.config import settings
+from app.core.uploads import save_upload
+from app.core.pagination import paginate
 from app.services.ai_service import ai_service
+from app.services.ai_jobs import ai_job_queue, accepted_response, JobContext
+from app.services.balance_service import settle_payment_order
+from app.services.blob_store import release_file, store_file, store_upload
 from app.core.errors import (
     StandardErrors, 
     validate_object_id, 
     validate_admin_role,
-    validate_file_size,
     validate_file_type,
     sanitize_filename,
     validate_file_content,
@@ -60,6 +62,8 @@ async def get_payment_orders(
     category: Optional[PaymentCategory] = Query(None, description="Kategoriye göre filtrele"),
     limit: int = Query(50, le=100, description="Maksimum kayıt sayısı"),
     skip: int = Query(0, ge=0, description="Atlanacak kayıt sayısı"),
+    cursor: Optional[str] = Query(None, description="Sonraki sayfa imleci (X-Next-Cursor başlığı)"),
+    response: Response = None,
     current_user: User = Depends(get_current_user)
 ):
     """Ödeme emirlerini listele"""
@@ -77,9 +81,9 @@ async def get_payment_orders(
         filter_query["created_by"] = current_user.id
     
     orders = []
-    cursor = db.payment_orders.find(filter_query).sort("created_at", -1).skip(skip).limit(limit)
+    docs = await paginate(db.payment_orders, filter_query, "created_at", -1, limit, skip, cursor, response)
     
-    async for order in cursor:
+    for order in docs:
         order["_id"] = str(order["_id"])
         orders.append(PaymentOrder(**order))
     
@@ -425,37 +429,9 @@ async def complete_payment_order(
             detail="Banka hesabı bulunamadı"
         )
     
-    # Bakiye kontrolü
-    if bank_account["current_balance"] < order["amount"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Yetersiz bakiye"
-        )
-    
     # İşlemi tamamla
     now = datetime.utcnow()
     
-    # Ödeme emrini güncelle
-    await db.payment_orders.update_one(
-        {"_id": ObjectId(order_id)},
-        {"$set": {
-            "status": PaymentStatus.COMPLETED,
-            "bank_account_id": bank_account_id,
-            "completed_at": now,
-            "updated_at": now
-        }}
-    )
-    
-    # Banka hesabı bakiyesini güncelle
-    new_balance = bank_account["current_balance"] - order["amount"]
-    await db.bank_accounts.update_one(
-        {"_id": ObjectId(bank_account_id)},
-        {"$set": {
-            "current_balance": new_balance,
-            "updated_at": now
-        }}
-    )
-    
     # Transaction kaydı oluştur
     from app.models.transaction import TransactionCreate, TransactionType, TransactionStatus
     
@@ -487,7 +463,20 @@ async def complete_payment_order(
         "updated_at": now
     })
     
-    transaction_result = await db.transactions.insert_one(transaction_dict)
+    # Emri sahiplen, bakiyeyi düş ve işlemi kaydet (tek adımda)
+    updated_account, transaction_id = await settle_payment_order(
+        db,
+        order_id,
+        [PaymentStatus.APPROVED],
+        bank_account_id,
+        float(order["amount"]),
+        {
+            "bank_account_id": bank_account_id,
+            "completed_at": now,
+            "updated_at": now
+        },
+        transaction_dict
+    )
     
     # Kişi/kurum ödeme detayı ekle (eğer kişi ID varsa)
     if order.get("person_id"):
@@ -501,7 +490,7 @@ async def complete_payment_order(
             description=f"Ödeme Emri: {order['description']}",
             payment_date=now.isoformat(),
             bank_account_id=bank_account_id,
-            transaction_id=str(transaction_result.inserted_id),
+            transaction_id=str(transaction_id),
             payment_order_id=order_id,
             receipt_urls=[order.get("receipt_url")] if order.get("receipt_url") else []
         )
@@ -517,15 +506,92 @@ async def complete_payment_order(
     
     return {
         "message": "Ödeme tamamlandı", 
-        "new_balance": new_balance,
-        "transaction_id": str(transaction_result.inserted_id)
+        "new_balance": updated_account["current_balance"],
+        "transaction_id": str(transaction_id)
     }
 
+async def _release_receipt(db, path: Optional[str]):
+    """Depodaki dekont referansını bırak; temizlik hatası asıl hatayı gizlemez"""
+    try:
+        await release_file(db, path)
+    except Exception as e:
+        logger.warning(f"Receipt reference release failed for {path}: {e}")
+
+async def _verify_receipt_with_ai(order: dict, bank_account: dict, temp_file_path: str) -> dict:
+    """Dekontu AI ile doğrula ve bakiye kontrolü ekle (hata olursa geçici dosyayı sil)"""
+    try:
+        verification_result = await ai_service.verify_payment_receipt(temp_file_path, order)
+        
+        if not verification_result.get("success", False):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"AI doğrulama başarısız: {verification_result.get('error', 'Bilinmeyen hata')}"
+            )
+        
+        # Bakiye kontrolü
+        total_deducted = verification_result.get("amount_summary", {}).get("total_deducted", order["amount"])
+        if bank_account["current_balance"] < total_deducted:
+            verification_result["insufficient_balance"] = True
+            verification_result["required_amount"] = total_deducted
+            verification_result["available_balance"] = bank_account["current_balance"]
+            verification_result["recommendation"] = "REJECT"
+            
+            # anomalies array'ini kontrol et ve gerekirse oluştur
+            if "anomalies" not in verification_result:
+                verification_result["anomalies"] = []
+            verification_result["anomalies"].append(
+                f"Yetersiz bakiye: Gerekli {total_deducted} TRY, Mevcut {bank_account['current_balance']} TRY"
+            )
+        else:
+            verification_result["insufficient_balance"] = False
+        
+        # Geçici dosya bilgisini sonuca ekle
+        verification_result["temp_file_path"] = temp_file_path
+        verification_result["bank_account_info"] = {
+            "id": str(bank_account["_id"]),
+            "name": bank_account["name"],
+            "current_balance": bank_account["current_balance"]
+        }
+        
+        return verification_result
+        
+    except Exception as ai_error:
+        # Geçici dosyayı sil
+        if os.path.exists(temp_file_path):
+            try:
+                os.remove(temp_file_path)
+            except:
+                pass
+        
+        logger.error(f"AI verification error: {ai_error}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"AI doğrulama hatası: {str(ai_error)}"
+        )
+
+@ai_job_queue.handler("verify_payment")
+async def _verify_payment_job(ctx: JobContext):
+    db = ctx.db
+    temp_file_path = ctx.payload["temp_file_path"]
+    order = await db.payment_orders.find_one({"_id": ObjectId(ctx.payload["order_id"])})
+    bank_account = await db.bank_accounts.find_one({"_id": ObjectId(ctx.payload["bank_account_id"])})
+    if not order or not bank_account:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ödeme emri veya banka hesabı bulunamadı"
+        )
+    
+    await ctx.progress(10, "Dekont doğrulanıyor")
+    return await _verify_receipt_with_ai(order, bank_account, temp_file_path)
+
 @router.post("/{order_id}/verify-payment")
 async def verify_payment_receipt(
     order_id: str,
     bank_account_id: str = Form(...),
     receipt_file: UploadFile = File(...),
+    run_async: bool = Query(False, alias="async", description="Arka planda işle, iş kimliği döndür"),
     current_user: User = Depends(get_admin_user)
 ):
     """Dekont yükleyerek ödeme emrini AI ile doğrula (ilk aşama)"""
@@ -558,19 +624,12 @@ async def verify_payment_receipt(
             detail="Banka hesabı bulunamadı"
         )
     
-    # Dosya kontrolü - Geçici olarak sadece resim dosyaları
-    allowed_types = ["image/jpeg", "image/png", "image/jpg"]
+    # Dosya kontrolü
+    allowed_types = ["image/jpeg", "image/png", "image/jpg", "application/pdf"]
     if receipt_file.content_type not in allowed_types:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Şu anda sadece JPG ve PNG dosyaları desteklenmektedir"
-        )
-    
-    # Dosya boyutu kontrolü (10MB)
-    if receipt_file.size > 10 * 1024 * 1024:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Dosya boyutu 10MB'dan büyük olamaz"
+            detail="Sadece JPG, PNG ve PDF dosyaları desteklenir"
         )
     
     try:
@@ -582,60 +641,24 @@ async def verify_payment_receipt(
         # Klasörü oluştur
         os.makedirs(os.path.dirname(temp_file_path), exist_ok=True)
         
-        async with aiofiles.open(temp_file_path, 'wb') as f:
-            content = await receipt_file.read()
-            await f.write(content)
+        await save_upload(receipt_file, temp_file_path)
         
-        # AI ile dekont doğrulama
-        try:
-            verification_result = await ai_service.verify_payment_receipt(temp_file_path, order)
-            
-            if not verification_result.get("success", False):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"AI doğrulama başarısız: {verification_result.get('error', 'Bilinmeyen hata')}"
-                )
-            
-            # Bakiye kontrolü
-            total_deducted = verification_result.get("amount_summary", {}).get("total_deducted", order["amount"])
-            if bank_account["current_balance"] < total_deducted:
-                verification_result["insufficient_balance"] = True
-                verification_result["required_amount"] = total_deducted
-                verification_result["available_balance"] = bank_account["current_balance"]
-                verification_result["recommendation"] = "REJECT"
-                
-                # anomalies array'ini kontrol et ve gerekirse oluştur
-                if "anomalies" not in verification_result:
-                    verification_result["anomalies"] = []
-                verification_result["anomalies"].append(
-                    f"Yetersiz bakiye: Gerekli {total_deducted} TRY, Mevcut {bank_account['current_balance']} TRY"
-                )
-            else:
-                verification_result["insufficient_balance"] = False
-            
-            # Geçici dosya bilgisini sonuca ekle
-            verification_result["temp_file_path"] = temp_file_path
-            verification_result["bank_account_info"] = {
-                "id": str(bank_account["_id"]),
-                "name": bank_account["name"],
-                "current_balance": bank_account["current_balance"]
-            }
-            
-            return verification_result
-            
-        except Exception as ai_error:
-            # Geçici dosyayı sil
-            if os.path.exists(temp_file_path):
-                try:
-                    os.remove(temp_file_path)
-                except:
-                    pass
-            
-            logger.error(f"AI verification error: {ai_error}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"AI doğrulama hatası: {str(ai_error)}"
+        if run_async:
+            # Doğrulama worker'da yapılır; geçici dosya onay aşaması için saklanır
+            job = await ai_job_queue.submit(
+                db,
+                "verify_payment",
+                {
+                    "order_id": order_id,
+                    "bank_account_id": bank_account_id,
+                    "temp_file_path": temp_file_path
+                },
+                current_user.id
             )
+            return accepted_response(job)
+        
+        # AI ile dekont doğrulama
+        return await _verify_receipt_with_ai(order, bank_account, temp_file_path)
             
     except HTTPException:
         raise
@@ -682,6 +705,7 @@ async def confirm_payment_after_verification(
             detail="Banka hesabı bulunamadı"
         )
     
+    final_file_path = None
     try:
         # AI doğrulamayı tekrar yap (güvenlik için)
         verification_result = await ai_service.verify_payment_receipt(temp_file_path, order)
@@ -692,14 +716,8 @@ async def confirm_payment_after_verification(
                 detail="Doğrulama başarısız, işlem iptal edildi"
             )
         
-        # Kalıcı dosya yolu oluştur
-        file_extension = temp_file_path.split(".")[-1]
-        final_filename = f"payment_receipt_{order_id}_{int(datetime.utcnow().timestamp())}.{file_extension}"
-        final_file_path = os.path.join("uploads/payment_receipts", final_filename)
-        
-        # Klasörü oluştur ve dosyayı taşı
-        os.makedirs(os.path.dirname(final_file_path), exist_ok=True)
-        os.rename(temp_file_path, final_file_path)
+        # Geçici dosyayı içerik adresli depoya taşı (doğrulama tekrarları tek kopya tutulur)
+        final_file_path = await store_file(db, temp_file_path)
         
         # İşlem tutarlarını al
         amount_summary = verification_result.get("amount_summary", {})
@@ -707,42 +725,8 @@ async def confirm_payment_after_verification(
         total_fees = amount_summary.get("total_fees", 0.0)
         total_deducted = amount_summary.get("total_deducted", actual_amount + total_fees)
         
-        # Son bakiye kontrolü
-        if bank_account["current_balance"] < total_deducted:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Yetersiz bakiye. Gerekli: {total_deducted} TRY, Mevcut: {bank_account['current_balance']} TRY"
-            )
-        
         now = datetime.utcnow()
         
-        # Ödeme emrini güncelle
-        await db.payment_orders.update_one(
-            {"_id": ObjectId(order_id)},
-            {"$set": {
-                "status": PaymentStatus.COMPLETED,
-                "bank_account_id": bank_account_id,
-                "receipt_url": final_file_path,
-                "ai_verification": verification_result,
-                "actual_amount": actual_amount,
-                "total_fees": total_fees,
-                "net_amount_deducted": total_deducted,
-                "completed_at": now,
-                "completed_by": current_user.id,
-                "updated_at": now
-            }}
-        )
-        
-        # Banka hesabı bakiyesini güncelle
-        new_balance = bank_account["current_balance"] - total_deducted
-        await db.bank_accounts.update_one(
-            {"_id": ObjectId(bank_account_id)},
-            {"$set": {
-                "current_balance": new_balance,
-                "updated_at": now
-            }}
-        )
-        
         # Transaction kaydı oluştur
         from app.models.transaction import TransactionCreate, TransactionType, TransactionStatus
         
@@ -779,7 +763,32 @@ async def confirm_payment_after_verification(
             "updated_at": now
         })
         
-        transaction_result = await db.transactions.insert_one(transaction_dict)
+        # Emri sahiplen, son bakiye kontrolüyle düş ve işlemi kaydet (tek adımda)
+        try:
+            updated_account, transaction_id = await settle_payment_order(
+                db,
+                order_id,
+                [PaymentStatus.PENDING, PaymentStatus.APPROVED],
+                bank_account_id,
+                float(total_deducted),
+                {
+                    "bank_account_id": bank_account_id,
+                    "receipt_url": final_file_path,
+                    "ai_verification": verification_result,
+                    "actual_amount": actual_amount,
+                    "total_fees": total_fees,
+                    "net_amount_deducted": total_deducted,
+                    "completed_at": now,
+                    "completed_by": current_user.id,
+                    "updated_at": now
+                },
+                transaction_dict
+            )
+        except BaseException:
+            # Emir tamamlanmadı (409 / 400 dahil): depo referansını bırak
+            stored, final_file_path = final_file_path, None
+            await _release_receipt(db, stored)
+            raise
         
         return {
             "message": "Ödeme AI doğrulaması ile başarıyla tamamlandı",
@@ -792,21 +801,21 @@ async def confirm_payment_after_verification(
                 "total_deducted": total_deducted,
                 "anomalies": verification_result.get("anomalies", [])
             },
-            "new_balance": new_balance,
+            "new_balance": updated_account["current_balance"],
             "receipt_path": final_file_path,
-            "transaction_id": str(transaction_result.inserted_id)
+            "transaction_id": str(transaction_id)
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        # Hata durumunda dosyaları temizle
-        for file_path in [temp_file_path, final_file_path if 'final_file_path' in locals() else None]:
-            if file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
+        # Hata durumunda geçici dosyayı ve depo referansını temizle
+        if os.path.exists(temp_file_path):
+            try:
+                os.remove(temp_file_path)
+            except:
+                pass
+        await _release_receipt(db, final_file_path)
         
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -850,33 +859,18 @@ async def complete_payment_with_receipt(
             detail="Banka hesabı bulunamadı"
         )
     
-    # Dosya kontrolü - Geçici olarak sadece resim dosyaları
-    allowed_types = ["image/jpeg", "image/png", "image/jpg"]
+    # Dosya kontrolü
+    allowed_types = ["image/jpeg", "image/png", "image/jpg", "application/pdf"]
     if receipt_file.content_type not in allowed_types:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Şu anda sadece JPG ve PNG dosyaları desteklenmektedir"
-        )
-    
-    # Dosya boyutu kontrolü (10MB)
-    if receipt_file.size > 10 * 1024 * 1024:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Dosya boyutu 10MB'dan büyük olamaz"
+            detail="Sadece JPG, PNG ve PDF dosyaları desteklenir"
         )
     
+    file_path = None
     try:
-        # Dosyayı kaydet
-        file_extension = receipt_file.filename.split(".")[-1]
-        filename = f"payment_receipt_{order_id}_{int(datetime.utcnow().timestamp())}.{file_extension}"
-        file_path = os.path.join("uploads/payment_receipts", filename)
-        
-        # Klasörü oluştur
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await receipt_file.read()
-            await f.write(content)
+        # Dosyayı içerik adresli depoya kaydet (aynı dekont tek kopya tutulur)
+        file_path = await store_upload(db, receipt_file)
         
         # AI ile dekont analizi
         try:
@@ -908,42 +902,8 @@ async def complete_payment_with_receipt(
             net_deducted = actual_amount
             ai_analysis = {"success": False, "error": str(ai_error)}
         
-        # Bakiye kontrolü - net çıkan tutar üzerinden
-        if bank_account["current_balance"] < net_deducted:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Yetersiz bakiye. Gerekli: {net_deducted} TRY, Mevcut: {bank_account['current_balance']} TRY"
-            )
-        
         now = datetime.utcnow()
         
-        # Ödeme emrini güncelle
-        await db.payment_orders.update_one(
-            {"_id": ObjectId(order_id)},
-            {"$set": {
-                "status": PaymentStatus.COMPLETED,
-                "bank_account_id": bank_account_id,
-                "receipt_url": file_path,
-                "ai_analysis": ai_analysis,
-                "actual_amount": actual_amount,
-                "total_fees": total_fees,
-                "net_amount_deducted": net_deducted,
-                "completed_at": now,
-                "completed_by": current_user.id,
-                "updated_at": now
-            }}
-        )
-        
-        # Banka hesabı bakiyesini güncelle - net tutar üzerinden
-        new_balance = bank_account["current_balance"] - net_deducted
-        await db.bank_accounts.update_one(
-            {"_id": ObjectId(bank_account_id)},
-            {"$set": {
-                "current_balance": new_balance,
-                "updated_at": now
-            }}
-        )
-        
         # Transaction kaydı oluştur - AI analizini dahil et
         from app.models.transaction import TransactionCreate, TransactionType, TransactionStatus
         
@@ -980,7 +940,32 @@ async def complete_payment_with_receipt(
             "updated_at": now
         })
         
-        transaction_result = await db.transactions.insert_one(transaction_dict)
+        # Emri sahiplen, net çıkan tutarı düş ve işlemi kaydet (tek adımda)
+        try:
+            updated_account, transaction_id = await settle_payment_order(
+                db,
+                order_id,
+                [PaymentStatus.PENDING, PaymentStatus.APPROVED],
+                bank_account_id,
+                float(net_deducted),
+                {
+                    "bank_account_id": bank_account_id,
+                    "receipt_url": file_path,
+                    "ai_analysis": ai_analysis,
+                    "actual_amount": actual_amount,
+                    "total_fees": total_fees,
+                    "net_amount_deducted": net_deducted,
+                    "completed_at": now,
+                    "completed_by": current_user.id,
+                    "updated_at": now
+                },
+                transaction_dict
+            )
+        except BaseException:
+            # Emir tamamlanmadı (409 / 400 dahil): depo referansını bırak
+            stored, file_path = file_path, None
+            await _release_receipt(db, stored)
+            raise
         
         return {
             "message": "Ödeme dekont ile başarıyla tamamlandı",
@@ -988,21 +973,17 @@ async def complete_payment_with_receipt(
             "actual_amount": actual_amount,
             "total_fees": total_fees,
             "net_deducted": net_deducted,
-            "new_balance": new_balance,
+            "new_balance": updated_account["current_balance"],
             "ai_analysis": ai_analysis,
             "receipt_path": file_path,
-            "transaction_id": str(transaction_result.inserted_id)
+            "transaction_id": str(transaction_id)
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        # Hata durumunda dosyayı sil
-        if 'file_path' in locals() and os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except:
-                pass
+        # Hata durumunda dosya referansını bırak
+        await _release_receipt(db, file_path)
         
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1034,7 +1015,6 @@ async def upload_receipt(
         )
     
     # Güvenlik validasyonları
-    validate_file_size(file.size)
     validate_file_type(file.filename, ['.jpg', '.jpeg', '.png', '.pdf'])
     
     # Content-Type kontrolü
@@ -1042,20 +1022,16 @@ async def upload_receipt(
     if file.content_type not in allowed_content_types:
         raise_bad_request("Sadece JPEG, PNG ve PDF dosyaları yüklenebilir")
     
-    # Dosya içeriğini oku ve doğrula
-    content = await file.read()
-    validate_file_content(content, file.filename)
-    
-    # Güvenli dosya adı oluştur
+    # Güvenli dosya uzantısı
     safe_filename = sanitize_filename(file.filename)
     file_extension = safe_filename.split(".")[-1] if "." in safe_filename else "unknown"
-    timestamp = int(datetime.utcnow().timestamp())
-    filename = f"receipt_{order_id}_{timestamp}.{file_extension}"
-    file_path = os.path.join(settings.upload_dir, filename)
     
-    # Dosyayı kaydet
-    async with aiofiles.open(file_path, 'wb') as f:
-        await f.write(content)
+    # Dosyayı içerik adresli depoya kaydet (boyut yazarken, içerik imzası ilk parçada doğrulanır)
+    file_path = await store_upload(
+        db, file, file_extension,
+        head_check=lambda head: validate_file_content(head, file.filename)
+    )
+    filename = os.path.basename(file_path)
     
     # Veritabanını güncelle
     await db.payment_orders.update_one(
@@ -1,9 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query, File, UploadFile
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
-import os
-import aiofiles
 
 from app.models.person import (
     Person,
@@ -24,16 +22,33 @@ from app.models.payment_detail import (
 from app.models.user import User
 from app.api.routes.auth import get_current_user
 from app.core.database import get_database
-from app.core.config import settings
+from app.core.pagination import paginate
+from app.core.aggregation import lookup_by_id, top_n_pipeline
+from app.services.export_service import select_fields, stream_export
+from app.services.blob_store import store_upload
+from app.services.transaction_totals import EMPTY_TOTALS, transaction_totals_by
+from app.services.report_cache import bump_data_version
 
 router = APIRouter()
 
+# İstatistiklerdeki son aktivite sayısı
+RECENT_ACTIVITY_LIMIT = 10
+
+# Dışa aktarılabilen ödeme detayı alanları (varsayılan sütun sırası)
+PAYMENT_EXPORT_FIELDS = (
+    "_id", "payment_date", "person_id", "payment_type", "amount", "currency",
+    "payment_method", "status", "bank_account_id", "transaction_id",
+    "payment_order_id", "reference_number", "description"
+)
+
 @router.get("/", response_model=List[Person])
 async def get_people(
     person_type: Optional[str] = Query(None, description="Kişi türüne göre filtrele"),
     search: Optional[str] = Query(None, description="İsim veya şirkete göre ara"),
     limit: int = Query(50, le=100, description="Maksimum kayıt sayısı"),
     skip: int = Query(0, ge=0, description="Atlanacak kayıt sayısı"),
+    cursor: Optional[str] = Query(None, description="Sonraki sayfa imleci (X-Next-Cursor başlığı)"),
+    response: Response = None,
     current_user: User = Depends(get_current_user)
 ):
     """Kişi/kurumları listele"""
@@ -50,9 +65,9 @@ async def get_people(
         ]
     
     people = []
-    cursor = db.people.find(filter_query).sort("name", 1).skip(skip).limit(limit)
+    docs = await paginate(db.people, filter_query, "name", 1, limit, skip, cursor, response)
     
-    async for person in cursor:
+    for person in docs:
         person["_id"] = str(person["_id"])
         people.append(Person(**person))
     
@@ -65,68 +80,27 @@ async def get_people_summary(
     """Kişi/kurumların özet bilgilerini getir"""
     db = get_database()
     
-    # Aggregate pipeline ile işlem istatistiklerini hesapla
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "transactions",
-                "localField": "_id",
-                "foreignField": "person_id",
-                "as": "transactions"
-            }
-        },
-        {
-            "$addFields": {
-                "total_sent": {
-                    "$sum": {
-                        "$map": {
-                            "input": {"$filter": {
-                                "input": "$transactions",
-                                "cond": {"$eq": ["$$this.type", "expense"]}
-                            }},
-                            "as": "transaction",
-                            "in": "$$transaction.amount"
-                        }
-                    }
-                },
-                "total_received": {
-                    "$sum": {
-                        "$map": {
-                            "input": {"$filter": {
-                                "input": "$transactions",
-                                "cond": {"$eq": ["$$this.type", "income"]}
-                            }},
-                            "as": "transaction",
-                            "in": "$$transaction.amount"
-                        }
-                    }
-                },
-                "transaction_count": {"$size": "$transactions"},
-                "last_transaction_date": {
-                    "$max": "$transactions.transaction_date"
-                }
-            }
-        },
-        {
-            "$sort": {"name": 1}
-        }
-    ]
+    # Önce işlemler kişiye göre toplanır, sonra kişi kayıtlarıyla birleştirilir
+    totals = await transaction_totals_by(db, "person_id", {})
     
     summaries = []
-    async for doc in db.people.aggregate(pipeline):
-        net_balance = doc.get("total_received", 0) - doc.get("total_sent", 0)
+    projection = {"name": 1, "person_type": 1, "company": 1, "iban": 1}
+    async for person in db.people.find({}, projection).sort("name", 1):
+        person_totals = totals.get(str(person["_id"]), EMPTY_TOTALS)
+        total_sent = person_totals["total_expense"]
+        total_received = person_totals["total_income"]
         
         summary = PersonSummary(
-            id=str(doc["_id"]),
-            name=doc["name"],
-            person_type=doc.get("person_type", "individual"),
-            company=doc.get("company"),
-            iban=doc.get("iban"),
-            total_sent=doc.get("total_sent", 0),
-            total_received=doc.get("total_received", 0),
-            transaction_count=doc.get("transaction_count", 0),
-            last_transaction_date=doc.get("last_transaction_date"),
-            net_balance=net_balance
+            id=str(person["_id"]),
+            name=person["name"],
+            person_type=person.get("person_type", "individual"),
+            company=person.get("company"),
+            iban=person.get("iban"),
+            total_sent=total_sent,
+            total_received=total_received,
+            transaction_count=person_totals["transaction_count"],
+            last_transaction_date=person_totals["last_transaction_date"],
+            net_balance=total_received - total_sent
         )
         summaries.append(summary)
     
@@ -143,178 +117,58 @@ async def get_people_statistics(
     total_people = await db.people.count_documents({"person_type": "individual"})
     total_companies = await db.people.count_documents({"person_type": "company"})
     
-    # Toplam işlem hacmi
-    pipeline_volume = [
-        {
-            "$lookup": {
-                "from": "transactions",
-                "localField": "_id",
-                "foreignField": "person_id",
-                "as": "transactions"
-            }
-        },
-        {
-            "$unwind": {"path": "$transactions", "preserveNullAndEmptyArrays": True}
-        },
-        {
-            "$group": {
-                "_id": None,
-                "total_volume": {"$sum": "$transactions.amount"}
-            }
-        }
-    ]
-    
-    volume_result = []
-    async for doc in db.people.aggregate(pipeline_volume):
-        volume_result.append(doc)
-    
-    total_transactions = volume_result[0]["total_volume"] if volume_result else 0
-    
-    # En çok para gönderilen kişiler (top 5)
-    pipeline_recipients = [
-        {
-            "$lookup": {
-                "from": "transactions",
-                "localField": "_id",
-                "foreignField": "person_id",
-                "as": "transactions"
-            }
-        },
-        {
-            "$addFields": {
-                "total_sent": {
-                    "$sum": {
-                        "$map": {
-                            "input": {"$filter": {
-                                "input": "$transactions",
-                                "cond": {"$eq": ["$$this.type", "expense"]}
-                            }},
-                            "as": "transaction",
-                            "in": "$$transaction.amount"
-                        }
-                    }
-                }
+    # İşlemler kişiye göre bir kez toplanır; hacim ve ilk 5'ler buradan çıkar
+    totals = await transaction_totals_by(db, "person_id", {})
+    people_by_id = {}
+    person_oids = [ObjectId(key) for key in totals if ObjectId.is_valid(key)]
+    async for person in db.people.find({"_id": {"$in": person_oids}}, {"name": 1, "company": 1}):
+        people_by_id[str(person["_id"])] = person
+    
+    total_transactions = sum(totals[key]["total_amount"] for key in people_by_id)
+    
+    def top_people(field: str) -> List[dict]:
+        ranked = sorted(
+            (key for key in people_by_id if totals[key][field] > 0),
+            key=lambda key: totals[key][field],
+            reverse=True
+        )[:5]
+        return [
+            {
+                "id": key,
+                "name": people_by_id[key]["name"],
+                "company": people_by_id[key].get("company"),
+                "amount": totals[key][field]
             }
-        },
-        {
-            "$match": {"total_sent": {"$gt": 0}}
-        },
-        {
-            "$sort": {"total_sent": -1}
-        },
-        {
-            "$limit": 5
-        },
-        {
-            "$project": {
-                "name": 1,
-                "company": 1,
-                "total_sent": 1
-            }
-        }
-    ]
-    
-    top_recipients = []
-    async for doc in db.people.aggregate(pipeline_recipients):
-        top_recipients.append({
-            "id": str(doc["_id"]),
-            "name": doc["name"],
-            "company": doc.get("company"),
-            "amount": doc["total_sent"]
-        })
-    
-    # En çok para alınan kişiler (top 5)
-    pipeline_senders = [
-        {
-            "$lookup": {
-                "from": "transactions",
-                "localField": "_id",
-                "foreignField": "person_id",
-                "as": "transactions"
-            }
-        },
-        {
-            "$addFields": {
-                "total_received": {
-                    "$sum": {
-                        "$map": {
-                            "input": {"$filter": {
-                                "input": "$transactions",
-                                "cond": {"$eq": ["$$this.type", "income"]}
-                            }},
-                            "as": "transaction",
-                            "in": "$$transaction.amount"
-                        }
-                    }
-                }
-            }
-        },
-        {
-            "$match": {"total_received": {"$gt": 0}}
-        },
-        {
-            "$sort": {"total_received": -1}
-        },
-        {
-            "$limit": 5
-        },
-        {
-            "$project": {
-                "name": 1,
-                "company": 1,
-                "total_received": 1
-            }
-        }
-    ]
-    
-    top_senders = []
-    async for doc in db.people.aggregate(pipeline_senders):
-        top_senders.append({
-            "id": str(doc["_id"]),
-            "name": doc["name"],
-            "company": doc.get("company"),
-            "amount": doc["total_received"]
-        })
+            for key in ranked
+        ]
     
-    # Son aktiviteler (son 10 işlem)
-    pipeline_recent = [
-        {
-            "$lookup": {
-                "from": "people",
-                "localField": "person_id",
-                "foreignField": "_id",
-                "as": "person"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "bank_accounts",
-                "localField": "bank_account_id",
-                "foreignField": "_id",
-                "as": "bank_account"
-            }
-        },
-        {
-            "$match": {"person": {"$ne": []}}
-        },
-        {
-            "$sort": {"transaction_date": -1}
-        },
-        {
-            "$limit": 10
-        },
-        {
-            "$project": {
-                "person_id": {"$arrayElemAt": ["$person._id", 0]},
-                "person_name": {"$arrayElemAt": ["$person.name", 0]},
-                "type": 1,
-                "amount": 1,
-                "description": 1,
-                "transaction_date": 1,
-                "bank_account_name": {"$arrayElemAt": ["$bank_account.name", 0]}
-            }
+    # En çok para gönderilen / alınan kişiler (top 5)
+    top_recipients = top_people("total_expense")
+    top_senders = top_people("total_income")
+    
+    # Son aktiviteler (son 10 işlem). Kişi eşleşmesi $limit'ten sonra
+    # yapıldığından silinmiş kişilere ait satırlar için fazladan okunur,
+    # eşleşmeden sonra 10'a kırpılır
+    pipeline_recent = top_n_pipeline(
+        match={"person_id": {"$nin": [None, ""]}},
+        sort={"transaction_date": -1},
+        limit=RECENT_ACTIVITY_LIMIT * 3,
+        enrich=[
+            lookup_by_id("people", "person_id", "person"),
+            lookup_by_id("bank_accounts", "bank_account_id", "bank_account")
+        ],
+        post_match={"person": {"$ne": []}},
+        project={
+            "person_id": {"$arrayElemAt": ["$person._id", 0]},
+            "person_name": {"$arrayElemAt": ["$person.name", 0]},
+            "type": 1,
+            "amount": 1,
+            "description": 1,
+            "transaction_date": 1,
+            "bank_account_name": {"$arrayElemAt": ["$bank_account.name", 0]}
         }
-    ]
+    )
+    pipeline_recent.append({"$limit": RECENT_ACTIVITY_LIMIT})
     
     recent_activity = []
     async for doc in db.transactions.aggregate(pipeline_recent):
@@ -384,29 +238,17 @@ async def get_person_transactions(
     if transaction_type:
         filter_query["type"] = transaction_type
     
-    # Aggregate pipeline ile banka hesabı ve kişi bilgilerini join et
-    pipeline = [
-        {"$match": filter_query},
-        {
-            "$lookup": {
-                "from": "bank_accounts",
-                "localField": "bank_account_id",
-                "foreignField": "_id",
-                "as": "bank_account"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "people",
-                "localField": "person_id",
-                "foreignField": "_id",
-                "as": "person"
-            }
-        },
-        {"$sort": {"transaction_date": -1}},
-        {"$skip": skip},
-        {"$limit": limit}
-    ]
+    # Önce sayfadaki işlemleri seç, sonra banka hesabı ve kişi bilgilerini join et
+    pipeline = top_n_pipeline(
+        match=filter_query,
+        sort={"transaction_date": -1},
+        skip=skip,
+        limit=limit,
+        enrich=[
+            lookup_by_id("bank_accounts", "bank_account_id", "bank_account"),
+            lookup_by_id("people", "person_id", "person")
+        ]
+    )
     
     transactions = []
     async for doc in db.transactions.aggregate(pipeline):
@@ -461,6 +303,7 @@ async def create_person(
     })
     
     result = await db.people.insert_one(person_dict)
+    await bump_data_version(db, "people")
     
     # Oluşturulan kişiyi getir
     created_person = await db.people.find_one({"_id": result.inserted_id})
@@ -518,6 +361,7 @@ async def update_person(
             {"_id": ObjectId(person_id)},
             {"$set": update_data}
         )
+        await bump_data_version(db, "people")
     
     # Güncellenmiş kişiyi getir
     updated_person = await db.people.find_one({"_id": ObjectId(person_id)})
@@ -561,6 +405,7 @@ async def delete_person(
         )
     
     await db.people.delete_one({"_id": ObjectId(person_id)})
+    await bump_data_version(db, "people")
     
     return {"message": "Kişi silindi"}
 
@@ -598,6 +443,7 @@ async def auto_create_person_from_transaction(
     }
     
     result = await db.people.insert_one(person_dict)
+    await bump_data_version(db, "people")
     
     return {"person_id": str(result.inserted_id), "created": True}
 
@@ -643,6 +489,7 @@ async def auto_create_person_advanced(
     }
     
     result = await db.people.insert_one(person_dict)
+    await bump_data_version(db, "people")
     
     # Oluşturulan kişiyi getir
     created_person = await db.people.find_one({"_id": result.inserted_id})
@@ -781,25 +628,8 @@ async def upload_payment_receipts(
                 detail=f"Desteklenmeyen dosya türü: {file.content_type}"
             )
         
-        # Dosya boyutu kontrolü
-        if file.size > settings.max_file_size:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Dosya boyutu çok büyük (maksimum 10MB)"
-            )
-        
-        # Dosya adı oluştur
-        file_extension = file.filename.split(".")[-1]
-        filename = f"payment_{payment_id}_{int(datetime.utcnow().timestamp())}.{file_extension}"
-        file_path = os.path.join(settings.upload_dir, "receipts", filename)
-        
-        # Dizin oluştur
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        # Dosyayı kaydet
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        # Dosyayı içerik adresli depoya kaydet (aynı dekont tek kopya tutulur)
+        file_path = await store_upload(db, file)
         
         uploaded_files.append(file_path)
     
@@ -814,6 +644,43 @@ async def upload_payment_receipts(
     
     return {"message": f"{len(uploaded_files)} dosya başarıyla yüklendi", "file_paths": uploaded_files}
 
+@router.get("/payments/export")
+async def export_payments(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson veya csv"),
+    person_id: Optional[str] = Query(None, description="Kişiye göre filtrele"),
+    payment_type: Optional[str] = Query(None, description="Ödeme türüne göre filtrele"),
+    start_date: Optional[datetime] = Query(None, description="Başlangıç tarihi"),
+    end_date: Optional[datetime] = Query(None, description="Bitiş tarihi"),
+    fields: Optional[str] = Query(None, description="Virgülle ayrılmış alanlar (boşsa tümü)"),
+    batch_size: int = Query(1000, ge=100, le=10000, description="Cursor batch boyutu"),
+    current_user: User = Depends(get_current_user)
+):
+    """Ödeme detaylarını NDJSON / CSV olarak akıtarak dışa aktar"""
+    db = get_database()
+    
+    filter_query = {}
+    if person_id:
+        filter_query["person_id"] = person_id
+    if payment_type:
+        filter_query["payment_type"] = payment_type
+    if start_date or end_date:
+        date_filter = {}
+        if start_date:
+            date_filter["$gte"] = start_date
+        if end_date:
+            date_filter["$lte"] = end_date
+        filter_query["payment_date"] = date_filter
+    
+    return stream_export(
+        db.payment_details,
+        filter_query,
+        [("payment_date", -1)],
+        select_fields(fields, PAYMENT_EXPORT_FIELDS),
+        export_format,
+        f"payments_{datetime.utcnow():%Y%m%d_%H%M%S}",
+        batch_size
+    )
+
 @router.get("/payments/summary", response_model=List[PaymentDetailSummary])
 async def get_payments_summary(
     current_user: User = Depends(get_current_user)
@@ -821,25 +688,18 @@ async def get_payments_summary(
     """Tüm ödeme detaylarının özetini getir"""
     db = get_database()
     
-    # Aggregate pipeline ile kişi bilgilerini join et
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "people",
-                "localField": "person_id",
-                "foreignField": "_id",
-                "as": "person"
-            }
-        },
-        {
-            "$addFields": {
-                "person_name": {"$arrayElemAt": ["$person.name", 0]},
-                "receipt_count": {"$size": {"$ifNull": ["$receipt_urls", []]}}
-            }
-        },
-        {"$sort": {"payment_date": -1}},
-        {"$limit": 100}
-    ]
+    # Son 100 ödemeyi seç, sonra kişi bilgilerini join et
+    pipeline = top_n_pipeline(
+        sort={"payment_date": -1},
+        limit=100,
+        enrich=[lookup_by_id("people", "person_id", "person")]
+    )
+    pipeline.append({
+        "$addFields": {
+            "person_name": {"$arrayElemAt": ["$person.name", 0]},
+            "receipt_count": {"$size": {"$ifNull": ["$receipt_urls", []]}}
+        }
+    })
     
     summaries = []
     async for doc in db.payment_details.aggregate(pipeline):
@@ -918,61 +778,48 @@ async def get_payments_statistics(
         })
     
     # En çok ödeme yapılan kişiler
+    # Önce kişiye göre toplanır, kişi adı yalnızca ilk 5 için eklenir
     recipient_pipeline = [
         {"$match": {"payment_type": "outgoing"}},
-        {
-            "$lookup": {
-                "from": "people",
-                "localField": "person_id",
-                "foreignField": "_id",
-                "as": "person"
-            }
-        },
         {
             "$group": {
                 "_id": "$person_id",
-                "person_name": {"$first": {"$arrayElemAt": ["$person.name", 0]}},
                 "total_amount": {"$sum": "$amount"},
                 "payment_count": {"$sum": 1}
             }
         },
         {"$sort": {"total_amount": -1}},
-        {"$limit": 5}
+        {"$limit": 5},
+        *lookup_by_id("people", "_id", "person"),
+        {"$addFields": {"person_name": {"$arrayElemAt": ["$person.name", 0]}}}
     ]
     
     top_recipients = []
     async for doc in db.payment_details.aggregate(recipient_pipeline):
         top_recipients.append({
             "person_id": str(doc["_id"]),
-            "person_name": doc["person_name"],
+            "person_name": doc.get("person_name"),
             "total_amount": doc["total_amount"],
             "payment_count": doc["payment_count"]
         })
     
     # Son ödemeler
-    recent_pipeline = [
-        {
-            "$lookup": {
-                "from": "people",
-                "localField": "person_id",
-                "foreignField": "_id",
-                "as": "person"
-            }
-        },
-        {
-            "$addFields": {
-                "person_name": {"$arrayElemAt": ["$person.name", 0]}
-            }
-        },
-        {"$sort": {"payment_date": -1}},
-        {"$limit": 10}
-    ]
+    recent_pipeline = top_n_pipeline(
+        sort={"payment_date": -1},
+        limit=10,
+        enrich=[lookup_by_id("people", "person_id", "person")]
+    )
+    recent_pipeline.append({
+        "$addFields": {
+            "person_name": {"$arrayElemAt": ["$person.name", 0]}
+        }
+    })
     
     recent_payments = []
     async for doc in db.payment_details.aggregate(recent_pipeline):
         recent_payments.append({
             "id": str(doc["_id"]),
-            "person_name": doc["person_name"],
+            "person_name": doc.get("person_name", "Bilinmeyen"),
             "payment_type": doc["payment_type"],
             "amount": doc["amount"],
             "description": doc["description"],
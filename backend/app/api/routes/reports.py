@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List, Optional
+from fastapi.responses import FileResponse, JSONResponse
+from typing import List, Optional, Tuple
 from datetime import datetime, timedelta
 from bson import ObjectId
 import os
-from io import BytesIO
 
 from app.models.report import (
     Report,
@@ -23,6 +23,13 @@ from app.models.user import User
 from app.api.routes.auth import get_current_user
 from app.core.database import get_database
 from app.core.config import settings
+from app.services.dashboard_stats import compute_dashboard_stats
+from app.core.aggregation import reference_values
+from app.services.ledger_rollups import fetch_ledger_buckets, totals_by_month, totals_by_type
+from app.services.transaction_totals import EMPTY_TOTALS, transaction_totals_by
+from app.services.report_cache import cached_report_data
+from app.services.report_jobs import REPORT_COMPLETED, REPORT_RUNNING, report_job_runner
+from app.services.report_export import REPORT_EXPORT_FORMATS, report_exporter
 
 router = APIRouter()
 
@@ -32,370 +39,20 @@ async def get_dashboard_stats(
 ):
     """Dashboard için temel istatistikleri getir"""
     db = get_database()
-    
-    # Bu ayın başlangıcı
-    now = datetime.utcnow()
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # Bu ayın gelir/gider hesaplama
-    monthly_income_pipeline = [
-        {
-            "$match": {
-                "type": "income",
-                "transaction_date": {"$gte": start_of_month},
-                "status": "completed"
-            }
-        },
-        {
-            "$group": {
-                "_id": None,
-                "total": {"$sum": "$amount"}
-            }
-        }
-    ]
-    
-    monthly_expense_pipeline = [
-        {
-            "$match": {
-                "type": "expense",
-                "transaction_date": {"$gte": start_of_month},
-                "status": "completed"
-            }
-        },
-        {
-            "$group": {
-                "_id": None,
-                "total": {"$sum": "$amount"}
-            }
-        }
-    ]
-    
-    current_month_income = 0.0
-    async for doc in db.transactions.aggregate(monthly_income_pipeline):
-        current_month_income = doc["total"]
-    
-    current_month_expense = 0.0
-    async for doc in db.transactions.aggregate(monthly_expense_pipeline):
-        current_month_expense = doc["total"]
-    
-    current_month_profit = current_month_income - current_month_expense
-    
-    # Toplam banka bakiyesi
-    bank_balance_pipeline = [
-        {
-            "$group": {
-                "_id": None,
-                "total": {"$sum": "$current_balance"}
-            }
-        }
-    ]
-    
-    total_bank_balance = 0.0
-    async for doc in db.bank_accounts.aggregate(bank_balance_pipeline):
-        total_bank_balance = doc["total"]
-    
-    # Bekleyen ödemeler
-    pending_payments = await db.payment_orders.count_documents({"status": "pending"})
-    
-    # Aktif borçlar
-    active_debts = await db.debts.count_documents({"status": "active"})
-    
-    # Son 10 işlem
-    recent_transactions_pipeline = [
-        {
-            "$lookup": {
-                "from": "bank_accounts",
-                "localField": "bank_account_id",
-                "foreignField": "_id",
-                "as": "bank_account"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "people",
-                "localField": "person_id",
-                "foreignField": "_id",
-                "as": "person"
-            }
-        },
-        {"$sort": {"transaction_date": -1}},
-        {"$limit": 10},
-        {
-            "$project": {
-                "type": 1,
-                "amount": 1,
-                "description": 1,
-                "transaction_date": 1,
-                "bank_account_name": {"$arrayElemAt": ["$bank_account.name", 0]},
-                "person_name": {"$arrayElemAt": ["$person.name", 0]}
-            }
-        }
-    ]
-    
-    recent_transactions = []
-    async for doc in db.transactions.aggregate(recent_transactions_pipeline):
-        recent_transactions.append({
-            "id": str(doc["_id"]),
-            "type": doc["type"],
-            "amount": doc["amount"],
-            "description": doc["description"],
-            "transaction_date": doc["transaction_date"],
-            "bank_account_name": doc.get("bank_account_name"),
-            "person_name": doc.get("person_name")
-        })
-    
-    # Son 6 ayın aylık trendleri
-    six_months_ago = now - timedelta(days=180)
-    monthly_trends_pipeline = [
-        {
-            "$match": {
-                "transaction_date": {"$gte": six_months_ago},
-                "status": "completed"
-            }
-        },
-        {
-            "$group": {
-                "_id": {
-                    "year": {"$year": "$transaction_date"},
-                    "month": {"$month": "$transaction_date"},
-                    "type": "$type"
-                },
-                "total": {"$sum": "$amount"}
-            }
-        },
-        {"$sort": {"_id.year": 1, "_id.month": 1}}
-    ]
-    
-    monthly_trends_data = {}
-    async for doc in db.transactions.aggregate(monthly_trends_pipeline):
-        key = f"{doc['_id']['year']}-{doc['_id']['month']:02d}"
-        if key not in monthly_trends_data:
-            monthly_trends_data[key] = {"month": key, "income": 0, "expense": 0}
-        
-        if doc["_id"]["type"] == "income":
-            monthly_trends_data[key]["income"] = doc["total"]
-        elif doc["_id"]["type"] == "expense":
-            monthly_trends_data[key]["expense"] = doc["total"]
-    
-    monthly_trends = list(monthly_trends_data.values())
-    
-    # En büyük giderler (bu ay)
-    top_expenses_pipeline = [
-        {
-            "$match": {
-                "type": "expense",
-                "transaction_date": {"$gte": start_of_month},
-                "status": "completed"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "people",
-                "localField": "person_id",
-                "foreignField": "_id",
-                "as": "person"
-            }
-        },
-        {"$sort": {"amount": -1}},
-        {"$limit": 5},
-        {
-            "$project": {
-                "amount": 1,
-                "description": 1,
-                "transaction_date": 1,
-                "person_name": {"$arrayElemAt": ["$person.name", 0]}
-            }
-        }
-    ]
-    
-    top_expenses = []
-    async for doc in db.transactions.aggregate(top_expenses_pipeline):
-        top_expenses.append({
-            "amount": doc["amount"],
-            "description": doc["description"],
-            "transaction_date": doc["transaction_date"],
-            "person_name": doc.get("person_name")
-        })
-    
-    # Haftalık bakiye trendi (son 7 gün)
-    seven_days_ago = now - timedelta(days=7)
-    weekly_balance_trend = []
-    
-    for i in range(7):
-        day = seven_days_ago + timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        # O günün işlemlerini topla
-        daily_pipeline = [
-            {
-                "$match": {
-                    "transaction_date": {"$gte": day_start, "$lt": day_end},
-                    "status": "completed"
-                }
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "balance_change": {"$sum": "$balance_impact"}
-                }
-            }
-        ]
-        
-        daily_change = 0.0
-        async for doc in db.transactions.aggregate(daily_pipeline):
-            daily_change = doc["balance_change"]
-        
-        # Kümülatif bakiye hesapla (basitleştirilmiş)
-        base_balance = total_bank_balance if i == 0 else weekly_balance_trend[-1]["balance"]
-        current_balance = base_balance + daily_change
-        
-        weekly_balance_trend.append({
-            "date": day.strftime("%d/%m"),
-            "balance": current_balance
-        })
-    
-    # Gider kategorileri dağılımı
-    expense_categories_pipeline = [
-        {
-            "$match": {
-                "type": "expense",
-                "transaction_date": {"$gte": start_of_month},
-                "status": "completed"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "payment_orders",
-                "localField": "payment_order_id",
-                "foreignField": "_id", 
-                "as": "payment_order"
-            }
-        },
-        {
-            "$group": {
-                "_id": {"$arrayElemAt": ["$payment_order.category", 0]},
-                "amount": {"$sum": "$amount"}
-            }
-        },
-        {"$sort": {"amount": -1}}
-    ]
-    
-    expense_categories = []
-    async for doc in db.transactions.aggregate(expense_categories_pipeline):
-        category = doc["_id"] or "Diğer"
-        expense_categories.append({
-            "name": category,
-            "amount": doc["amount"]
-        })
-    
-    # Son 3 ayın ortalaması
-    three_months_ago = now - timedelta(days=90)
-    monthly_average_pipeline = [
-        {
-            "$match": {
-                "type": "income",
-                "transaction_date": {"$gte": three_months_ago},
-                "status": "completed"
-            }
-        },
-        {
-            "$group": {
-                "_id": {
-                    "year": {"$year": "$transaction_date"},
-                    "month": {"$month": "$transaction_date"}
-                },
-                "monthly_total": {"$sum": "$amount"}
-            }
-        },
-        {
-            "$group": {
-                "_id": None,
-                "average": {"$avg": "$monthly_total"}
-            }
-        }
-    ]
-    
-    monthly_average = 0.0
-    async for doc in db.transactions.aggregate(monthly_average_pipeline):
-        monthly_average = doc["average"]
-    
-    # En iyi gün bulma
-    best_day_pipeline = [
-        {
-            "$match": {
-                "type": "income",
-                "status": "completed"
-            }
-        },
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": "%Y-%m-%d",
-                        "date": "$transaction_date"
-                    }
-                },
-                "daily_total": {"$sum": "$amount"}
-            }
-        },
-        {"$sort": {"daily_total": -1}},
-        {"$limit": 1}
-    ]
-    
-    best_day_amount = 0.0
-    best_day_date = None
-    async for doc in db.transactions.aggregate(best_day_pipeline):
-        best_day_amount = doc["daily_total"]
-        best_day_date = doc["_id"]
-    
-    # Bekleyen işlemler
-    pending_transactions_pipeline = [
-        {
-            "$match": {
-                "status": {"$in": ["pending", "planned"]}
-            }
-        },
-        {
-            "$group": {
-                "_id": None,
-                "count": {"$sum": 1},
-                "total_amount": {"$sum": "$amount"}
-            }
-        }
-    ]
-    
-    pending_transactions_count = 0
-    pending_transactions_amount = 0.0
-    async for doc in db.transactions.aggregate(pending_transactions_pipeline):
-        pending_transactions_count = doc["count"]
-        pending_transactions_amount = doc["total_amount"]
-    
-    return DashboardStats(
-        current_month_income=current_month_income,
-        current_month_expense=current_month_expense,
-        current_month_profit=current_month_profit,
-        total_bank_balance=total_bank_balance,
-        pending_payments=pending_payments,
-        active_debts=active_debts,
-        recent_transactions=recent_transactions,
-        monthly_trends=monthly_trends,
-        top_expenses=top_expenses,
-        weekly_balance_trend=weekly_balance_trend,
-        expense_categories=expense_categories,
-        monthly_average=monthly_average,
-        best_day_amount=best_day_amount,
-        best_day_date=best_day_date,
-        pending_transactions_count=pending_transactions_count,
-        pending_transactions_amount=pending_transactions_amount
-    )
+    return await compute_dashboard_stats(db)
 
 @router.post("/generate", response_model=Report)
 async def generate_report(
     report_request: ReportRequest,
+    async_mode: bool = Query(False, alias="async", description="Arka planda üret, rapor kimliğini hemen döndür"),
     current_user: User = Depends(get_current_user)
 ):
-    """Rapor oluştur"""
+    """Rapor oluştur
+
+    async=true ise rapor status="running" ile kaydedilir, aylık parçalar
+    hâlinde arka planda üretilir ve 202 ile kimliği döner; ilerleme ve
+    kısmi veri /reports/{id} üzerinden izlenir.
+    """
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -404,40 +61,15 @@ async def generate_report(
     
     db = get_database()
     
-    # Rapor verilerini hazırla
-    report_data = ReportData()
-    
-    # Tarih filtresi
-    date_filter = {
-        "transaction_date": {
-            "$gte": report_request.start_date,
-            "$lte": report_request.end_date
-        }
-    }
-    
-    if not report_request.include_pending:
-        date_filter["status"] = "completed"
-    
-    # Banka hesabı filtresi
-    if report_request.bank_account_ids:
-        date_filter["bank_account_id"] = {
-            "$in": [ObjectId(id) for id in report_request.bank_account_ids if ObjectId.is_valid(id)]
-        }
-    
-    if report_request.report_type == ReportType.INCOME_EXPENSE:
-        report_data.income_expense = await _generate_income_expense_report(db, date_filter)
-    elif report_request.report_type == ReportType.CASH_FLOW:
-        report_data.cash_flow = await _generate_cash_flow_report(db, date_filter, report_request)
-    elif report_request.report_type == ReportType.BANK_ACCOUNT_SUMMARY:
-        report_data.bank_accounts = await _generate_bank_account_summary(db, date_filter)
-    elif report_request.report_type == ReportType.PERSON_SUMMARY:
-        report_data.people = await _generate_person_summary(db, date_filter, report_request.person_ids)
-    elif report_request.report_type == ReportType.PAYMENT_METHOD_ANALYSIS:
-        report_data.payment_methods = await _generate_payment_method_analysis(db, date_filter)
-    
     # Rapor başlığı oluştur
     title = _generate_report_title(report_request.report_type, report_request.period, report_request.start_date, report_request.end_date)
     
+    if async_mode:
+        return await _submit_report_job(db, report_request, title, current_user)
+    
+    # Geçmiş aralıklar, araya veri yazılmadıysa önbellekten gelir
+    data, cache_hit = await cached_report_data(db, report_request, lambda: _compute_report_data(db, report_request))
+    
     # Raporu kaydet
     now = datetime.utcnow()
     report_dict = {
@@ -448,12 +80,13 @@ async def generate_report(
         "end_date": report_request.end_date,
         "generated_at": now,
         "generated_by": current_user.id,
-        "data": report_data.model_dump(),
+        "data": data,
         "metadata": {
             "bank_account_ids": report_request.bank_account_ids,
             "person_ids": report_request.person_ids,
             "include_pending": report_request.include_pending,
-            "group_by_currency": report_request.group_by_currency
+            "group_by_currency": report_request.group_by_currency,
+            "cache_hit": cache_hit
         },
         "status": "completed",
         "created_at": now,
@@ -468,8 +101,204 @@ async def generate_report(
     
     return Report(**created_report)
 
-async def _generate_income_expense_report(db, date_filter) -> IncomeExpenseReportData:
+async def _submit_report_job(db, report_request: ReportRequest, title: str, current_user: User) -> JSONResponse:
+    """Raporu status="running" ile kaydet ve üretimi arka planda başlat"""
+    now = datetime.utcnow()
+    report_dict = {
+        "report_type": report_request.report_type,
+        "title": title,
+        "period": report_request.period,
+        "start_date": report_request.start_date,
+        "end_date": report_request.end_date,
+        "generated_at": now,
+        "generated_by": current_user.id,
+        "data": ReportData().model_dump(),
+        "metadata": {
+            "bank_account_ids": report_request.bank_account_ids,
+            "person_ids": report_request.person_ids,
+            "include_pending": report_request.include_pending,
+            "group_by_currency": report_request.group_by_currency
+        },
+        "status": REPORT_RUNNING,
+        "progress": 0,
+        "created_at": now,
+        "updated_at": now
+    }
+    result = await db.reports.insert_one(report_dict)
+    
+    async def compute(progress):
+        return await cached_report_data(
+            db, report_request, lambda: _compute_report_data_by_month(db, report_request, progress)
+        )
+    
+    report_job_runner.submit(db, result.inserted_id, compute)
+    
+    report_id = str(result.inserted_id)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"job_id": report_id, "status": REPORT_RUNNING, "status_url": f"/reports/{report_id}"}
+    )
+
+def _month_chunks(start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """[start, end] aralığını takvim aylarına böl (uçlar dahil)"""
+    chunks = []
+    chunk_start = start
+    while chunk_start <= end:
+        month_start = chunk_start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        # MongoDB tarihleri milisaniye hassasiyetinde; $lte ile ayın son anı
+        chunk_end = min(next_month - timedelta(milliseconds=1), end)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = next_month
+    return chunks
+
+def _merge_report_data(total: ReportData, chunk: ReportData):
+    """Bir aylık parçanın sonucunu birikmiş rapora ekle"""
+    if chunk.income_expense is not None:
+        if total.income_expense is None:
+            total.income_expense = IncomeExpenseReportData()
+        merged = total.income_expense
+        merged.total_income += chunk.income_expense.total_income
+        merged.total_expense += chunk.income_expense.total_expense
+        merged.net_profit = merged.total_income - merged.total_expense
+        merged.transaction_count += chunk.income_expense.transaction_count
+        merged.income_by_month.extend(chunk.income_expense.income_by_month)
+        merged.expense_by_month.extend(chunk.income_expense.expense_by_month)
+    
+    if chunk.cash_flow is not None:
+        if total.cash_flow is None:
+            total.cash_flow = CashFlowReportData()
+        merged = total.cash_flow
+        merged.total_inflow += chunk.cash_flow.total_inflow
+        merged.total_outflow += chunk.cash_flow.total_outflow
+        merged.net_cash_flow = merged.total_inflow - merged.total_outflow
+    
+    if chunk.bank_accounts is not None:
+        accounts = {account.account_id: account for account in total.bank_accounts or []}
+        for account in chunk.bank_accounts:
+            merged = accounts.get(account.account_id)
+            if merged is None:
+                accounts[account.account_id] = account
+                continue
+            merged.total_income += account.total_income
+            merged.total_expense += account.total_expense
+            merged.transaction_count += account.transaction_count
+            merged.closing_balance = account.closing_balance
+        total.bank_accounts = list(accounts.values())
+    
+    if chunk.people is not None:
+        people = {person.person_id: person for person in total.people or []}
+        for person in chunk.people:
+            merged = people.get(person.person_id)
+            if merged is None:
+                people[person.person_id] = person
+                continue
+            merged.total_sent += person.total_sent
+            merged.total_received += person.total_received
+            merged.net_balance = merged.total_received - merged.total_sent
+            merged.transaction_count += person.transaction_count
+            if person.last_transaction_date and (
+                not merged.last_transaction_date or person.last_transaction_date > merged.last_transaction_date
+            ):
+                merged.last_transaction_date = person.last_transaction_date
+        total.people = list(people.values())
+    
+    if chunk.payment_methods is not None:
+        methods = {method.method: method for method in total.payment_methods or []}
+        for method in chunk.payment_methods:
+            merged = methods.get(method.method)
+            if merged is None:
+                methods[method.method] = method
+                continue
+            merged.transaction_count += method.transaction_count
+            merged.total_amount += method.total_amount
+        # Yüzde ve ortalama birleşik toplamlardan yeniden hesaplanır
+        total_amount = sum(method.total_amount for method in methods.values())
+        for method in methods.values():
+            method.percentage = (method.total_amount / total_amount * 100) if total_amount > 0 else 0
+            method.average_amount = method.total_amount / method.transaction_count if method.transaction_count > 0 else 0
+        total.payment_methods = sorted(methods.values(), key=lambda method: method.total_amount, reverse=True)
+
+async def _compute_report_data_by_month(db, report_request: ReportRequest, progress) -> dict:
+    """Rapor verisini ay ay hesapla; her aydan sonra kısmi sonucu bildir
+
+    Bellekte yalnızca birikmiş toplamlar tutulur.
+    """
+    report_data = ReportData()
+    chunks = _month_chunks(report_request.start_date, report_request.end_date)
+    for index, (chunk_start, chunk_end) in enumerate(chunks, 1):
+        chunk_request = report_request.model_copy(update={"start_date": chunk_start, "end_date": chunk_end})
+        chunk = ReportData(**await _compute_report_data(db, chunk_request))
+        _merge_report_data(report_data, chunk)
+        await progress(index * 100 // len(chunks), report_data.model_dump())
+    
+    return report_data.model_dump()
+
+async def _compute_report_data(db, report_request: ReportRequest) -> dict:
+    """Rapor verisini hesapla"""
+    report_data = ReportData()
+    
+    # Tarih filtresi
+    date_filter = {
+        "transaction_date": {
+            "$gte": report_request.start_date,
+            "$lte": report_request.end_date
+        }
+    }
+    
+    if not report_request.include_pending:
+        date_filter["status"] = "completed"
+    
+    # Banka hesabı filtresi
+    if report_request.bank_account_ids:
+        date_filter["bank_account_id"] = {"$in": reference_values(report_request.bank_account_ids)}
+    
+    if report_request.report_type == ReportType.INCOME_EXPENSE:
+        report_data.income_expense = await _generate_income_expense_report(db, date_filter, report_request)
+    elif report_request.report_type == ReportType.CASH_FLOW:
+        report_data.cash_flow = await _generate_cash_flow_report(db, date_filter, report_request)
+    elif report_request.report_type == ReportType.BANK_ACCOUNT_SUMMARY:
+        report_data.bank_accounts = await _generate_bank_account_summary(db, date_filter)
+    elif report_request.report_type == ReportType.PERSON_SUMMARY:
+        report_data.people = await _generate_person_summary(db, date_filter, report_request.person_ids)
+    elif report_request.report_type == ReportType.PAYMENT_METHOD_ANALYSIS:
+        report_data.payment_methods = await _generate_payment_method_analysis(db, date_filter)
+    
+    return report_data.model_dump()
+
+async def _fetch_report_buckets(db, report_request: ReportRequest):
+    """Rapor aralığının günlük özet kovalarını getir
+
+    Özetler yalnızca tamamlanmış işlemleri içerir; bekleyenler dahil
+    edilecekse None döner ve ham transactions taranır.
+    """
+    if report_request.include_pending:
+        return None
+    return await fetch_ledger_buckets(
+        db,
+        report_request.start_date,
+        report_request.end_date,
+        report_request.bank_account_ids or None
+    )
+
+async def _generate_income_expense_report(db, date_filter, report_request) -> IncomeExpenseReportData:
     """Gelir-Gider raporu oluştur"""
+    buckets = await _fetch_report_buckets(db, report_request)
+    if buckets is not None:
+        by_type = totals_by_type(buckets)
+        income = by_type.get("income", {"amount": 0.0, "count": 0})
+        expense = by_type.get("expense", {"amount": 0.0, "count": 0})
+        monthly_data = totals_by_month(buckets)
+        
+        return IncomeExpenseReportData(
+            total_income=income["amount"],
+            total_expense=expense["amount"],
+            net_profit=income["amount"] - expense["amount"],
+            transaction_count=income["count"] + expense["count"],
+            income_by_month=[{"month": k, "amount": v.get("income", 0)} for k, v in monthly_data.items()],
+            expense_by_month=[{"month": k, "amount": v.get("expense", 0)} for k, v in monthly_data.items()]
+        )
+    
     # Toplam gelir
     income_pipeline = [
         {"$match": {**date_filter, "type": "income"}},
@@ -534,6 +363,18 @@ async def _generate_income_expense_report(db, date_filter) -> IncomeExpenseRepor
 
 async def _generate_cash_flow_report(db, date_filter, report_request) -> CashFlowReportData:
     """Nakit akış raporu oluştur"""
+    buckets = await _fetch_report_buckets(db, report_request)
+    if buckets is not None:
+        by_type = totals_by_type(buckets)
+        total_inflow = by_type.get("income", {}).get("amount", 0.0)
+        total_outflow = by_type.get("expense", {}).get("amount", 0.0)
+        
+        return CashFlowReportData(
+            total_inflow=total_inflow,
+            total_outflow=total_outflow,
+            net_cash_flow=total_inflow - total_outflow
+        )
+    
     # Toplam giriş/çıkış
     inflow_pipeline = [
         {"$match": {**date_filter, "type": "income"}},
@@ -563,65 +404,23 @@ async def _generate_cash_flow_report(db, date_filter, report_request) -> CashFlo
 
 async def _generate_bank_account_summary(db, date_filter) -> List[BankAccountSummaryData]:
     """Banka hesap özeti raporu"""
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "transactions",
-                "localField": "_id",
-                "foreignField": "bank_account_id",
-                "as": "transactions"
-            }
-        },
-        {
-            "$addFields": {
-                "filtered_transactions": {
-                    "$filter": {
-                        "input": "$transactions",
-                        "cond": {
-                            "$and": [
-                                {"$gte": ["$$this.transaction_date", date_filter["transaction_date"]["$gte"]]},
-                                {"$lte": ["$$this.transaction_date", date_filter["transaction_date"]["$lte"]]}
-                            ]
-                        }
-                    }
-                }
-            }
-        },
-        {
-            "$addFields": {
-                "total_income": {
-                    "$sum": {
-                        "$map": {
-                            "input": {"$filter": {"input": "$filtered_transactions", "cond": {"$eq": ["$$this.type", "income"]}}},
-                            "as": "t",
-                            "in": "$$t.amount"
-                        }
-                    }
-                },
-                "total_expense": {
-                    "$sum": {
-                        "$map": {
-                            "input": {"$filter": {"input": "$filtered_transactions", "cond": {"$eq": ["$$this.type", "expense"]}}},
-                            "as": "t",
-                            "in": "$$t.amount"
-                        }
-                    }
-                },
-                "transaction_count": {"$size": "$filtered_transactions"}
-            }
-        }
-    ]
+    totals = await transaction_totals_by(db, "bank_account_id", date_filter)
+    
+    account_filter = {}
+    if "bank_account_id" in date_filter:
+        account_filter["_id"] = {"$in": [value for value in date_filter["bank_account_id"]["$in"] if isinstance(value, ObjectId)]}
     
     summaries = []
-    async for doc in db.bank_accounts.aggregate(pipeline):
+    async for account in db.bank_accounts.find(account_filter, {"name": 1, "currency": 1, "current_balance": 1}):
+        account_totals = totals.get(str(account["_id"]), EMPTY_TOTALS)
         summaries.append(BankAccountSummaryData(
-            account_id=str(doc["_id"]),
-            account_name=doc["name"],
-            currency=doc.get("currency", "TRY"),
-            closing_balance=doc["current_balance"],
-            total_income=doc.get("total_income", 0),
-            total_expense=doc.get("total_expense", 0),
-            transaction_count=doc.get("transaction_count", 0)
+            account_id=str(account["_id"]),
+            account_name=account["name"],
+            currency=account.get("currency", "TRY"),
+            closing_balance=account["current_balance"],
+            total_income=account_totals["total_income"],
+            total_expense=account_totals["total_expense"],
+            transaction_count=account_totals["transaction_count"]
         ))
     
     return summaries
@@ -629,73 +428,27 @@ async def _generate_bank_account_summary(db, date_filter) -> List[BankAccountSum
 async def _generate_person_summary(db, date_filter, person_ids=None) -> List[PersonSummaryData]:
     """Kişi özeti raporu"""
     match_filter = {}
+    transaction_filter = dict(date_filter)
     if person_ids:
         match_filter["_id"] = {"$in": [ObjectId(id) for id in person_ids if ObjectId.is_valid(id)]}
+        transaction_filter["person_id"] = {"$in": reference_values(person_ids)}
     
-    pipeline = [
-        {"$match": match_filter},
-        {
-            "$lookup": {
-                "from": "transactions",
-                "localField": "_id",
-                "foreignField": "person_id",
-                "as": "transactions"
-            }
-        },
-        {
-            "$addFields": {
-                "filtered_transactions": {
-                    "$filter": {
-                        "input": "$transactions",
-                        "cond": {
-                            "$and": [
-                                {"$gte": ["$$this.transaction_date", date_filter["transaction_date"]["$gte"]]},
-                                {"$lte": ["$$this.transaction_date", date_filter["transaction_date"]["$lte"]]}
-                            ]
-                        }
-                    }
-                }
-            }
-        },
-        {
-            "$addFields": {
-                "total_sent": {
-                    "$sum": {
-                        "$map": {
-                            "input": {"$filter": {"input": "$filtered_transactions", "cond": {"$eq": ["$$this.type", "expense"]}}},
-                            "as": "t",
-                            "in": "$$t.amount"
-                        }
-                    }
-                },
-                "total_received": {
-                    "$sum": {
-                        "$map": {
-                            "input": {"$filter": {"input": "$filtered_transactions", "cond": {"$eq": ["$$this.type", "income"]}}},
-                            "as": "t",
-                            "in": "$$t.amount"
-                        }
-                    }
-                },
-                "transaction_count": {"$size": "$filtered_transactions"},
-                "last_transaction_date": {"$max": "$filtered_transactions.transaction_date"}
-            }
-        }
-    ]
+    totals = await transaction_totals_by(db, "person_id", transaction_filter)
     
     summaries = []
-    async for doc in db.people.aggregate(pipeline):
-        total_sent = doc.get("total_sent", 0)
-        total_received = doc.get("total_received", 0)
+    async for person in db.people.find(match_filter, {"name": 1, "person_type": 1}):
+        person_totals = totals.get(str(person["_id"]), EMPTY_TOTALS)
+        total_sent = person_totals["total_expense"]
+        total_received = person_totals["total_income"]
         summaries.append(PersonSummaryData(
-            person_id=str(doc["_id"]),
-            person_name=doc["name"],
-            person_type=doc.get("person_type", "individual"),
+            person_id=str(person["_id"]),
+            person_name=person["name"],
+            person_type=person.get("person_type", "individual"),
             total_sent=total_sent,
             total_received=total_received,
             net_balance=total_received - total_sent,
-            transaction_count=doc.get("transaction_count", 0),
-            last_transaction_date=doc.get("last_transaction_date")
+            transaction_count=person_totals["transaction_count"],
+            last_transaction_date=person_totals["last_transaction_date"]
         ))
     
     return summaries
@@ -787,6 +540,7 @@ async def get_reports(
             end_date=report["end_date"],
             generated_at=report["generated_at"],
             status=report["status"],
+            progress=report.get("progress", 100),
             file_path=report.get("file_path")
         ))
     
@@ -816,6 +570,46 @@ async def get_report(
     report["_id"] = str(report["_id"])
     return Report(**report)
 
+@router.get("/{report_id}/export")
+async def export_report(
+    report_id: str,
+    export_format: str = Query("xlsx", alias="format", pattern="^(xlsx|pdf|csv)$", description="xlsx, pdf veya csv"),
+    current_user: User = Depends(get_current_user)
+):
+    """Raporu dosya olarak indir
+
+    Dosya ayrı bir süreçte üretilir ve diskte saklanır; aynı rapor tekrar
+    indirildiğinde yeniden üretilmez.
+    """
+    db = get_database()
+    
+    if not ObjectId.is_valid(report_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Geçersiz rapor ID"
+        )
+    
+    path = report_exporter.path(report_id, export_format)
+    if not os.path.exists(path):
+        report = await db.reports.find_one({"_id": ObjectId(report_id)}, {"title": 1, "status": 1, "data": 1})
+        if not report:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Rapor bulunamadı"
+            )
+        if report.get("status", REPORT_COMPLETED) != REPORT_COMPLETED:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Rapor henüz tamamlanmadı"
+            )
+        path = await report_exporter.export(report, export_format)
+    
+    return FileResponse(
+        path,
+        media_type=REPORT_EXPORT_FORMATS[export_format],
+        filename=f"rapor-{report_id}.{export_format}"
+    )
+
 @router.delete("/{report_id}")
 async def delete_report(
     report_id: str,
@@ -851,5 +645,6 @@ async def delete_report(
             pass
     
     await db.reports.delete_one({"_id": ObjectId(report_id)})
+    report_exporter.remove(report_id)
     
     return {"message": "Rapor silindi"}
\ No newline at end of file
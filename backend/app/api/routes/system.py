@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.api.routes.auth import get_admin_user
+from app.core.database import get_database
+from app.core.scheduler import scheduler
+from app.models.user import User
+
+router = APIRouter()
+
+
+@router.get("/scheduler")
+async def get_scheduler_jobs(
+    current_user: User = Depends(get_admin_user)
+):
+    """Periyodik görevler, son çalıştırmalar ve metrikler (admin)"""
+    return await scheduler.stats()
+
+
+@router.post("/scheduler/{job_name}/run")
+async def run_scheduler_job(
+    job_name: str,
+    current_user: User = Depends(get_admin_user)
+):
+    """Görevi zamanını beklemeden çalıştır (admin)"""
+    if not scheduler.has_job(job_name):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Görev bulunamadı"
+        )
+    ran = await scheduler.run(job_name, db=get_database())
+    if not ran:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Görev şu anda başka bir süreçte çalışıyor"
+        )
+    return {"message": "Görev çalıştırıldı", "job": job_name}
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query, File, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
+import asyncio
+import json
 import os
-import aiofiles
+import shutil
+import uuid
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,11 +27,27 @@ from app.models.payment_detail import AutoPersonCreate, PaymentDetailCreate
 from app.models.user import User
 from app.api.routes.auth import get_current_user
 from app.core.database import get_database
+from app.core.uploads import save_upload, extract_zip
+from app.core.pagination import paginate
 from app.core.config import settings
+from app.core.aggregation import lookup_by_id, top_n_pipeline
 from app.services.ai_service import ai_service
+from app.services.ai_jobs import ai_job_queue, accepted_response, JobContext
+from app.services.ledger_rollups import record_transaction
+from app.services.report_cache import bump_data_version
+from app.services.balance_service import adjust_bank_balance, settle_payment_order
+from app.services.export_service import select_fields, stream_export
+from app.services.blob_store import release_file, store_file, store_upload
 
 router = APIRouter()
 
+# Dışa aktarılabilen alanlar (varsayılan sütun sırası)
+EXPORT_FIELDS = (
+    "_id", "transaction_date", "type", "status", "amount", "currency", "total_fees",
+    "net_amount", "balance_impact", "bank_account_id", "person_id", "payment_order_id",
+    "reference_number", "description"
+)
+
 @router.get("/", response_model=List[Transaction])
 async def get_transactions(
     transaction_type: Optional[TransactionType] = Query(None, description="İşlem türüne göre filtrele"),
@@ -36,6 +57,8 @@ async def get_transactions(
     end_date: Optional[datetime] = Query(None, description="Bitiş tarihi"),
     limit: int = Query(50, le=100, description="Maksimum kayıt sayısı"),
     skip: int = Query(0, ge=0, description="Atlanacak kayıt sayısı"),
+    cursor: Optional[str] = Query(None, description="Sonraki sayfa imleci (X-Next-Cursor başlığı)"),
+    response: Response = None,
     current_user: User = Depends(get_current_user)
 ):
     """İşlemleri listele"""
@@ -58,9 +81,9 @@ async def get_transactions(
         filter_query["transaction_date"] = date_filter
     
     transactions = []
-    cursor = db.transactions.find(filter_query).sort("transaction_date", -1).skip(skip).limit(limit)
+    docs = await paginate(db.transactions, filter_query, "transaction_date", -1, limit, skip, cursor, response)
     
-    async for transaction in cursor:
+    for transaction in docs:
         transaction["_id"] = str(transaction["_id"])
         transactions.append(Transaction(**transaction))
     
@@ -73,43 +96,15 @@ async def get_transactions_summary(
     """İşlemlerin özet bilgilerini getir"""
     db = get_database()
     
-    # Aggregate pipeline ile bank account ve person bilgilerini join et
-    pipeline = [
-        {
-            "$addFields": {
-                "bank_account_oid": {"$toObjectId": "$bank_account_id"},
-                "person_oid": {
-                    "$cond": {
-                        "if": {"$ne": ["$person_id", None]},
-                        "then": {"$toObjectId": "$person_id"},
-                        "else": None
-                    }
-                }
-            }
-        },
-        {
-            "$lookup": {
-                "from": "bank_accounts",
-                "localField": "bank_account_oid",
-                "foreignField": "_id",
-                "as": "bank_account"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "people",
-                "localField": "person_oid",
-                "foreignField": "_id",
-                "as": "person"
-            }
-        },
-        {
-            "$sort": {"transaction_date": -1}
-        },
-        {
-            "$limit": 100
-        }
-    ]
+    # Önce son 100 işlemi seç, sonra bank account ve person bilgilerini join et
+    pipeline = top_n_pipeline(
+        sort={"transaction_date": -1},
+        limit=100,
+        enrich=[
+            lookup_by_id("bank_accounts", "bank_account_id", "bank_account"),
+            lookup_by_id("people", "person_id", "person")
+        ]
+    )
     
     summaries = []
     async for doc in db.transactions.aggregate(pipeline):
@@ -133,6 +128,46 @@ async def get_transactions_summary(
     
     return summaries
 
+@router.get("/export")
+async def export_transactions(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson veya csv"),
+    transaction_type: Optional[TransactionType] = Query(None, description="İşlem türüne göre filtrele"),
+    bank_account_id: Optional[str] = Query(None, description="Banka hesabına göre filtrele"),
+    status_filter: Optional[TransactionStatus] = Query(None, description="Duruma göre filtrele"),
+    start_date: Optional[datetime] = Query(None, description="Başlangıç tarihi"),
+    end_date: Optional[datetime] = Query(None, description="Bitiş tarihi"),
+    fields: Optional[str] = Query(None, description="Virgülle ayrılmış alanlar (boşsa tümü)"),
+    batch_size: int = Query(1000, ge=100, le=10000, description="Cursor batch boyutu"),
+    current_user: User = Depends(get_current_user)
+):
+    """İşlemleri NDJSON / CSV olarak akıtarak dışa aktar"""
+    db = get_database()
+    
+    filter_query = {}
+    if transaction_type:
+        filter_query["type"] = transaction_type
+    if bank_account_id:
+        filter_query["bank_account_id"] = bank_account_id
+    if status_filter:
+        filter_query["status"] = status_filter
+    if start_date or end_date:
+        date_filter = {}
+        if start_date:
+            date_filter["$gte"] = start_date
+        if end_date:
+            date_filter["$lte"] = end_date
+        filter_query["transaction_date"] = date_filter
+    
+    return stream_export(
+        db.transactions,
+        filter_query,
+        [("transaction_date", -1)],
+        select_fields(fields, EXPORT_FIELDS),
+        export_format,
+        f"transactions_{datetime.utcnow():%Y%m%d_%H%M%S}",
+        batch_size
+    )
+
 @router.get("/{transaction_id}", response_model=Transaction)
 async def get_transaction(
     transaction_id: str,
@@ -231,6 +266,7 @@ async def create_transaction(
             }
             
             auto_person_result = await db.people.insert_one(auto_person_data)
+            await bump_data_version(db, "people")
             person_id = str(auto_person_result.inserted_id)
     
     # Bakiye etkisini hesapla (giriş pozitif, çıkış negatif)
@@ -253,6 +289,7 @@ async def create_transaction(
     })
     
     result = await db.transactions.insert_one(transaction_dict)
+    await record_transaction(db, transaction_dict)
     
     # Otomatik ödeme detayı oluştur
     if person_id and transaction_data.type in [TransactionType.EXPENSE, TransactionType.INCOME]:
@@ -294,14 +331,7 @@ async def create_transaction(
             )
     
     # Banka hesabı bakiyesini güncelle
-    new_balance = bank_account["current_balance"] + balance_impact
-    await db.bank_accounts.update_one(
-        {"_id": ObjectId(transaction_data.bank_account_id)},
-        {"$set": {
-            "current_balance": new_balance,
-            "updated_at": now
-        }}
-    )
+    await adjust_bank_balance(db, transaction_data.bank_account_id, balance_impact)
     
     # Oluşturulan işlemi getir
     created_transaction = await db.transactions.find_one({"_id": result.inserted_id})
@@ -309,6 +339,33 @@ async def create_transaction(
     
     return Transaction(**created_transaction)
 
+def _receipt_analysis_result(ai_result: dict) -> ReceiptAnalysisResult:
+    """AI çıktısını ReceiptAnalysisResult formatına dönüştür"""
+    if ai_result.get("success"):
+        transaction_details = ai_result.get("transaction_details", {})
+        fees_and_charges = ai_result.get("fees_and_charges", {})
+        amount_breakdown = ai_result.get("amount_breakdown", {})
+        recipient_info = ai_result.get("recipient_info", {})
+        
+        return ReceiptAnalysisResult(
+            success=True,
+            extracted_amount=transaction_details.get("amount"),
+            extracted_date=datetime.fromisoformat(transaction_details.get("date")) if transaction_details.get("date") else None,
+            extracted_bank=ai_result.get("bank_info", {}).get("bank_name"),
+            extracted_account=ai_result.get("sender_account", {}).get("iban"),
+            extracted_reference=transaction_details.get("reference_number"),
+            extracted_fees=fees_and_charges,
+            total_extracted_fees=amount_breakdown.get("total_fees", 0.0),
+            recipient_info=recipient_info,
+            confidence_score=ai_result.get("confidence_score", 0.0),
+            raw_text=str(ai_result)
+        )
+    return ReceiptAnalysisResult(
+        success=False,
+        error_message=ai_result.get("error", "Dekont analizi başarısız"),
+        confidence_score=0.0
+    )
+
 @router.post("/analyze-receipt", response_model=ReceiptAnalysisResult)
 async def analyze_receipt_file(
     file: UploadFile = File(...),
@@ -330,22 +387,13 @@ async def analyze_receipt_file(
             detail="Sadece JPEG, PNG ve PDF dosyaları desteklenir"
         )
 
-    # Dosya boyutu kontrolü
-    if file.size > settings.max_file_size:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Dosya boyutu çok büyük (maksimum 10MB)"
-        )
-
     try:
         # Dosyayı geçici olarak kaydet
         file_extension = file.filename.split(".")[-1]
         temp_filename = f"temp_receipt_{int(datetime.utcnow().timestamp())}.{file_extension}"
         temp_file_path = os.path.join(settings.upload_dir, temp_filename)
 
-        async with aiofiles.open(temp_file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        await save_upload(file, temp_file_path)
 
         # AI analizi
         ai_result = await ai_service.analyze_receipt(temp_file_path)
@@ -356,35 +404,10 @@ async def analyze_receipt_file(
         except:
             pass
 
-        # Sonucu ReceiptAnalysisResult formatına dönüştür
-        if ai_result.get("success"):
-            transaction_details = ai_result.get("transaction_details", {})
-            fees_and_charges = ai_result.get("fees_and_charges", {})
-            amount_breakdown = ai_result.get("amount_breakdown", {})
-            recipient_info = ai_result.get("recipient_info", {})
-            
-            result = ReceiptAnalysisResult(
-                success=True,
-                extracted_amount=transaction_details.get("amount"),
-                extracted_date=datetime.fromisoformat(transaction_details.get("date")) if transaction_details.get("date") else None,
-                extracted_bank=ai_result.get("bank_info", {}).get("bank_name"),
-                extracted_account=ai_result.get("sender_account", {}).get("iban"),
-                extracted_reference=transaction_details.get("reference_number"),
-                extracted_fees=fees_and_charges,
-                total_extracted_fees=amount_breakdown.get("total_fees", 0.0),
-                recipient_info=recipient_info,
-                confidence_score=ai_result.get("confidence_score", 0.0),
-                raw_text=str(ai_result)
-            )
-        else:
-            result = ReceiptAnalysisResult(
-                success=False,
-                error_message=ai_result.get("error", "Dekont analizi başarısız"),
-                confidence_score=0.0
-            )
-
-        return result
+        return _receipt_analysis_result(ai_result)
 
+    except HTTPException:
+        raise
     except Exception as e:
         # Geçici dosyayı temizle
         try:
@@ -397,6 +420,201 @@ async def analyze_receipt_file(
             detail=f"Dekont analizi başarısız: {str(e)}"
         )
 
+RECEIPT_EXTENSIONS = ("jpg", "jpeg", "png", "pdf")
+RECEIPT_CONTENT_TYPES = ("image/jpeg", "image/png", "application/pdf")
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+
+def _receipt_draft(ai_result: dict, filename: str, receipt_path: str, bank_account_id: str, user_id: str, now: datetime) -> Optional[dict]:
+    """Başarılı dekont analizinden taslak (pending) işlem dokümanı üret
+
+    Taslak bakiyeye ve özetlere yansımaz (balance_impact 0, status pending);
+    tutar okunamadıysa taslak oluşturulmaz.
+    """
+    transaction_details = ai_result.get("transaction_details") or {}
+    amount_breakdown = ai_result.get("amount_breakdown") or {}
+    amount = transaction_details.get("amount")
+    if not isinstance(amount, (int, float)) or amount <= 0:
+        return None
+
+    total_fees = amount_breakdown.get("total_fees") or 0.0
+    date = transaction_details.get("date")
+    return {
+        "type": TransactionType.EXPENSE,
+        "amount": amount,
+        "currency": transaction_details.get("currency") or "TRY",
+        "description": ai_result.get("description") or f"Dekont: {filename}",
+        "reference_number": transaction_details.get("reference_number"),
+        "bank_account_id": bank_account_id,
+        "fees": ai_result.get("fees_and_charges") or {},
+        "total_fees": total_fees,
+        "net_amount": amount_breakdown.get("net_deducted") or amount + total_fees,
+        "balance_impact": 0.0,
+        "ai_extracted_data": {
+            "analysis_result": ai_result,
+            "confidence_score": ai_result.get("confidence_score", 0.0),
+            "analysis_date": now.isoformat(),
+            "source": "batch_receipt_analysis"
+        },
+        "transaction_date": datetime.fromisoformat(date) if date else now,
+        "status": TransactionStatus.PENDING,
+        "receipt_url": receipt_path,
+        "receipt_filename": filename,
+        "receipt_analysis": ai_result,
+        "created_by": user_id,
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+async def _analyze_batch_item(index: int, filename: str, path: str):
+    try:
+        ai_result = await ai_service.analyze_receipt(path)
+        result = _receipt_analysis_result(ai_result)
+    except Exception as e:
+        logger.error(f"Batch receipt analysis failed for {filename}: {e}")
+        ai_result = {"success": False, "error": str(e)}
+        result = ReceiptAnalysisResult(success=False, error_message=str(e), confidence_score=0.0)
+    return index, filename, path, ai_result, result
+
+
+def _ndjson_line(data: dict) -> bytes:
+    return (json.dumps(jsonable_encoder(data), ensure_ascii=False) + "\n").encode("utf-8")
+
+
+@router.post("/analyze-receipts/batch")
+async def analyze_receipts_batch(
+    files: List[UploadFile] = File(..., description="Dekont dosyaları veya dekont içeren ZIP arşivi"),
+    create_drafts: bool = Query(False, description="Başarılı analizlerden taslak (bekleyen) işlem oluştur"),
+    bank_account_id: Optional[str] = Query(None, description="Taslak işlemlerin banka hesabı"),
+    current_user: User = Depends(get_current_user)
+):
+    """Birden çok dekontu eşzamanlı analiz et
+
+    Dosyalar aynı anda analiz edilir (eşzamanlılık ve istek/dakika sınırı
+    AI servisinde uygulanır); her dosyanın sonucu tamamlandığı sırayla NDJSON
+    satırı olarak akıtılır, son satır özet bilgisidir.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Bu işlem için admin yetkisi gerekli"
+        )
+
+    db = get_database()
+
+    if create_drafts:
+        if not bank_account_id or not ObjectId.is_valid(bank_account_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Taslak işlem için geçerli bir banka hesabı gerekli"
+            )
+        if not await db.bank_accounts.find_one({"_id": ObjectId(bank_account_id)}, {"_id": 1}):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Banka hesabı bulunamadı"
+            )
+
+    # Yanıt akışı başlamadan tüm dosyalar diske alınır
+    batch_dir = os.path.join(settings.upload_dir, "batch", uuid.uuid4().hex)
+    items = []
+    try:
+        for upload in files:
+            filename = upload.filename or "dosya"
+            extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+            if upload.content_type in ZIP_CONTENT_TYPES or extension == "zip":
+                archive = await save_upload(
+                    upload,
+                    os.path.join(batch_dir, f"{uuid.uuid4().hex}.zip"),
+                    max_size=settings.max_archive_size
+                )
+                items.extend(await asyncio.to_thread(
+                    extract_zip,
+                    archive.path,
+                    batch_dir,
+                    RECEIPT_EXTENSIONS,
+                    settings.receipt_batch_max_files
+                ))
+                os.remove(archive.path)
+            elif upload.content_type in RECEIPT_CONTENT_TYPES and extension in RECEIPT_EXTENSIONS:
+                stored = await save_upload(upload, os.path.join(batch_dir, f"{uuid.uuid4().hex}.{extension}"))
+                items.append((filename, stored.path))
+            else:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{filename}: Sadece JPEG, PNG, PDF veya ZIP dosyaları desteklenir"
+                )
+
+            if len(items) > settings.receipt_batch_max_files:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Tek seferde en fazla {settings.receipt_batch_max_files} dekont analiz edilebilir"
+                )
+    except BaseException:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        raise
+
+    if not items:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Analiz edilecek dekont bulunamadı"
+        )
+
+    async def results():
+        tasks = [
+            asyncio.create_task(_analyze_batch_item(index, filename, path))
+            for index, (filename, path) in enumerate(items)
+        ]
+        try:
+            successful = []
+            for next_done in asyncio.as_completed(tasks):
+                index, filename, path, ai_result, result = await next_done
+                if result.success:
+                    successful.append((index, filename, path, ai_result))
+                yield _ndjson_line({
+                    "type": "result",
+                    "index": index,
+                    "filename": filename,
+                    "result": result.model_dump()
+                })
+
+            drafts = []
+            if create_drafts and successful:
+                now = datetime.utcnow()
+                draft_docs = []
+                for index, filename, path, ai_result in sorted(successful):
+                    try:
+                        draft = _receipt_draft(ai_result, filename, path, bank_account_id, current_user.id, now)
+                    except ValueError:
+                        draft = None
+                    if draft:
+                        # Dekont içerik adresli depoya alınır, taslak ona referans verir
+                        draft["receipt_url"] = await store_file(db, path)
+                        draft_docs.append((index, draft))
+                if draft_docs:
+                    inserted = await db.transactions.insert_many([draft for _, draft in draft_docs])
+                    await bump_data_version(db, "transactions", [draft.get("transaction_date") for _, draft in draft_docs])
+                    drafts = [
+                        {"index": index, "transaction_id": str(transaction_id)}
+                        for (index, _), transaction_id in zip(draft_docs, inserted.inserted_ids)
+                    ]
+
+            yield _ndjson_line({
+                "type": "summary",
+                "total": len(items),
+                "succeeded": len(successful),
+                "failed": len(items) - len(successful),
+                "drafts": drafts
+            })
+        finally:
+            # İstemci bağlantıyı keserse bekleyen analizleri iptal et
+            for task in tasks:
+                task.cancel()
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @router.post("/process-receipt-payment")
 async def process_receipt_and_create_transaction(
     payment_order_id: str,
@@ -447,15 +665,11 @@ async def process_receipt_and_create_transaction(
             detail="Banka hesabı bulunamadı"
         )
 
+    receipt_path = None
     try:
-        # Dosyayı kalıcı olarak kaydet
-        file_extension = file.filename.split(".")[-1]
-        receipt_filename = f"receipt_{payment_order_id}_{int(datetime.utcnow().timestamp())}.{file_extension}"
-        receipt_path = os.path.join(settings.upload_dir, receipt_filename)
-
-        async with aiofiles.open(receipt_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        # Dosyayı içerik adresli depoya kaydet (aynı dekont tek kopya tutulur)
+        receipt_path = await store_upload(db, file)
+        receipt_filename = os.path.basename(receipt_path)
 
         # AI ile dekont analizi
         ai_result = await ai_service.analyze_receipt(receipt_path)
@@ -492,13 +706,6 @@ async def process_receipt_and_create_transaction(
                 "error": "AI analizi başarısız, manuel değerler kullanıldı"
             }
 
-        # Bakiye kontrolü
-        if bank_account["current_balance"] < net_amount:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Yetersiz bakiye. Gerekli: {net_amount}, Mevcut: {bank_account['current_balance']}"
-            )
-
         # Transaction oluştur
         transaction_dict = {
             "type": "expense",
@@ -523,46 +730,41 @@ async def process_receipt_and_create_transaction(
             "updated_at": now
         }
         
-        # Transaction'ı kaydet
-        transaction_result = await db.transactions.insert_one(transaction_dict)
-        
-        # Ödeme emrini güncelle
-        await db.payment_orders.update_one(
-            {"_id": ObjectId(payment_order_id)},
-            {"$set": {
-                "status": "completed",
+        # Emri sahiplen, bakiyeyi düş ve işlemi kaydet (tek adımda)
+        updated_account, transaction_id = await settle_payment_order(
+            db,
+            payment_order_id,
+            ["approved"],
+            bank_account_id,
+            float(net_amount),
+            {
                 "bank_account_id": bank_account_id,
                 "receipt_url": receipt_path,
                 "completed_at": now,
                 "updated_at": now
-            }}
-        )
-        
-        # Banka hesabı bakiyesini güncelle
-        new_balance = bank_account["current_balance"] - net_amount
-        await db.bank_accounts.update_one(
-            {"_id": ObjectId(bank_account_id)},
-            {"$set": {
-                "current_balance": new_balance,
-                "updated_at": now
-            }}
+            },
+            transaction_dict
         )
 
         return {
             "message": "Ödeme başarıyla tamamlandı",
-            "transaction_id": str(transaction_result.inserted_id),
+            "transaction_id": str(transaction_id),
             "extracted_amount": extracted_amount,
             "total_fees": total_fees,
             "net_deducted": net_amount,
-            "new_balance": new_balance,
+            "new_balance": updated_account["current_balance"],
             "ai_confidence": ai_result.get("confidence_score", 0.0),
             "receipt_filename": receipt_filename
         }
 
+    except HTTPException:
+        # Hata durumunda dosya referansını bırak
+        await release_file(db, receipt_path)
+        raise
     except Exception as e:
-        # Hata durumunda dosyayı temizle
+        # Hata durumunda dosya referansını bırak
         try:
-            os.remove(receipt_path)
+            await release_file(db, receipt_path)
         except:
             pass
         
@@ -641,65 +843,24 @@ async def delete_transaction(
         )
     
     # Bakiye düzeltmesi (işlemi geri al)
-    bank_account = await db.bank_accounts.find_one({"_id": ObjectId(transaction["bank_account_id"])})
-    if bank_account:
-        # Balance impact'i ters çevir
-        balance_correction = -transaction.get("balance_impact", 0)
-        new_balance = bank_account["current_balance"] + balance_correction
-        
-        await db.bank_accounts.update_one(
-            {"_id": ObjectId(transaction["bank_account_id"])},
-            {"$set": {
-                "current_balance": new_balance,
-                "updated_at": datetime.utcnow()
-            }}
-        )
+    # Balance impact'i ters çevir (hesap yoksa güncelleme yapılmaz)
+    await adjust_bank_balance(db, transaction["bank_account_id"], -transaction.get("balance_impact", 0))
     
-    # Dekont dosyasını sil
+    # Dekont dosyası referansını bırak
     if transaction.get("receipt_url"):
         try:
-            os.remove(transaction["receipt_url"])
+            await release_file(db, transaction["receipt_url"])
         except:
             pass
     
     # İşlemi sil
     await db.transactions.delete_one({"_id": ObjectId(transaction_id)})
+    await record_transaction(db, transaction, sign=-1)
     
     return {"message": "İşlem silindi ve bakiye düzeltildi"}
 
-@router.post("/{transaction_id}/analyze")
-async def analyze_transaction_with_ai(
-    transaction_id: str,
-    current_user: User = Depends(get_current_user)
-):
-    """AI ile işlem analizi yap"""
-    from app.services.ai_service import ai_service
-    
-    db = get_database()
-    
-    # Transaction ID validation
-    if not transaction_id or transaction_id == "undefined":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Geçersiz işlem ID"
-        )
-    
-    try:
-        transaction_oid = ObjectId(transaction_id)
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Geçersiz işlem ID formatı"
-        )
-    
-    # İşlemi getir
-    transaction = await db.transactions.find_one({"_id": transaction_oid})
-    if not transaction:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="İşlem bulunamadı"
-        )
-    
+async def _analyze_transaction(db, transaction: dict) -> dict:
+    """İşlemi (ve bağlı ödeme emrini) AI ile analiz et"""
     try:
         # Ödeme emri bilgilerini de al
         payment_order = None
@@ -762,6 +923,57 @@ Bu işlem hakkında daha spesifik sorularınız var mı?"""
         logger.error(f"AI analysis error: {e}")
         return {"analysis": "AI analizi şu anda kullanılamıyor. İşlem bilgileri normal görünüyor."}
 
+@ai_job_queue.handler("analyze_transaction")
+async def _analyze_transaction_job(ctx: JobContext):
+    transaction = await ctx.db.transactions.find_one({"_id": ObjectId(ctx.payload["transaction_id"])})
+    if not transaction:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="İşlem bulunamadı"
+        )
+    await ctx.progress(10, "İşlem analiz ediliyor")
+    return await _analyze_transaction(ctx.db, transaction)
+
+@router.post("/{transaction_id}/analyze")
+async def analyze_transaction_with_ai(
+    transaction_id: str,
+    run_async: bool = Query(False, alias="async", description="Arka planda işle, iş kimliği döndür"),
+    current_user: User = Depends(get_current_user)
+):
+    """AI ile işlem analizi yap"""
+    db = get_database()
+    
+    # Transaction ID validation
+    if not transaction_id or transaction_id == "undefined":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Geçersiz işlem ID"
+        )
+    
+    try:
+        transaction_oid = ObjectId(transaction_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Geçersiz işlem ID formatı"
+        )
+    
+    # İşlemi getir
+    transaction = await db.transactions.find_one({"_id": transaction_oid})
+    if not transaction:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="İşlem bulunamadı"
+        )
+    
+    if run_async:
+        job = await ai_job_queue.submit(
+            db, "analyze_transaction", {"transaction_id": transaction_id}, current_user.id
+        )
+        return accepted_response(job)
+    
+    return await _analyze_transaction(db, transaction)
+
 @router.post("/{transaction_id}/chat")
 async def chat_with_ai_about_transaction(
     transaction_id: str,
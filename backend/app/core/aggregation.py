@@ -0,0 +1,94 @@
+"""
+Aggregation yardımcıları
+
+"Önce ilk N kaydı seç, sonra zenginleştir" kalıbı: $match → $sort → $skip →
+$limit aşamaları koleksiyon indeksleriyle çalışır, $lookup'lar yalnızca
+seçilen N doküman için yapılır. Böylece sorgu maliyeti koleksiyonun toplam
+boyutuna değil, istenen satır sayısına bağlı kalır.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from bson import ObjectId
+
+
+def lookup_by_id(from_collection: str, local_field: str, as_field: str) -> List[Dict[str, Any]]:
+    """Referans alanını ObjectId'ye çevirip _id üzerinden join eden aşamalar
+
+    transactions / payment_details içindeki referanslar string olarak
+    saklandığından doğrudan localField/foreignField eşleşmesi çalışmaz.
+    Geçersiz veya boş referanslar boş dizi ile sonuçlanır.
+    """
+    oid_field = f"_{as_field}_oid"
+    return [
+        {
+            "$addFields": {
+                oid_field: {
+                    "$convert": {
+                        "input": f"${local_field}",
+                        "to": "objectId",
+                        "onError": None,
+                        "onNull": None
+                    }
+                }
+            }
+        },
+        {
+            "$lookup": {
+                "from": from_collection,
+                "localField": oid_field,
+                "foreignField": "_id",
+                "as": as_field
+            }
+        },
+        {"$project": {oid_field: 0}}
+    ]
+
+
+def reference_values(ids: Iterable[str]) -> List[Any]:
+    """Referans filtresi için kimliklerin hem string hem ObjectId hâli
+
+    Referanslar string saklanır ama eski kayıtlarda ObjectId de bulunabilir;
+    {"$in": reference_values(ids)} ikisini de yakalar.
+    """
+    values: List[Any] = []
+    for value in ids:
+        values.append(value)
+        if ObjectId.is_valid(value):
+            values.append(ObjectId(value))
+    return values
+
+
+def top_n_pipeline(
+    sort: Dict[str, int],
+    limit: int,
+    match: Optional[Dict[str, Any]] = None,
+    skip: int = 0,
+    enrich: Sequence[List[Dict[str, Any]]] = (),
+    post_match: Optional[Dict[str, Any]] = None,
+    project: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """İlk N kaydı seçip ardından zenginleştiren pipeline oluştur
+
+    enrich: lookup_by_id çıktıları (her biri bir aşama listesi)
+    post_match: zenginleştirme sonrası filtre (ör. eşleşen kişi zorunlu)
+    """
+    pipeline: List[Dict[str, Any]] = []
+    if match:
+        pipeline.append({"$match": match})
+    pipeline.append({"$sort": sort})
+    if skip:
+        pipeline.append({"$skip": skip})
+    pipeline.append({"$limit": limit})
+    for stages in enrich:
+        pipeline.extend(stages)
+    if post_match:
+        pipeline.append({"$match": post_match})
+    if project:
+        pipeline.append({"$project": project})
+    return pipeline
+
+
+async def top_n(collection, **kwargs) -> List[Dict[str, Any]]:
+    """top_n_pipeline'ı çalıştırıp sonuç listesini döndür"""
+    pipeline = top_n_pipeline(**kwargs)
+    return await collection.aggregate(pipeline).to_list(None)
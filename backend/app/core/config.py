@@ -5,18 +5,76 @@ class Settings(BaseSettings):
     # Database
     mongodb_url: str = "mongodb://localhost:27017"
     database_name: str = "muhasebe_db"
+    mongodb_transactions: bool = False  # Replica set varsa çok dokümanlı transaction kullan
     
     # Security
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    auth_user_cache_ttl_seconds: float = 30.0  # 0 ise önbellek kapalı
+    auth_user_cache_max_entries: int = 1024
+    # Açıksa kullanıcı bilgisi DB'ye gitmeden imzalı token'dan alınır; değişiklikler
+    # (ör. kullanıcı adı / rol) ancak token süresi dolunca yansır
+    auth_trust_token_claims: bool = False
     
     # AI Services
     gemini_api_key: Optional[str] = None
+    ai_max_workers: int = 4
+    ai_max_concurrency: int = 4
+    ai_timeout_seconds: float = 60.0
+    ai_requests_per_minute: float = 0  # Model çağrı kotası (0: sınırsız)
+    ai_cache_max_entries: int = 512
+    ai_cache_ttl_seconds: int = 7 * 24 * 60 * 60  # 7 gün
+    ai_backend: str = "gemini"  # "fake": ağ gerektirmeyen yerel sahte model
+    ai_fake_latency_seconds: float = 2.0
+    # Vision çağrılarından önce görsel ön işleme
+    ai_image_max_dimension: int = 1600
+    ai_image_jpeg_quality: int = 80
+    ai_image_grayscale: bool = True
+    ai_image_autocrop: bool = True
+    ai_image_cache_max_entries: int = 64
+    # PDF dekontlar: metin katmanı varsa metin, yoksa ilk sayfaların görüntüsü
+    pdf_max_pages: int = 2
+    pdf_min_text_chars: int = 40
+    pdf_render_dpi: int = 150
+    pdf_workers: int = 2
+    pdf_cache_max_entries: int = 64
+    # Kural tabanlı dekont ayrıştırıcı: skor bu eşiğin altındaysa modele gidilir
+    receipt_parser_enabled: bool = True
+    receipt_parser_min_confidence: float = 0.8
+    ai_job_workers: int = 2  # Arka planda aynı anda işlenen AI işi sayısı
+    ai_job_retention_hours: int = 24
+    ai_job_heartbeat_seconds: int = 30  # Çalışan iş updated_at'ini bu aralıkla yeniler
+    ai_job_stale_seconds: int = 3 * 60  # Bu süre heartbeat gelmeyen "running" iş yarım kalmış sayılır
+    ai_job_requeue_seconds: int = 60  # Bu süre alınmayan "queued" iş yeniden kuyruğa alınır
+    # Bildirim gönderimi (outbox)
+    notification_transport: str = "log"  # "memory": testler için bellekte tutar
+    notification_batch_size: int = 100
+    notification_channel_concurrency: int = 20  # Kanal başına eşzamanlı gönderim
+    notification_send_timeout_seconds: float = 10.0
+    notification_max_attempts: int = 5
+    notification_retry_base_seconds: float = 30.0
+    notification_retry_max_seconds: float = 60 * 60
+    notification_poll_seconds: float = 15.0
+    notification_outbox_retention_hours: int = 7 * 24
+    due_notification_days: int = 3  # Bu kadar gün içinde vadesi gelenler bildirilir
+    # Periyodik görevler (app.core.scheduler)
+    scheduler_enabled: bool = True
+    scheduler_lease_seconds: int = 10 * 60
+    # Geçmiş aralık raporlarının önbelleği (app.services.report_cache)
+    report_cache_enabled: bool = True
+    report_cache_retention_days: int = 90
+    report_job_workers: int = 2  # Arka planda aynı anda üretilen rapor sayısı
+    report_job_heartbeat_seconds: int = 30  # Üretilen rapor updated_at'ini bu aralıkla yeniler
+    report_job_stale_seconds: int = 3 * 60  # Bu süre heartbeat gelmeyen "running" rapor yarım kalmış sayılır
+    report_export_dir: str = "report_exports"  # uploads altında değil: statik olarak sunulmamalı
+    report_export_workers: int = 2
     
     # File uploads
     upload_dir: str = "uploads"
     max_file_size: int = 10 * 1024 * 1024  # 10MB
+    max_archive_size: int = 200 * 1024 * 1024  # Toplu dekont ZIP'i, 200MB
+    receipt_batch_max_files: int = 100
     
     class Config:
         env_file = ".env"
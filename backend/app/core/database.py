@@ -1,5 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import settings
+from app.core.indexes import ensure_indexes
 
 class Database:
     client: AsyncIOMotorClient = None
@@ -18,6 +19,13 @@ async def connect_to_mongo():
         print("Successfully connected to MongoDB")
     except Exception as e:
         print(f"Error connecting to MongoDB: {e}")
+        return
+    
+    # Tanımlı indeksleri uygula (idempotent)
+    try:
+        await ensure_indexes(db.database)
+    except Exception as e:
+        print(f"Error applying indexes: {e}")
 
 async def close_mongo_connection():
     """Close database connection"""
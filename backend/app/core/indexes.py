@@ -0,0 +1,150 @@
+"""
+İndeks tanımları
+
+Her koleksiyonun indeksleri burada bildirimsel olarak tutulur ve uygulama
+açılışında connect_to_mongo tarafından idempotent şekilde uygulanır.
+Bileşik indeksler route'ların filtre + sıralama şekline göre sıralanmıştır
+(önce eşitlik alanları, sonra sıralama / aralık alanı). İmleçle sayfalanan
+listelerin indeksleri aynı yönde _id ile biter (bkz. app.core.pagination).
+"""
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+    "bank_accounts": [
+        IndexModel([("iban", ASCENDING)], unique=True),
+    ],
+    "people": [
+        IndexModel([("iban", ASCENDING)]),
+        IndexModel([("name", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("person_type", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "transactions": [
+        # Liste, son işlemler, AI geçmişi
+        IndexModel([("transaction_date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("type", ASCENDING), ("status", ASCENDING), ("transaction_date", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("transaction_date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("bank_account_id", ASCENDING), ("transaction_date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("person_id", ASCENDING), ("transaction_date", DESCENDING)]),
+        IndexModel([("created_by", ASCENDING), ("transaction_date", DESCENDING)]),
+        IndexModel([("payment_order_id", ASCENDING)], sparse=True),
+    ],
+    "payment_orders": [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("created_by", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("category", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "payment_details": [
+        IndexModel([("payment_date", DESCENDING)]),
+        IndexModel([("person_id", ASCENDING), ("payment_date", DESCENDING)]),
+    ],
+    "checks": [
+        IndexModel([("due_date", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("check_type", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "check_operations": [
+        IndexModel([("check_id", ASCENDING), ("operation_date", DESCENDING)]),
+    ],
+    "debts": [
+        IndexModel([("due_date", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("debt_type", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "debt_payments": [
+        IndexModel([("debt_id", ASCENDING), ("payment_date", DESCENDING)]),
+    ],
+    "credit_cards": [
+        IndexModel([("created_at", DESCENDING)]),
+    ],
+    "credit_card_transactions": [
+        IndexModel([("credit_card_id", ASCENDING), ("transaction_date", DESCENDING)]),
+    ],
+    "notifications": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        # Vade bildirimlerinin tekilliği (bkz. app.services.due_notifications)
+        IndexModel([("dedupe_key", ASCENDING)], unique=True, sparse=True),
+    ],
+    "income_sources": [
+        IndexModel([("name", ASCENDING)]),
+    ],
+    "income_records": [
+        IndexModel([("expected_date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("income_source_id", ASCENDING), ("expected_date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("income_date", ASCENDING)]),
+    ],
+    "employees": [
+        IndexModel([("status", ASCENDING), ("hire_date", DESCENDING)]),
+    ],
+    "reports": [
+        IndexModel([("generated_at", DESCENDING)]),
+        # Yarım kalan arka plan raporlarının periyodik taranması
+        IndexModel([("status", ASCENDING), ("updated_at", ASCENDING)]),
+    ],
+    "dashboard_layouts": [
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    "ledger_rollups": [
+        IndexModel(
+            [("date", ASCENDING), ("bank_account_id", ASCENDING), ("type", ASCENDING), ("currency", ASCENDING)],
+            unique=True,
+            name="ledger_rollup_key"
+        ),
+    ],
+    "blobs": [
+        IndexModel([("path", ASCENDING)], unique=True),
+    ],
+    "ai_jobs": [
+        # Bekleyen / yarım kalan işlerin periyodik taranması
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("updated_at", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "notification_outbox": [
+        # Kanal worker'larının vadesi gelen kayıtları seçmesi
+        IndexModel([("channel", ASCENDING), ("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+        IndexModel([("notification_id", ASCENDING)]),
+        IndexModel([("claim", ASCENDING)], sparse=True),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "ai_result_cache": [
+        # Süresi dolan kayıtları MongoDB kendisi temizler
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "report_cache": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+async def ensure_collection_indexes(db, collection_name: str) -> List[str]:
+    """Tek bir koleksiyonun tanımlı indekslerini oluştur"""
+    models = INDEX_SPECS.get(collection_name, [])
+    created = []
+    for model in models:
+        try:
+            created.extend(await db[collection_name].create_indexes([model]))
+        except OperationFailure as e:
+            # Aynı anahtarlarla farklı seçenek/isimde indeks varsa uygulamayı durdurma
+            logger.warning(f"Index {collection_name}.{model.document['name']} not applied: {e}")
+    return created
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Tüm tanımlı indeksleri uygula (mevcut olanlar değişmeden kalır)"""
+    results = {}
+    for collection_name in INDEX_SPECS:
+        results[collection_name] = await ensure_collection_indexes(db, collection_name)
+    return results
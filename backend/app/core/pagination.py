@@ -0,0 +1,93 @@
+"""
+İmleç (keyset) tabanlı sayfalama
+
+skip/limit ile derin sayfalar atlanan kayıt sayısı kadar yavaşlar. Burada
+sıralama alanı + _id ikilisi opak bir imlece kodlanır ve sonraki sayfa
+"bu ikiliden sonra gelenler" filtresiyle okunur; (alan, _id) indeksiyle her
+sayfanın maliyeti ilk sayfayla aynıdır.
+
+Liste endpoint'lerinin yanıt gövdesi (liste) değişmesin diye sonraki sayfanın
+imleci NEXT_CURSOR_HEADER başlığında döner; son sayfada başlık gönderilmez.
+"""
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
+from fastapi import HTTPException, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(doc: Dict[str, Any], sort_field: str) -> str:
+    """Dokümanın sıralama değeri ve _id'sinden opak imleç üret"""
+    raw = json_util.dumps({"v": doc.get(sort_field), "id": ObjectId(doc["_id"])})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+    """İmleci (sıralama değeri, _id) ikilisine çöz"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return data["v"], ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, binascii.Error, InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Geçersiz sayfalama imleci"
+        )
+
+
+def keyset_filter(sort_field: str, direction: int, cursor: str) -> Dict[str, Any]:
+    """İmleçteki kayıttan sonra gelen dokümanları seçen filtre"""
+    value, last_id = decode_cursor(cursor)
+    op = "$lt" if direction < 0 else "$gt"
+    same_value = {sort_field: value, "_id": {op: last_id}}
+
+    if value is None:
+        # null değerler en küçük sayılır: azalan sırada sonrası yalnızca null'lar,
+        # artan sırada null olmayan tüm değerler
+        if direction < 0:
+            return same_value
+        return {"$or": [same_value, {sort_field: {"$ne": None}}]}
+
+    after = [{sort_field: {op: value}}, same_value]
+    if direction < 0:
+        # Azalan sırada null / eksik değerler en sonda gelir; null olmayan bir
+        # imleçten sonra hepsi henüz okunmamıştır (kendi aralarında _id ile
+        # sıralanırlar, bkz. yukarıdaki value is None dalı)
+        after.append({sort_field: None})
+    return {"$or": after}
+
+
+async def paginate(
+    collection,
+    filter_query: Dict[str, Any],
+    sort_field: str,
+    direction: int,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    response: Optional[Response] = None
+) -> List[Dict[str, Any]]:
+    """Bir sayfa doküman getir; devamı varsa imleci yanıt başlığına yaz
+
+    cursor verildiğinde skip yok sayılır.
+    """
+    query = filter_query
+    if cursor:
+        query = {"$and": [filter_query, keyset_filter(sort_field, direction, cursor)]}
+        skip = 0
+
+    find_cursor = collection.find(query).sort([(sort_field, direction), ("_id", direction)])
+    if skip:
+        find_cursor = find_cursor.skip(skip)
+    docs = await find_cursor.limit(limit + 1).to_list(None)
+
+    if len(docs) > limit:
+        docs = docs[:limit]
+        if response is not None:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1], sort_field)
+
+    return docs
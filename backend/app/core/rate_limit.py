@@ -0,0 +1,43 @@
+"""
+Asenkron hız sınırlayıcı (token bucket)
+
+Dış servis kotalarına (ör. Gemini istek/dakika) uymak için kullanılır.
+Eşzamanlılık sınırından (semaphore) farklı olarak birim zamandaki çağrı
+sayısını sınırlar; toplu işlerde aynı anda çok sayıda çağrı kuyruğa
+girdiğinde istekler kotaya göre zamana yayılır.
+"""
+import asyncio
+import time
+from typing import Optional
+
+
+class AsyncRateLimiter:
+    def __init__(self, rate_per_minute: float, burst: Optional[int] = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, int(rate_per_minute // 60)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_second > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    async def acquire(self):
+        """Bir çağrı hakkı alınana kadar bekle (sınır kapalıysa hemen döner)"""
+        if not self.enabled:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Bekleyenler sırayla hak alır
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate_per_second)
+                self._refill()
+            self._tokens -= 1
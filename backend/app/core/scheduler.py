@@ -0,0 +1,266 @@
+"""
+Periyodik görev zamanlayıcı
+
+Görevler cron ifadesiyle (dakika saat gün ay haftanın-günü, UTC) kaydedilir
+ve uygulama içinde asyncio görevleri olarak çalışır. Birden fazla uvicorn
+worker'ı / sunucu varken her çalıştırmayı yalnızca biri yapar:
+scheduler_leases koleksiyonundaki görev dokümanı atomik olarak "kiralanır"
+(find_one_and_update). Kira, görev sürdüğü sürece yenilenir; süreç ölürse
+kira süresi dolunca başka bir worker devralır. Aynı zamanlanmış çalıştırma
+(scheduled_for) ikinci kez alınmaz.
+
+jitter_seconds: çalıştırma, zamanından itibaren rastgele bu kadar
+geciktirilir (aynı dakikadaki görevler veritabanına aynı anda yüklenmesin).
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LEASE_COLLECTION = "scheduler_leases"
+
+JobFunction = Callable[[Any], Awaitable[Any]]
+
+# Haftanın günü alanında 0 ve 7 Pazar
+CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> Set[int]:
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/")
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-"))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Geçersiz cron alanı: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """5 alanlı cron ifadesi: '*/15 * * * *', '0 3 * * 1-5', '30 8 1,15 * *'"""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron ifadesi 5 alan içermeli: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_RANGES)
+        )
+        # Cron'da 0 ve 7 = Pazar, Python'da weekday() 6 = Pazar
+        self.weekdays = {(day - 1) % 7 for day in weekdays}
+        # Cron'daki gibi "*" ile başlayan alan ("*/2" dahil) kısıtsız sayılır
+        self._any_day = fields[2].startswith("*")
+        self._any_weekday = fields[4].startswith("*")
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_match = moment.day in self.days
+        weekday_match = moment.weekday() in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_match and weekday_match
+        # İkisi de kısıtlıysa cron'daki gibi "veya"
+        return day_match or weekday_match
+
+    def next_after(self, moment: datetime) -> datetime:
+        """moment'ten sonraki ilk çalıştırma zamanı"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 4)
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"Cron ifadesi hiç eşleşmiyor: {self.expression}")
+
+
+class ScheduledJob:
+    def __init__(self, name: str, func: JobFunction, schedule: CronSchedule, jitter_seconds: float, lease_seconds: int):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.jitter_seconds = jitter_seconds
+        self.lease_seconds = lease_seconds
+        self.next_run: Optional[datetime] = None
+        self.metrics: Dict[str, Any] = {
+            "runs": 0,
+            "failures": 0,
+            "skipped": 0,  # Başka bir worker çalıştırdı
+            "last_started_at": None,
+            "last_duration_seconds": None,
+            "last_result": None,
+            "last_error": None
+        }
+
+
+class Scheduler:
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._db = None
+
+    def job(self, name: str, cron: str, jitter_seconds: float = 0, lease_seconds: Optional[int] = None):
+        """Periyodik görev kaydet (dekoratör); görev fonksiyonu db alır"""
+        schedule = CronSchedule(cron)
+
+        def register(func: JobFunction) -> JobFunction:
+            self._jobs[name] = ScheduledJob(
+                name, func, schedule, jitter_seconds,
+                lease_seconds or settings.scheduler_lease_seconds
+            )
+            return func
+        return register
+
+    def start(self, db):
+        if self._tasks or not settings.scheduler_enabled:
+            return
+        self._db = db
+        self._tasks = [
+            asyncio.create_task(self._loop(job), name=f"scheduler-{job.name}")
+            for job in self._jobs.values()
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self, job: ScheduledJob):
+        while True:
+            scheduled_for = job.schedule.next_after(datetime.utcnow())
+            job.next_run = scheduled_for
+            delay = (scheduled_for - datetime.utcnow()).total_seconds() + random.uniform(0, job.jitter_seconds)
+            await asyncio.sleep(max(0.0, delay))
+            try:
+                await self.run(job.name, scheduled_for)
+            except Exception as e:
+                # run kendi hatalarını kaydeder; burada yalnızca kira hataları kalır
+                logger.error(f"Scheduled job {job.name} could not be started: {e}")
+
+    async def _acquire(self, job: ScheduledJob, scheduled_for: datetime) -> bool:
+        """Görev kirasını al; başka worker tutuyorsa veya bu çalıştırma yapıldıysa False"""
+        now = datetime.utcnow()
+        try:
+            lease = await self._db[SCHEDULER_LEASE_COLLECTION].find_one_and_update(
+                {
+                    "_id": job.name,
+                    "$and": [
+                        {"$or": [{"lease_until": {"$lt": now}}, {"lease_until": None}]},
+                        {"$or": [{"scheduled_for": {"$lt": scheduled_for}}, {"scheduled_for": None}]}
+                    ]
+                },
+                {"$set": {
+                    "owner": self.owner,
+                    "lease_until": now + timedelta(seconds=job.lease_seconds),
+                    "scheduled_for": scheduled_for,
+                    "started_at": now
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Doküman var ama koşul tutmadı: kira başkasında ya da bu çalıştırma yapıldı
+            return False
+        return lease is not None and lease["owner"] == self.owner
+
+    async def _renew(self, job: ScheduledJob):
+        """Görev sürerken kirayı uzat"""
+        while True:
+            await asyncio.sleep(job.lease_seconds / 3)
+            await self._db[SCHEDULER_LEASE_COLLECTION].update_one(
+                {"_id": job.name, "owner": self.owner},
+                {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=job.lease_seconds)}}
+            )
+
+    async def run(self, name: str, scheduled_for: Optional[datetime] = None, db=None) -> bool:
+        """Görevi (kira alınabilirse) hemen çalıştır; çalıştıysa True"""
+        if db is not None:
+            self._db = db
+        job = self._jobs[name]
+        if not await self._acquire(job, scheduled_for or datetime.utcnow()):
+            job.metrics["skipped"] += 1
+            return False
+
+        started = time.perf_counter()
+        job.metrics["last_started_at"] = datetime.utcnow()
+        renewal = asyncio.create_task(self._renew(job))
+        error = None
+        try:
+            result = await job.func(self._db)
+            job.metrics["last_result"] = result
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            job.metrics["failures"] += 1
+            logger.exception(f"Scheduled job {name} failed: {e}")
+        finally:
+            renewal.cancel()
+            duration = round(time.perf_counter() - started, 3)
+            job.metrics["runs"] += 1
+            job.metrics["last_duration_seconds"] = duration
+            job.metrics["last_error"] = error
+            await self._db[SCHEDULER_LEASE_COLLECTION].update_one(
+                {"_id": name, "owner": self.owner},
+                {"$set": {
+                    "lease_until": None,
+                    "finished_at": datetime.utcnow(),
+                    "duration_seconds": duration,
+                    "error": error
+                }}
+            )
+        logger.info(f"Scheduled job {name} finished in {duration}s")
+        return True
+
+    async def stats(self) -> List[Dict[str, Any]]:
+        leases = {}
+        if self._db is not None:
+            async for lease in self._db[SCHEDULER_LEASE_COLLECTION].find({"_id": {"$in": list(self._jobs)}}):
+                leases[lease["_id"]] = lease
+        return [
+            {
+                "name": job.name,
+                "cron": job.schedule.expression,
+                "jitter_seconds": job.jitter_seconds,
+                "next_run": job.next_run,
+                "local": job.metrics,
+                "last_run": {
+                    key: leases.get(job.name, {}).get(key)
+                    for key in ("owner", "scheduled_for", "started_at", "finished_at", "duration_seconds", "error")
+                }
+            }
+            for job in self._jobs.values()
+        ]
+
+    def has_job(self, name: str) -> bool:
+        return name in self._jobs
+
+
+# Global zamanlayıcı
+scheduler = Scheduler()
@@ -0,0 +1,129 @@
+"""
+Parçalı dosya yükleme
+
+Yüklenen dosya belleğe tek seferde okunmaz; sabit boyutlu parçalar halinde
+diske yazılırken boyut sınırı uygulanır ve SHA-256 özeti hesaplanır. Yazım
+önce geçici bir .part dosyasına yapılır, tamamlanınca hedef ada taşınır;
+yarım kalan dosya hiçbir zaman hedef yolda görünmez. Böylece her yükleme için
+bellekte en fazla bir parça tutulur.
+"""
+import hashlib
+import os
+import uuid
+import zipfile
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+import aiofiles
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.core.errors import StandardErrors, raise_bad_request
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _too_large_message(max_size: int) -> str:
+    if max_size == settings.max_file_size:
+        return StandardErrors.FILE_TOO_LARGE
+    return f"Dosya boyutu çok büyük (maksimum {max_size // (1024 * 1024)}MB)"
+
+
+class StoredUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+async def save_upload(
+    file: UploadFile,
+    destination: str,
+    max_size: Optional[int] = None,
+    head_check: Optional[Callable[[bytes], None]] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredUpload:
+    """Yüklenen dosyayı parça parça destination'a yaz
+
+    max_size verilmezse settings.max_file_size uygulanır. head_check ilk
+    parça ile çağrılır (ör. dosya imzası kontrolü); hata fırlatırsa yazım
+    iptal edilir.
+    """
+    max_size = max_size or settings.max_file_size
+    directory = os.path.dirname(destination)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    temp_path = f"{destination}.{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async with aiofiles.open(temp_path, "wb") as f:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                if size == 0 and head_check:
+                    head_check(chunk)
+                size += len(chunk)
+                if size > max_size:
+                    raise_bad_request(_too_large_message(max_size))
+                digest.update(chunk)
+                await f.write(chunk)
+        os.replace(temp_path, destination)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+    return StoredUpload(destination, size, digest.hexdigest())
+
+
+def extract_zip(
+    archive_path: str,
+    destination_dir: str,
+    allowed_extensions: Iterable[str],
+    max_entries: int,
+    max_entry_size: Optional[int] = None
+) -> List[Tuple[str, str]]:
+    """ZIP içindeki izin verilen dosyaları parça parça destination_dir'e çıkar
+
+    (orijinal ad, çıkarılan yol) listesi döner. Arşivdeki klasör yapısı ve
+    adlar diskte kullanılmaz; boyut sınırı beyan edilen değere güvenmeden
+    okunan veri üzerinden uygulanır. Senkron çalışır (asyncio.to_thread ile
+    çağrılmalı); hata olursa çıkarılan dosyaları temizlemek çağırana kalır.
+    """
+    max_entry_size = max_entry_size or settings.max_file_size
+    allowed = {extension.lower() for extension in allowed_extensions}
+    os.makedirs(destination_dir, exist_ok=True)
+    extracted = []
+
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or name.startswith(".") or info.filename.startswith("__MACOSX/"):
+                    continue
+                extension = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+                if extension not in allowed:
+                    continue
+                if len(extracted) >= max_entries:
+                    raise_bad_request(f"Arşivde en fazla {max_entries} dosya olabilir")
+                if info.file_size > max_entry_size:
+                    raise_bad_request(f"{name}: {_too_large_message(max_entry_size)}")
+
+                target = os.path.join(destination_dir, f"{uuid.uuid4().hex}.{extension}")
+                with archive.open(info) as source, open(target, "wb") as f:
+                    copied = 0
+                    for chunk in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+                        copied += len(chunk)
+                        if copied > max_entry_size:
+                            raise_bad_request(f"{name}: {_too_large_message(max_entry_size)}")
+                        f.write(chunk)
+                extracted.append((name, target))
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, RuntimeError):
+        # RuntimeError: şifreli arşiv
+        raise_bad_request("Geçersiz veya desteklenmeyen ZIP dosyası")
+
+    return extracted
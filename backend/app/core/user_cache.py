@@ -0,0 +1,66 @@
+"""
+Kimliği doğrulanmış kullanıcı önbelleği
+
+get_current_user her istekte çalıştığı için users sorgusu sistemdeki en sık
+sorgudur. Kullanıcı dokümanları kısa bir TTL ile süreç içinde tutulur;
+kullanıcıyı değiştiren endpoint'ler ilgili kaydı geçersiz kılar. Birden fazla
+worker çalışıyorsa diğer süreçlerdeki kopyalar en geç TTL sonunda yenilenir.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+class UserCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.metrics = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        """Süresi dolmamış kullanıcı dokümanını getir, yoksa None"""
+        entry = self._entries.get(username)
+        if entry is not None:
+            expires_at, user_data = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(username)
+                self.metrics["hits"] += 1
+                return dict(user_data)
+            del self._entries[username]
+        self.metrics["misses"] += 1
+        return None
+
+    def set(self, username: str, user_data: Dict[str, Any]):
+        if self.ttl <= 0:
+            return
+        self._entries[username] = (time.monotonic() + self.ttl, dict(user_data))
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *usernames: str):
+        """Değişen kullanıcıların kayıtlarını sil"""
+        for username in usernames:
+            if self._entries.pop(username, None) is not None:
+                self.metrics["invalidations"] += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "entries": len(self._entries),
+            "hit_rate": round(self.metrics["hits"] / lookups, 4) if lookups else 0.0
+        }
+
+
+# Global user cache instance
+user_cache = UserCache(
+    max_entries=settings.auth_user_cache_max_entries,
+    ttl_seconds=settings.auth_user_cache_ttl_seconds
+)
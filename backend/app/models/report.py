@@ -115,6 +115,8 @@ class Report(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Ek veriler")
     file_path: Optional[str] = Field(None, description="Dosya yolu (PDF/Excel için)")
     status: str = Field("completed", description="Rapor durumu")
+    progress: int = Field(100, description="Üretim ilerlemesi (%)")
+    error: Optional[str] = Field(None, description="Üretim hatası")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
 
@@ -133,6 +135,7 @@ class ReportSummary(BaseModel):
     end_date: datetime
     generated_at: datetime
     status: str
+    progress: int = 100
     file_path: Optional[str] = None
 
 class DashboardStats(BaseModel):
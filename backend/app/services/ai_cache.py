@@ -0,0 +1,131 @@
+"""
+AI sonuç önbelleği
+
+Aynı dosya veya aynı girdi için model tekrar çağrılmaz. Anahtar, girdinin
+SHA-256 özeti ile prompt sürümünden üretilir. Bellekte TTL'li bir LRU katmanı,
+arkasında da MongoDB'de kalıcı bir katman bulunur.
+"""
+import copy
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.database import get_database
+
+logger = logging.getLogger(__name__)
+
+CACHE_COLLECTION = "ai_result_cache"
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Dosyanın SHA-256 özetini parça parça okuyarak hesapla"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AIResultCache:
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._entries: "OrderedDict[str, Tuple[datetime, Any]]" = OrderedDict()
+        self.metrics = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0
+        }
+
+    @staticmethod
+    def make_key(kind: str, prompt_version: str, *parts) -> str:
+        """İşlem türü, prompt sürümü ve girdilerden önbellek anahtarı üret"""
+        digest = hashlib.sha256(f"{kind}:{prompt_version}".encode())
+        for part in parts:
+            if isinstance(part, bytes):
+                data = part
+            else:
+                data = json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode()
+            digest.update(b"|")
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _collection(self):
+        db = get_database()
+        return db[CACHE_COLLECTION] if db is not None else None
+
+    def _remember(self, key: str, expires_at: datetime, value: Any):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.metrics["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Önbellekteki sonucu getir, yoksa None"""
+        now = datetime.utcnow()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.metrics["memory_hits"] += 1
+                return copy.deepcopy(value)
+            del self._entries[key]
+
+        collection = self._collection()
+        if collection is not None:
+            try:
+                doc = await collection.find_one({"_id": key, "expires_at": {"$gt": now}})
+                if doc:
+                    self._remember(key, doc["expires_at"], doc["value"])
+                    self.metrics["persistent_hits"] += 1
+                    return copy.deepcopy(doc["value"])
+            except Exception as e:
+                logger.error(f"AI cache read failed: {e}")
+
+        self.metrics["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        """Sonucu hem belleğe hem kalıcı katmana yaz"""
+        now = datetime.utcnow()
+        expires_at = now + self.ttl
+        self._remember(key, expires_at, copy.deepcopy(value))
+        self.metrics["stores"] += 1
+
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            await collection.update_one(
+                {"_id": key},
+                {"$set": {"value": value, "created_at": now, "expires_at": expires_at}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"AI cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """İsabet / ıska metrikleri"""
+        hits = self.metrics["memory_hits"] + self.metrics["persistent_hits"]
+        lookups = hits + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "memory_entries": len(self._entries),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Global AI cache instance
+ai_result_cache = AIResultCache(
+    max_entries=settings.ai_cache_max_entries,
+    ttl_seconds=settings.ai_cache_ttl_seconds
+)
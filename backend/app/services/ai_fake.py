@@ -0,0 +1,67 @@
+"""
+Sahte (yerel) AI modeli
+
+settings.ai_backend = "fake" olduğunda Gemini yerine kullanılır; API anahtarı
+ve ağ bağlantısı olmadan geliştirme, iş kuyruğu testi ve yük denemesi için.
+generate_content gerçek SDK gibi senkron ve yavaştır (ai_fake_latency_seconds);
+yanıt olarak prompt içindeki örnek JSON döndürülür, bu yüzden her analiz
+türü kendi beklediği şemada bir sonuç alır.
+"""
+import json
+import time
+from typing import Any, Dict, Optional
+
+# Prompt'taki örnek doğrudan kullanılamayan türler için sabit yanıtlar
+CANNED_RESPONSES = {
+    "çek görselini": {
+        "amount": 15000.0,
+        "date": "2025-01-15",
+        "due_date": "2025-03-15",
+        "bank_name": "Türkiye İş Bankası",
+        "check_number": "1234567",
+        "drawer_name": "ÖRNEK TİCARET LTD. ŞTİ.",
+        "account_number": "1234567890",
+        "success": True
+    },
+}
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def _first_json_object(prompt: str) -> Optional[Dict[str, Any]]:
+    """Metindeki ilk geçerli JSON nesnesini bul"""
+    decoder = json.JSONDecoder()
+    index = prompt.find("{")
+    while index != -1:
+        try:
+            value, _ = decoder.raw_decode(prompt, index)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+        index = prompt.find("{", index + 1)
+    return None
+
+
+class FakeGenerativeModel:
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+
+    def generate_content(self, contents) -> FakeResponse:
+        prompt = contents[0] if isinstance(contents, (list, tuple)) else contents
+        prompt = prompt if isinstance(prompt, str) else ""
+        self.calls += 1
+
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+        for marker, response in CANNED_RESPONSES.items():
+            if marker in prompt:
+                return FakeResponse(json.dumps(response, ensure_ascii=False))
+
+        result = _first_json_object(prompt) or {}
+        return FakeResponse(json.dumps(result, ensure_ascii=False))
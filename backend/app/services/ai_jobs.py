@@ -0,0 +1,321 @@
+"""
+Arka plan AI iş kuyruğu
+
+Uzun süren model çağrıları HTTP isteğini bekletmez: endpoint işi ai_jobs
+koleksiyonuna yazar, iş kimliğini hemen döndürür; sabit sayıdaki worker
+(settings.ai_job_workers) işleri sırayla alıp işler. İstemci durumu
+/ai/jobs/{id} üzerinden sorgular veya /ai/jobs/{id}/events ile (SSE) izler.
+
+Kuyruk bellekte yalnızca "uyandırma" işlevi görür; bir işi alan worker onu
+veritabanında atomik olarak queued -> running yapar. Bu sayede aynı işi iki
+worker (veya iki süreç) işlemez. Çalışan iş updated_at'ini düzenli olarak
+yeniler (heartbeat); zamanlanmış recover görevi heartbeat'i kesilen işleri
+başarısız sayar ve ölen bir sürecin bellek kuyruğunda kalan, süresi içinde
+alınmamış işleri tekrar kuyruğa alır.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+AI_JOB_COLLECTION = "ai_jobs"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+TERMINAL_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class JobContext:
+    """Handler'a verilen iş bilgisi ve ilerleme bildirimi"""
+
+    def __init__(self, queue: "AIJobQueue", db, job: Dict[str, Any]):
+        self._queue = queue
+        self.db = db
+        self.job = job
+        self.payload = job.get("payload", {})
+
+    async def progress(self, progress: int, stage: str):
+        await self.db[AI_JOB_COLLECTION].update_one(
+            {"_id": self.job["_id"], "status": JOB_RUNNING},
+            {"$set": {"progress": progress, "stage": stage, "updated_at": datetime.utcnow()}}
+        )
+        await self._queue.notify()
+
+
+JobHandler = Callable[[JobContext], Awaitable[Any]]
+
+
+def serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """İş dokümanını API yanıtına çevir"""
+    return {
+        "id": str(job["_id"]),
+        "kind": job["kind"],
+        "status": job["status"],
+        "progress": job.get("progress", 0),
+        "stage": job.get("stage"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "error_status": job.get("error_status"),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at")
+    }
+
+
+def accepted_response(job: Dict[str, Any]) -> JSONResponse:
+    """İş kuyruğa alındı yanıtı (202)"""
+    job_id = str(job["_id"])
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "job_id": job_id,
+            "status": job["status"],
+            "status_url": f"/ai/jobs/{job_id}",
+            "events_url": f"/ai/jobs/{job_id}/events"
+        }
+    )
+
+
+def _remove_files(paths: List[str]):
+    for path in paths or []:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove job file {path}: {e}")
+
+
+class AIJobQueue:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._handlers: Dict[str, JobHandler] = {}
+        self._db = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._changed: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def handler(self, kind: str):
+        """İş türü için handler kaydet (dekoratör)"""
+        def register(func: JobHandler) -> JobHandler:
+            self._handlers[kind] = func
+            return func
+        return register
+
+    def _ensure_started(self, db):
+        self._db = db
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._changed = asyncio.Condition()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"ai-job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def start(self, db):
+        """Worker'ları başlat, yarım kalan ve bekleyen işleri kurtar"""
+        self._ensure_started(db)
+        await self.recover(db)
+
+    async def recover(self, db) -> Dict[str, int]:
+        """Heartbeat'i kesilen işleri başarısız say, sahipsiz bekleyenleri kuyruğa al
+
+        Birden fazla süreçte güvenlidir: canlı bir worker'ın işi heartbeat
+        aldığı sürece dokunulmaz, aynı iş iki kuyruğa girse de yalnızca biri
+        atomik olarak alabilir.
+        """
+        self._ensure_started(db)
+        collection = db[AI_JOB_COLLECTION]
+        now = datetime.utcnow()
+
+        failed = 0
+        stale_before = now - timedelta(seconds=settings.ai_job_stale_seconds)
+        async for job in collection.find(
+            {"status": JOB_RUNNING, "updated_at": {"$lt": stale_before}},
+            {"cleanup_files": 1}
+        ):
+            if await self._finish(db, job, error="İş yarıda kaldı, lütfen tekrar deneyin", only_status=JOB_RUNNING):
+                failed += 1
+
+        requeue_before = now - timedelta(seconds=settings.ai_job_requeue_seconds)
+        job_ids = [
+            job["_id"] async for job in collection.find(
+                {"status": JOB_QUEUED, "updated_at": {"$lt": requeue_before}}, {"_id": 1}
+            ).sort("created_at", 1)
+        ]
+        if job_ids:
+            # Bir sonraki taramaya kadar tekrar alınmasın
+            await collection.update_many(
+                {"_id": {"$in": job_ids}, "status": JOB_QUEUED},
+                {"$set": {"updated_at": now}}
+            )
+            for job_id in job_ids:
+                self._queue.put_nowait(job_id)
+        if failed or job_ids:
+            logger.warning(f"AI job recovery: {failed} interrupted jobs failed, {len(job_ids)} jobs requeued")
+        return {"failed": failed, "requeued": len(job_ids)}
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self,
+        db,
+        kind: str,
+        payload: Dict[str, Any],
+        user_id: str,
+        cleanup_files: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """İşi kaydet ve kuyruğa al
+
+        cleanup_files: iş bittiğinde (başarılı ya da değil) silinecek dosyalar
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown AI job kind: {kind}")
+        self._ensure_started(db)
+
+        now = datetime.utcnow()
+        job = {
+            "kind": kind,
+            "status": JOB_QUEUED,
+            "progress": 0,
+            "stage": "Sırada bekliyor",
+            "payload": payload,
+            "cleanup_files": cleanup_files or [],
+            "attempts": 0,
+            "created_by": user_id,
+            "created_at": now,
+            "updated_at": now
+        }
+        result = await db[AI_JOB_COLLECTION].insert_one(job)
+        job["_id"] = result.inserted_id
+        self._queue.put_nowait(job["_id"])
+        return job
+
+    async def get(self, db, job_id: str) -> Optional[Dict[str, Any]]:
+        if not ObjectId.is_valid(job_id):
+            return None
+        return await db[AI_JOB_COLLECTION].find_one({"_id": ObjectId(job_id)})
+
+    async def notify(self):
+        if self._changed is None:
+            return
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait_for_change(self, timeout: float):
+        """Herhangi bir iş güncellenene kadar (en fazla timeout saniye) bekle"""
+        if self._changed is None:
+            await asyncio.sleep(timeout)
+            return
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(self._db, job_id)
+            except Exception as e:
+                logger.exception(f"AI job {job_id} could not be processed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, db, job_id: ObjectId):
+        now = datetime.utcnow()
+        job = await db[AI_JOB_COLLECTION].find_one_and_update(
+            {"_id": job_id, "status": JOB_QUEUED},
+            {
+                "$set": {"status": JOB_RUNNING, "stage": "İşleniyor", "started_at": now, "updated_at": now},
+                "$inc": {"attempts": 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if not job:
+            # Başka bir worker / süreç aldı
+            return
+        await self.notify()
+
+        handler = self._handlers.get(job["kind"])
+        heartbeat = asyncio.create_task(self._heartbeat(db, job_id), name=f"ai-job-heartbeat-{job_id}")
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown AI job kind: {job['kind']}")
+            result = await handler(JobContext(self, db, job))
+        except HTTPException as e:
+            await self._finish(db, job, error=str(e.detail), error_status=e.status_code)
+        except Exception as e:
+            logger.error(f"AI job {job_id} ({job['kind']}) failed: {e}")
+            await self._finish(db, job, error=str(e))
+        else:
+            await self._finish(db, job, result=result)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, db, job_id: ObjectId):
+        """İş sürdükçe updated_at'i yenile (recover canlı işi yarım saymasın)"""
+        while True:
+            await asyncio.sleep(settings.ai_job_heartbeat_seconds)
+            try:
+                await db[AI_JOB_COLLECTION].update_one(
+                    {"_id": job_id, "status": JOB_RUNNING},
+                    {"$set": {"updated_at": datetime.utcnow()}}
+                )
+            except Exception as e:
+                logger.warning(f"AI job {job_id} heartbeat failed: {e}")
+
+    async def _finish(
+        self,
+        db,
+        job: Dict[str, Any],
+        result: Any = None,
+        error: Optional[str] = None,
+        error_status: Optional[int] = None,
+        only_status: Optional[str] = None
+    ) -> bool:
+        """İşi sonuçlandır; only_status verilirse yalnızca iş hâlâ o durumdaysa"""
+        now = datetime.utcnow()
+        update = {
+            "status": JOB_FAILED if error is not None else JOB_SUCCEEDED,
+            "progress": 100,
+            "stage": "Başarısız" if error is not None else "Tamamlandı",
+            "result": result,
+            "error": error,
+            "error_status": error_status,
+            "finished_at": now,
+            "updated_at": now,
+            # Tamamlanan işler TTL indeksiyle silinir
+            "expires_at": now + timedelta(hours=settings.ai_job_retention_hours)
+        }
+        query = {"_id": job["_id"]}
+        if only_status is not None:
+            query["status"] = only_status
+        written = await db[AI_JOB_COLLECTION].update_one(query, {"$set": update})
+        if not written.matched_count:
+            return False
+        _remove_files(job.get("cleanup_files"))
+        await self.notify()
+        return True
+
+
+# Global iş kuyruğu
+ai_job_queue = AIJobQueue(settings.ai_job_workers)
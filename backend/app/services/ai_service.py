@@ -1,20 +1,43 @@
 import google.generativeai as genai
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
 import re
 import os
 from datetime import datetime, timedelta
 from app.core.config import settings
+from app.core.rate_limit import AsyncRateLimiter
 from app.models.payment_order import PaymentCategory
+from app.services.ai_cache import ai_result_cache, file_sha256
+from app.services.image_preprocess import image_preprocessor
+from app.services.pdf_ingest import pdf_ingestor
+from app.services.receipt_parser import receipt_parser
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Prompt veya modele giden girdinin biçimi değiştiğinde ilgili sürüm
+# artırılmalı; eski önbellek kayıtları kullanılmaz. Dosya analizlerinde ön
+# işleme ayarları, dekont analizinde yerel ayrıştırıcının ayarları ve sürümü
+# ayrıca anahtara girer (bkz. _file_cache_key, analyze_receipt).
+PROMPT_VERSIONS = {
+    "verify_payment_receipt": "2",
+    "analyze_receipt": "2",
+    "analyze_check": "2",
+    "categorize_expense": "1"
+}
+
 class GeminiAIService:
     def __init__(self):
-        if settings.gemini_api_key:
+        if settings.ai_backend == "fake":
+            from app.services.ai_fake import FakeGenerativeModel
+            self.model = FakeGenerativeModel(settings.ai_fake_latency_seconds)
+            self.vision_model = self.model
+            logger.warning("Fake AI backend in use; responses are not real analyses")
+        elif settings.gemini_api_key:
             genai.configure(api_key=settings.gemini_api_key)
             try:
                 self.model = genai.GenerativeModel('gemini-1.5-flash')
@@ -28,6 +51,110 @@ class GeminiAIService:
             logger.warning("Gemini API key not found. AI services will be disabled.")
             self.model = None
             self.vision_model = None
+        
+        # Gemini SDK senkron çalışır; çağrılar event loop'u bloklamaması için
+        # sınırlı bir thread havuzunda, eşzamanlılık ve süre limitiyle yapılır
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.ai_max_workers,
+            thread_name_prefix="gemini"
+        )
+        self._semaphore = asyncio.Semaphore(settings.ai_max_concurrency)
+        self._rate_limiter = AsyncRateLimiter(settings.ai_requests_per_minute)
+        self.timeout = settings.ai_timeout_seconds
+
+    async def _generate(self, model, contents):
+        """generate_content çağrısını thread havuzunda, timeout ile çalıştır
+
+        Eşzamanlılık slotu thread'deki çağrı gerçekten bitene kadar tutulur:
+        timeout olan çağrı thread'de sürmeye devam eder ve slotu bırakmaz,
+        böylece semafor gerçek eşzamanlı çağrı sayısını sınırlar. Timeout
+        kuyrukta beklerken değil, çağrı başladığında işlemeye başlar.
+        """
+        await self._rate_limiter.acquire()
+        await self._semaphore.acquire()
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+
+        def mark_started():
+            if not started.done():
+                started.set_result(None)
+
+        def call():
+            loop.call_soon_threadsafe(mark_started)
+            return model.generate_content(contents)
+
+        try:
+            future = self._executor.submit(call)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        future.add_done_callback(lambda _: self._release_slot(loop))
+
+        result = asyncio.wrap_future(future, loop=loop)
+        try:
+            # Havuz kapatılıp çağrı hiç başlamazsa result iptal olarak biter
+            await asyncio.wait([started, result], return_when=asyncio.FIRST_COMPLETED)
+            return await asyncio.wait_for(result, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Gemini request timed out after {self.timeout}s")
+            raise TimeoutError(f"AI yanıtı {self.timeout:g} saniye içinde alınamadı")
+        finally:
+            # İstek iptal edildiyse henüz başlamamış çağrı da iptal edilir
+            future.cancel()
+            started.cancel()
+
+    def _release_slot(self, loop):
+        """Thread'deki çağrı bitince slotu event loop üzerinden bırak"""
+        try:
+            loop.call_soon_threadsafe(self._semaphore.release)
+        except RuntimeError:
+            # Loop kapandı (uygulama kapanışı); bırakılacak bekleyen yok
+            pass
+
+    def shutdown(self):
+        """Thread havuzunu kapat"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _file_cache_key(self, kind: str, file_path: str, *parts) -> Optional[str]:
+        """Dosya içeriği ve ön işleme ayarlarına göre önbellek anahtarı (dosya okunamazsa None)"""
+        try:
+            digest = await asyncio.to_thread(file_sha256, file_path)
+        except OSError:
+            return None
+        if file_path.lower().endswith(".pdf"):
+            input_options = pdf_ingestor.options()
+        else:
+            input_options = image_preprocessor.options()
+        return ai_result_cache.make_key(kind, PROMPT_VERSIONS[kind], digest, input_options, *parts)
+
+    async def _cached_file_analysis(self, kind: str, file_path: str, compute, *parts) -> Dict[str, Any]:
+        """Dosya analizini önbellekten getir ya da çalıştırıp başarılıysa sakla"""
+        cache_key = await self._file_cache_key(kind, file_path, *parts)
+        if cache_key:
+            cached = await ai_result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        result = await compute()
+        if cache_key and isinstance(result, dict) and result.get("success"):
+            await ai_result_cache.set(cache_key, result)
+        return result
+
+    async def _document_request(self, prompt: str, file_path: str) -> Tuple[Any, List[Any]]:
+        """Dosyayı modele gidecek içeriğe çevir: (model, contents)
+
+        Metin katmanı olan PDF'lerde görsel yerine çıkarılan metin gönderilir.
+        """
+        if file_path.lower().endswith(".pdf"):
+            document = await pdf_ingestor.ingest(file_path)
+            if document.text:
+                return self.model, [f"{prompt}\n\nBELGE METNİ (PDF'den çıkarıldı):\n{document.text}"]
+            if not document.pages:
+                raise ValueError("PDF dosyasında sayfa bulunamadı")
+            return self.vision_model, [prompt, *(page.as_part() for page in document.pages)]
+
+        image = await image_preprocessor.prepare(file_path)
+        return self.vision_model, [prompt, image.as_part()]
 
     async def process_payment_description(self, description: str, recipient_name: str, amount: float) -> Dict[str, Any]:
         """
@@ -61,7 +188,7 @@ class GeminiAIService:
             }}
             """
 
-            response = self.model.generate_content(prompt)
+            response = await self._generate(self.model, prompt)
             response_text = response.text.strip()
             
             # Clean up response text for JSON parsing
@@ -91,6 +218,19 @@ class GeminiAIService:
         """
         Ödeme emri ile dekont arasında doğrulama yapar
         """
+        # Prompt'a giren ödeme emri alanları anahtarın parçası
+        order_fields = {
+            field: payment_order.get(field)
+            for field in ("recipient_name", "recipient_iban", "amount", "description")
+        }
+        return await self._cached_file_analysis(
+            "verify_payment_receipt",
+            file_path,
+            lambda: self._verify_payment_receipt(file_path, payment_order),
+            order_fields
+        )
+
+    async def _verify_payment_receipt(self, file_path: str, payment_order: dict) -> dict:
         try:
             # Vision model kullanarak resim analizi
             if not self.vision_model:
@@ -108,31 +248,6 @@ class GeminiAIService:
                     "error": f"Dosya bulunamadı: {file_path}"
                 }
             
-            # Dosyayı yükle ve Gemini format'ına çevir
-            import PIL.Image
-            logger.info(f"Loading image from: {file_path}")
-            
-            # Dosya tipini kontrol et
-            file_extension = file_path.lower().split('.')[-1]
-            
-            if file_extension == 'pdf':
-                logger.error("PDF files temporarily not supported")
-                return {
-                    "success": False,
-                    "error": "PDF dosyaları şu anda desteklenmiyor. Lütfen JPG/PNG formatında yükleyin."
-                }
-            else:
-                # Resim dosyaları için PIL kullan
-                try:
-                    image = PIL.Image.open(file_path)
-                    logger.info(f"Image loaded successfully: {image.size}")
-                except Exception as img_error:
-                    logger.error(f"Image loading error: {img_error}")
-                    return {
-                        "success": False,
-                        "error": f"Resim yükleme hatası: {str(img_error)}"
-                    }
-            
             prompt = f"""
 Bu dekont/transfer belgesini analiz et ve ödeme emri bilgileri ile MUTLAKA karşılaştır.
 
@@ -202,8 +317,19 @@ KURALLAR:
 SADECE JSON döndür!
             """
 
+            # Dosyayı yükle ve Gemini format'ına çevir (PDF ise metin katmanı / sayfa görselleri)
+            logger.info(f"Loading document from: {file_path}")
+            try:
+                model, contents = await self._document_request(prompt, file_path)
+            except Exception as load_error:
+                logger.error(f"Document loading error: {load_error}")
+                return {
+                    "success": False,
+                    "error": f"Dosya yükleme hatası: {str(load_error)}"
+                }
+
             logger.info("Sending request to Gemini AI...")
-            response = self.vision_model.generate_content([prompt, image])
+            response = await self._generate(model, contents)
             response_text = response.text.strip()
             logger.info(f"AI Response received: {response_text[:200]}...")
             
@@ -241,6 +367,36 @@ SADECE JSON döndür!
         """
         Dekont/fatura görselini detaylı olarak analiz eder
         """
+        # PDF sonuçları yerel ayrıştırıcıdan da gelebilir; eşiği, şablonları
+        # veya ayrıştırıcıyı değiştirmek eski kayıtları geçersiz kılar
+        parser_options = receipt_parser.options() if file_path.lower().endswith(".pdf") else None
+        return await self._cached_file_analysis(
+            "analyze_receipt",
+            file_path,
+            lambda: self._analyze_receipt(file_path, payment_info),
+            payment_info,
+            parser_options
+        )
+
+    async def _local_receipt_analysis(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Metin katmanlı PDF'i kural tabanlı ayrıştır; güven eşiğini geçmezse None"""
+        if not settings.receipt_parser_enabled or not file_path.lower().endswith(".pdf"):
+            return None
+        try:
+            document = await pdf_ingestor.ingest(file_path)
+        except Exception as e:
+            logger.warning(f"Local receipt parsing skipped: {e}")
+            return None
+        if not document.text:
+            return None
+        return receipt_parser.parse_if_confident(document.text)
+
+    async def _analyze_receipt(self, file_path: str, payment_info: Optional[Dict] = None) -> Dict[str, Any]:
+        # Bilinen banka şablonlarındaki dekontlar modele gitmeden okunur
+        local_result = await self._local_receipt_analysis(file_path)
+        if local_result:
+            return local_result
+
         if not self.model:
             return {
                 "success": False,
@@ -255,10 +411,6 @@ SADECE JSON döndür!
                     "error": "Vision model not available"
                 }
             
-            # Dosyayı yükle ve Gemini format'ına çevir
-            import PIL.Image
-            
-            image = PIL.Image.open(file_path)
 
             prompt = """
             Bu dekont/transfer belgesi görselini detaylı analiz et ve JSON formatında şu bilgileri çıkar:
@@ -321,7 +473,8 @@ SADECE JSON döndür!
             }
             """
 
-            response = self.vision_model.generate_content([prompt, image])
+            model, contents = await self._document_request(prompt, file_path)
+            response = await self._generate(model, contents)
             response_text = response.text.strip()
             
             # Clean up response text for JSON parsing
@@ -346,8 +499,28 @@ SADECE JSON döndür!
         """
         Masraf kategorizasyonu
         """
-        if not self.model:
+        cache_key = ai_result_cache.make_key(
+            "categorize_expense",
+            PROMPT_VERSIONS["categorize_expense"],
+            " ".join((description or "").lower().split()),
+            " ".join((recipient or "").lower().split()),
+            round(float(amount or 0), 2)
+        )
+        cached = await ai_result_cache.get(cache_key)
+        if cached is not None:
+            return PaymentCategory(cached)
+        
+        category = await self._categorize_expense(description, recipient, amount)
+        if category is None:
             return PaymentCategory.OTHER
+        
+        await ai_result_cache.set(cache_key, category.value)
+        return category
+
+    async def _categorize_expense(self, description: str, recipient: str, amount: float) -> Optional[PaymentCategory]:
+        """Model çağrısı; model yanıt veremezse None"""
+        if not self.model:
+            return None
 
         try:
             prompt = f"""
@@ -372,7 +545,7 @@ SADECE JSON döndür!
             Sadece kategori adını döndür (örn: office_supplies)
             """
 
-            response = self.model.generate_content(prompt)
+            response = await self._generate(self.model, prompt)
             category_str = response.text.strip().lower()
             
             # Clean up response if it contains extra formatting
@@ -387,12 +560,19 @@ SADECE JSON döndür!
 
         except Exception as e:
             logger.error(f"Categorization error: {e}")
-            return PaymentCategory.OTHER
+            return None
 
     async def analyze_check(self, file_path: str) -> Dict[str, Any]:
         """
         Çek analizi
         """
+        return await self._cached_file_analysis(
+            "analyze_check",
+            file_path,
+            lambda: self._analyze_check(file_path)
+        )
+
+    async def _analyze_check(self, file_path: str) -> Dict[str, Any]:
         if not self.model:
             return {
                 "success": False,
@@ -406,8 +586,6 @@ SADECE JSON döndür!
                     "error": "Vision model not available"
                 }
             
-            import PIL.Image
-            image = PIL.Image.open(file_path)
 
             prompt = """
             Bu çek görselini analiz et ve bilgileri JSON formatında çıkar:
@@ -426,7 +604,8 @@ SADECE JSON döndür!
             Tarihleri mutlaka YYYY-MM-DD formatında ver.
             """
 
-            response = self.vision_model.generate_content([prompt, image])
+            model, contents = await self._document_request(prompt, file_path)
+            response = await self._generate(model, contents)
             response_text = response.text.strip()
             
             # Clean up response text for JSON parsing
@@ -487,7 +666,7 @@ SADECE JSON döndür!
             }}
             """
 
-            response = self.model.generate_content(prompt)
+            response = await self._generate(self.model, prompt)
             response_text = response.text.strip()
             
             # Clean up response text for JSON parsing
@@ -541,7 +720,7 @@ SADECE JSON döndür!
             }}
             """
 
-            response = self.model.generate_content(prompt)
+            response = await self._generate(self.model, prompt)
             response_text = response.text.strip()
             
             # Clean up response text for JSON parsing
@@ -594,7 +773,7 @@ SADECE JSON döndür!
             }}
             """
 
-            response = self.model.generate_content(prompt)
+            response = await self._generate(self.model, prompt)
             response_text = response.text.strip()
             
             # Clean up response text for JSON parsing
@@ -660,7 +839,7 @@ SADECE JSON döndür!
             }}
             """
 
-            response = self.model.generate_content(prompt)
+            response = await self._generate(self.model, prompt)
             response_text = response.text.strip()
             
             # Clean up response text for JSON parsing
@@ -730,7 +909,7 @@ SADECE JSON döndür!
             Türkçe yaz ve sadece özet metni döndür, başka hiçbir şey yazma.
             """
             
-            response = self.model.generate_content(prompt)
+            response = await self._generate(self.model, prompt)
             return response.text.strip()
 
         except Exception as e:
@@ -763,7 +942,7 @@ SADECE JSON döndür!
             Sadece cevabı döndür, başka hiçbir şey yazma.
             """
 
-            response = self.model.generate_content(prompt)
+            response = await self._generate(self.model, prompt)
             return response.text.strip()
 
         except Exception as e:
@@ -817,7 +996,7 @@ SADECE JSON döndür!
             }}
             """
 
-            response = self.model.generate_content(prompt)
+            response = await self._generate(self.model, prompt)
             response_text = response.text.strip()
             
             # Clean up response text for JSON parsing
@@ -0,0 +1,162 @@
+"""
+Bakiye geçmişi
+
+Hesapların gün / hafta / ay sonu bakiyeleri tek bir aggregation ile
+günlük defter özetlerinden (ledger_rollups) hesaplanır: kovalar hesap ve
+gün bazında toplanır, $setWindowFields ile hesap başına kümülatif bakiye
+etkisi çıkarılır ve her dönemin son günündeki değer alınır. Aralık
+başlangıcından önceki hareketler açılış bakiyesine ("opening") katlanır.
+Sonuç initial_balance ile toplanır; hareket olmayan dönemler bir önceki
+bakiyeyi taşır.
+
+Özetler yalnızca tamamlanmış işlemleri içerir; bu, current_balance'ın
+yeniden hesaplanmasıyla (initial_balance + tamamlanmış işlemlerin
+balance_impact toplamı) aynı tanımdır. $setWindowFields MongoDB 5.0+
+gerektirir.
+
+Seri yalnızca işlem (transactions) defterini izler, current_balance'ı
+değil. Kredi kartı ödemeleri, borç ödemeleri ve çek tahsilleri bakiyeyi
+adjust_bank_balance ile işlem yazmadan değiştirir; bu hareketler seride
+görünmez. Böyle hareketi olan hesaplarda son nokta current_balance'tan
+farklı çıkabilir (fark bu hareketlerin toplamıdır).
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+from app.services.ledger_rollups import ROLLUP_COLLECTION
+
+GRANULARITIES = ("day", "week", "month")
+# Tek istekte dönebilecek en fazla nokta sayısı (hesap başına)
+MAX_BALANCE_POINTS = 1000
+
+
+def _day_start(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def period_start(value: datetime, granularity: str) -> datetime:
+    """Günün ait olduğu dönemin ilk günü (haftalar pazartesi başlar)"""
+    day = _day_start(value)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period(value: datetime, granularity: str) -> datetime:
+    if granularity == "week":
+        return value + timedelta(days=7)
+    if granularity == "month":
+        return (value + timedelta(days=32)).replace(day=1)
+    return value + timedelta(days=1)
+
+
+def period_count(start: datetime, end: datetime, granularity: str) -> int:
+    count = 0
+    current = period_start(start, granularity)
+    while current <= end:
+        count += 1
+        current = next_period(current, granularity)
+    return count
+
+
+def _history_pipeline(account_ids: List[str], start: datetime, end: datetime, granularity: str) -> List[Dict[str, Any]]:
+    trunc = {"date": "$_id.date", "unit": granularity}
+    if granularity == "week":
+        trunc["startOfWeek"] = "monday"
+    return [
+        {"$match": {"bank_account_id": {"$in": account_ids}, "date": {"$lte": end}}},
+        # Aynı güne ait tür / para birimi kovalarını birleştir
+        {"$group": {
+            "_id": {"account": "$bank_account_id", "date": "$date"},
+            "change": {"$sum": "$balance_impact"}
+        }},
+        {"$setWindowFields": {
+            "partitionBy": "$_id.account",
+            "sortBy": {"_id.date": 1},
+            "output": {
+                "running": {"$sum": "$change", "window": {"documents": ["unbounded", "current"]}}
+            }
+        }},
+        {"$sort": {"_id.account": 1, "_id.date": 1}},
+        {"$group": {
+            "_id": {
+                "account": "$_id.account",
+                "period": {"$cond": [
+                    {"$lt": ["$_id.date", start]},
+                    "opening",
+                    {"$dateTrunc": trunc}
+                ]}
+            },
+            # Dönemin son gününün kümülatif değeri = dönem sonu
+            "running": {"$last": "$running"}
+        }}
+    ]
+
+
+async def balance_history(
+    db,
+    start: datetime,
+    end: datetime,
+    granularity: str = "day",
+    account_ids: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """[start, end] aralığındaki dönem sonu defter bakiyeleri, hesap başına
+
+    Her nokta {"date": dönemin aralık içindeki son günü, "balance": gün
+    sonu bakiyesi}. account_ids verilmezse tüm hesaplar. İşlem yazılmadan
+    yapılan bakiye değişiklikleri dahil değildir (bkz. modül açıklaması).
+    """
+    start, end = _day_start(start), _day_start(end)
+    account_filter: Dict[str, Any] = {}
+    if account_ids is not None:
+        account_filter["_id"] = {"$in": [ObjectId(value) for value in account_ids if ObjectId.is_valid(value)]}
+    accounts = await db.bank_accounts.find(
+        account_filter, {"name": 1, "currency": 1, "initial_balance": 1}
+    ).sort("name", 1).to_list(None)
+    if not accounts:
+        return []
+
+    running: Dict[str, Dict[Any, float]] = {}
+    pipeline = _history_pipeline([str(account["_id"]) for account in accounts], start, end, granularity)
+    async for doc in db[ROLLUP_COLLECTION].aggregate(pipeline):
+        running.setdefault(doc["_id"]["account"], {})[doc["_id"]["period"]] = doc["running"]
+
+    history = []
+    for account in accounts:
+        account_id = str(account["_id"])
+        by_period = running.get(account_id, {})
+        initial_balance = account.get("initial_balance", 0.0)
+        balance = initial_balance + by_period.get("opening", 0.0)
+        points = []
+        current = period_start(start, granularity)
+        while current <= end:
+            if current in by_period:
+                balance = initial_balance + by_period[current]
+            following = next_period(current, granularity)
+            points.append({"date": min(following - timedelta(days=1), end), "balance": round(balance, 2)})
+            current = following
+        history.append({
+            "account_id": account_id,
+            "account_name": account["name"],
+            "currency": account.get("currency", "TRY"),
+            "initial_balance": initial_balance,
+            "points": points
+        })
+    return history
+
+
+def total_by_currency(history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Hesap serilerini para birimi bazında topla (noktalar aynı dönemlerde)"""
+    totals: Dict[str, List[Dict[str, Any]]] = {}
+    for account in history:
+        points = totals.get(account["currency"])
+        if points is None:
+            totals[account["currency"]] = [dict(point) for point in account["points"]]
+            continue
+        for total, point in zip(points, account["points"]):
+            total["balance"] += point["balance"]
+    return [{"currency": currency, "points": points} for currency, points in sorted(totals.items())]
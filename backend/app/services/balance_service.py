@@ -0,0 +1,303 @@
+"""
+Bakiye / limit güncelleme servisi
+
+Bakiye değişiklikleri okuma-hesaplama-yazma yerine tek bir koşullu $inc ile
+yapılır (find_one_and_update). Yetersiz bakiye ve limit kontrolleri filtrenin
+parçasıdır; koşul sağlanmazsa güncelleme yapılmaz ve None döner. Böylece aynı
+hesaba eşzamanlı yazımlarda güncelleme kaybolmaz.
+"""
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.core.database import db as mongo
+from app.services.ledger_rollups import record_transaction
+from app.services.report_cache import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+
+def _oid(value) -> ObjectId:
+    return value if isinstance(value, ObjectId) else ObjectId(value)
+
+
+async def adjust_bank_balance(
+    db,
+    account_id,
+    amount: float,
+    require_funds: bool = False,
+    currency: Optional[str] = None,
+    session=None
+) -> Optional[Dict[str, Any]]:
+    """Banka hesabı bakiyesine amount ekle (negatifse düş)
+
+    require_funds=True ise bakiye amount'u karşılamıyorsa, currency verilmişse
+    hesabın para birimi farklıysa güncelleme yapılmaz. Güncellenmiş hesabı,
+    koşul sağlanmazsa veya hesap yoksa None döndürür.
+    """
+    query: Dict[str, Any] = {"_id": _oid(account_id)}
+    if require_funds and amount < 0:
+        query["current_balance"] = {"$gte": -amount}
+    if currency:
+        query["currency"] = currency
+
+    account = await db.bank_accounts.find_one_and_update(
+        query,
+        {
+            "$inc": {"current_balance": amount},
+            "$set": {"updated_at": datetime.utcnow()}
+        },
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if account is not None:
+        # Hesap özeti raporları güncel bakiyeyi gösterir
+        await bump_data_version(db, "bank_accounts")
+    return account
+
+
+async def adjust_card_usage(
+    db,
+    card_id,
+    amount: float,
+    session=None
+) -> Optional[Dict[str, Any]]:
+    """Kredi kartı kullanılan tutarını amount kadar değiştir
+
+    Harcamada (amount > 0) limit aşılamaz, ödemede (amount < 0) kullanılan
+    tutardan fazlası ödenemez. Koşul sağlanmazsa None döner.
+    """
+    query: Dict[str, Any] = {"_id": _oid(card_id)}
+    if amount > 0:
+        query["$expr"] = {"$lte": [{"$add": ["$used_amount", amount]}, "$limit"]}
+    else:
+        query["used_amount"] = {"$gte": -amount}
+
+    return await db.credit_cards.find_one_and_update(
+        query,
+        {
+            "$inc": {"used_amount": amount},
+            "$set": {"updated_at": datetime.utcnow()}
+        },
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+
+
+async def add_debt_payment(
+    db,
+    debt_id,
+    amount: float,
+    extra_set: Optional[Dict[str, Any]] = None,
+    session=None
+) -> Optional[Dict[str, Any]]:
+    """Borca ödeme ekle (ödenen tutar ve ödeme sayısı); kalan tutardan fazlası ödenemez"""
+    query = {
+        "_id": _oid(debt_id),
+        "$expr": {"$lte": [{"$add": [{"$ifNull": ["$paid_amount", 0]}, amount]}, "$amount"]}
+    }
+    return await db.debts.find_one_and_update(
+        query,
+        {
+            "$inc": {"paid_amount": amount, "payment_count": 1},
+            "$set": {"updated_at": datetime.utcnow(), **(extra_set or {})}
+        },
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+
+
+@asynccontextmanager
+async def balance_session():
+    """Ayarlarda açıksa çok dokümanlı transaction oturumu aç
+
+    MongoDB replica set gerektirir; kapalıysa None verir ve işlemler tek
+    tek (ama her biri atomik) çalışır.
+    """
+    if not settings.mongodb_transactions or mongo.client is None:
+        yield None
+        return
+
+    async with await mongo.client.start_session() as session:
+        async with session.start_transaction():
+            yield session
+
+
+async def settle_payment_order(
+    db,
+    order_id,
+    allowed_statuses: Iterable[Any],
+    bank_account_id,
+    amount: float,
+    order_update: Dict[str, Any],
+    transaction: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Any]:
+    """Ödeme emrini tamamla: emri sahiplen, bakiyeyi düş, işlemi kaydet
+
+    Emir önce koşullu olarak (durumu allowed_statuses içindeyse)
+    "completed"a çekilir; aynı emri eşzamanlı tamamlamaya çalışan ikinci
+    istek 409 alır ve bakiyeye dokunmaz. Adımlar balance_session içinde
+    yürür; transaction kapalıysa sonraki bir adım hata verdiğinde bakiye
+    düşümü ve emir durumu elle geri alınır.
+
+    (güncellenmiş hesap, işlem kimliği) döndürür. Yetersiz bakiyede 400
+    yükseltir.
+    """
+    order_oid = _oid(order_id)
+    claim_set = {**order_update, "status": "completed"}
+    async with balance_session() as session:
+        previous = await db.payment_orders.find_one_and_update(
+            {"_id": order_oid, "status": {"$in": [getattr(value, "value", value) for value in allowed_statuses]}},
+            {"$set": claim_set},
+            session=session
+        )
+        if previous is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Ödeme emri başka bir işlemle tamamlanmış veya durumu değişmiş"
+            )
+
+        account = None
+        try:
+            account = await adjust_bank_balance(db, bank_account_id, -amount, require_funds=True, session=session)
+            if not account:
+                current = await db.bank_accounts.find_one({"_id": _oid(bank_account_id)}, {"current_balance": 1})
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Yetersiz bakiye. Gerekli: {amount}, Mevcut: {current['current_balance'] if current else 0}"
+                )
+            result = await db.transactions.insert_one(transaction, session=session)
+            await record_transaction(db, transaction, session=session)
+        except BaseException:
+            if session is None:
+                await _revert_settlement(db, order_oid, previous, claim_set, bank_account_id if account else None, amount)
+            raise
+
+    return account, result.inserted_id
+
+
+async def _revert_settlement(db, order_oid: ObjectId, previous: Dict[str, Any], claim_set: Dict[str, Any], bank_account_id, amount: float):
+    """Transaction yokken yarım kalan tamamlamayı geri al"""
+    restore = {field: previous[field] for field in claim_set if field in previous}
+    missing = {field: "" for field in claim_set if field not in previous}
+    update: Dict[str, Any] = {"$set": restore}
+    if missing:
+        update["$unset"] = missing
+    try:
+        if bank_account_id is not None:
+            await adjust_bank_balance(db, bank_account_id, amount)
+        await db.payment_orders.update_one({"_id": order_oid, "status": "completed"}, update)
+    except Exception as e:
+        logger.error(f"Payment order {order_oid} settlement rollback failed: {e}")
+
+
+async def charge_credit_card(db, card_id, amount: float, card_transaction: Dict[str, Any]) -> Optional[Any]:
+    """Kart harcaması: limit yetiyorsa kullanılan tutarı artır ve işlemi kaydet
+
+    Limit aşılıyorsa hiçbir şey yazılmaz ve None döner; aksi hâlde işlem
+    kimliği döner. Adımlar balance_session içinde yürür; transaction
+    kapalıysa kayıt yazılamadığında kullanılan tutar telafi edici $inc ile
+    geri alınır.
+    """
+    async with balance_session() as session:
+        if await adjust_card_usage(db, card_id, amount, session=session) is None:
+            return None
+        undo: List[Callable[[], Awaitable[Any]]] = [
+            lambda: _inc_counters(db, "credit_cards", card_id, {"used_amount": -amount})
+        ]
+        try:
+            result = await db.credit_card_transactions.insert_one(card_transaction, session=session)
+        except BaseException:
+            if session is None:
+                await _rollback(undo, f"Credit card {card_id} charge")
+            raise
+    return result.inserted_id
+
+
+async def pay_credit_card(db, card_id, amount: float, payment: Dict[str, Any], bank_account_id=None) -> Optional[Any]:
+    """Kart ödemesi: kullanılan tutarı düş, ödemeyi kaydet, verilmişse bankadan çek
+
+    Ödeme kullanılan tutarı aşıyorsa hiçbir şey yazılmaz ve None döner;
+    aksi hâlde ödeme kimliği döner. Transaction kapalıysa sonraki bir adım
+    hata verdiğinde önceki adımlar elle geri alınır.
+    """
+    async with balance_session() as session:
+        if await adjust_card_usage(db, card_id, -amount, session=session) is None:
+            return None
+        undo: List[Callable[[], Awaitable[Any]]] = [
+            lambda: _inc_counters(db, "credit_cards", card_id, {"used_amount": amount})
+        ]
+        try:
+            result = await db.credit_card_payments.insert_one(payment, session=session)
+            undo.append(lambda: db.credit_card_payments.delete_one({"_id": result.inserted_id}))
+            if bank_account_id:
+                await adjust_bank_balance(db, bank_account_id, -amount, session=session)
+        except BaseException:
+            if session is None:
+                await _rollback(undo, f"Credit card {card_id} payment")
+            raise
+    return result.inserted_id
+
+
+async def pay_debt(
+    db,
+    debt_id,
+    amount: float,
+    payment: Dict[str, Any],
+    extra_set: Optional[Dict[str, Any]] = None,
+    bank_account_id=None,
+    status_fields: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+) -> Optional[Tuple[Dict[str, Any], Any]]:
+    """Borç ödemesi: ödenen tutarı artır, ödemeyi kaydet, verilmişse bankadan çek
+
+    status_fields güncellenmiş borçtan türetilen alanları (durum, kalan
+    tutar) döndürür; aynı oturumda yazılır. Ödeme kalan tutarı aşıyorsa
+    hiçbir şey yazılmaz ve None döner; aksi hâlde (güncellenmiş borç, ödeme
+    kimliği) döner. Transaction kapalıysa sonraki bir adım hata verdiğinde
+    önceki adımlar elle geri alınır.
+    """
+    async with balance_session() as session:
+        debt = await add_debt_payment(db, debt_id, amount, extra_set=extra_set, session=session)
+        if debt is None:
+            return None
+        undo: List[Callable[[], Awaitable[Any]]] = [
+            lambda: _inc_counters(db, "debts", debt_id, {"paid_amount": -amount, "payment_count": -1})
+        ]
+        try:
+            result = await db.debt_payments.insert_one(payment, session=session)
+            undo.append(lambda: db.debt_payments.delete_one({"_id": result.inserted_id}))
+            if bank_account_id:
+                if await adjust_bank_balance(db, bank_account_id, -amount, session=session) is not None:
+                    undo.append(lambda: adjust_bank_balance(db, bank_account_id, amount))
+            if status_fields is not None:
+                fields = status_fields(debt)
+                await db.debts.update_one({"_id": _oid(debt_id)}, {"$set": fields}, session=session)
+                debt = {**debt, **fields}
+        except BaseException:
+            if session is None:
+                await _rollback(undo, f"Debt {debt_id} payment")
+            raise
+    return debt, result.inserted_id
+
+
+async def _inc_counters(db, collection: str, doc_id, inc: Dict[str, float]):
+    """Koşulsuz telafi edici $inc (yarım kalan adımı geri almak için)"""
+    await db[collection].update_one(
+        {"_id": _oid(doc_id)},
+        {"$inc": inc, "$set": {"updated_at": datetime.utcnow()}}
+    )
+
+
+async def _rollback(undo: List[Callable[[], Awaitable[Any]]], context: str):
+    """Transaction yokken tamamlanan adımları ters sırada geri al"""
+    for step in reversed(undo):
+        try:
+            await step()
+        except Exception as e:
+            logger.error(f"{context} rollback failed: {e}")
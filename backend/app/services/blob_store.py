@@ -0,0 +1,254 @@
+"""
+İçerik adresli dosya deposu (blob store)
+
+Dekont ve belgeler SHA-256 özetine göre uploads/blobs/ab/<özet>.<uzantı>
+yoluna bir kez yazılır; aynı dosya farklı işlem, ödeme detayı veya doğrulama
+tekrarı için yüklense de diskte tek kopya tutulur. blobs koleksiyonu her
+dosyanın referans sayısını tutar.
+
+Referans sayısı yazım / silme anında artımlı güncellenir; asıl kaynak ise
+REFERENCES içindeki alanlardır. collect_garbage sayıları bu alanlardan
+yeniden hesaplar ve süresi dolmuş sahipsiz dosyaları siler.
+"""
+import asyncio
+import logging
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import UploadFile
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.uploads import save_upload
+from app.services.ai_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+BLOB_COLLECTION = "blobs"
+
+# Dosya yolu tutan alanlar: (koleksiyon, alan, tür)
+# tür: "value" tek değer, "array" yol listesi, "documents" {file_path} listesi
+REFERENCES = [
+    ("transactions", "receipt_url", "value"),
+    ("payment_orders", "receipt_url", "value"),
+    ("checks", "receipt_url", "value"),
+    ("income_records", "receipt_file", "value"),
+    ("payment_details", "receipt_urls", "array"),
+    ("employees", "documents", "documents"),
+]
+
+
+def blob_root() -> str:
+    return os.path.join(settings.upload_dir, "blobs")
+
+
+def blob_path(digest: str, extension: str = "") -> str:
+    """Özet ve uzantıdan dosya yolunu üret"""
+    extension = extension.lower().lstrip(".")
+    filename = f"{digest}.{extension}" if extension else digest
+    return os.path.join(blob_root(), digest[:2], filename)
+
+
+def is_blob_path(path: Optional[str]) -> bool:
+    if not path:
+        return False
+    return os.path.normpath(path).startswith(os.path.normpath(blob_root()) + os.sep)
+
+
+def _extension(filename: Optional[str]) -> str:
+    return filename.rsplit(".", 1)[-1] if filename and "." in filename else ""
+
+
+def _place(source_path: str, final_path: str, move: bool):
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    if move:
+        os.replace(source_path, final_path)
+    else:
+        # Aynı içeriğin eşzamanlı ilk yazımları birbirinin geçici dosyasını ezmesin
+        temp_path = f"{final_path}.{uuid.uuid4().hex}.part"
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, final_path)
+
+
+async def _commit(db, source_path: str, digest: str, size: int, extension: str, move: bool = True) -> str:
+    """Dosyayı blob yoluna al (içerik zaten varsa kopyayı at) ve referansı artır"""
+    now = datetime.utcnow()
+    reference = {"$inc": {"ref_count": 1}, "$set": {"last_referenced_at": now}}
+
+    blob = await db[BLOB_COLLECTION].find_one_and_update(
+        {"_id": digest}, reference, return_document=ReturnDocument.AFTER
+    )
+    if blob:
+        if os.path.exists(blob["path"]):
+            if move:
+                os.remove(source_path)
+        else:
+            # Kayıt var ama dosya kaybolmuş: bu kopyayla geri yükle
+            _place(source_path, blob["path"], move)
+        return blob["path"]
+
+    final_path = blob_path(digest, extension)
+    _place(source_path, final_path, move)
+    try:
+        await db[BLOB_COLLECTION].insert_one({
+            "_id": digest,
+            "path": final_path,
+            "size": size,
+            "ref_count": 1,
+            "created_at": now,
+            "last_referenced_at": now
+        })
+    except DuplicateKeyError:
+        # Aynı içerik eşzamanlı yazıldı; mevcut kayda referans ekle
+        blob = await db[BLOB_COLLECTION].find_one_and_update(
+            {"_id": digest}, reference, return_document=ReturnDocument.AFTER
+        )
+        if blob["path"] != final_path:
+            os.remove(final_path)
+        return blob["path"]
+    return final_path
+
+
+async def store_upload(
+    db,
+    file: UploadFile,
+    extension: Optional[str] = None,
+    head_check: Optional[Callable[[bytes], None]] = None
+) -> str:
+    """Yüklenen dosyayı depoya yaz ve blob yolunu döndür"""
+    extension = extension if extension is not None else _extension(file.filename)
+    temp_dir = os.path.join(blob_root(), "tmp")
+    stored = await save_upload(file, os.path.join(temp_dir, os.urandom(8).hex()), head_check=head_check)
+    return await _commit(db, stored.path, stored.sha256, stored.size, extension)
+
+
+async def store_file(db, source_path: str, extension: Optional[str] = None, move: bool = True) -> str:
+    """Diskteki bir dosyayı (ör. doğrulama için kaydedilmiş geçici dosya) depoya al"""
+    extension = extension if extension is not None else _extension(source_path)
+    digest = await asyncio.to_thread(file_sha256, source_path)
+    size = os.path.getsize(source_path)
+    return await _commit(db, source_path, digest, size, extension, move=move)
+
+
+async def release_file(db, path: Optional[str]):
+    """Bir referansı bırak
+
+    Blob ise yalnızca referans sayısı düşer (dosyayı GC siler); depo dışındaki
+    eski yüklemeler tek sahipli olduğundan doğrudan silinir.
+    """
+    if not path:
+        return
+    if is_blob_path(path):
+        await db[BLOB_COLLECTION].update_one(
+            {"path": path, "ref_count": {"$gt": 0}},
+            {"$inc": {"ref_count": -1}}
+        )
+    elif os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove file {path}: {e}")
+
+
+def _reference_pipeline(field: str, kind: str, path_filter: Dict[str, Any]):
+    value = f"${field}.file_path" if kind == "documents" else f"${field}"
+    return [
+        {"$project": {"_id": 0, "path": value}},
+        {"$unwind": "$path"},
+        {"$match": {"path": path_filter}},
+        {"$group": {"_id": "$path", "count": {"$sum": 1}}}
+    ]
+
+
+async def count_references(db, path_filter: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """REFERENCES alanlarındaki dosya yollarını say (yol -> referans sayısı)"""
+    path_filter = path_filter or {"$type": "string"}
+    counts: Dict[str, int] = {}
+    for collection, field, kind in REFERENCES:
+        pipeline = _reference_pipeline(field, kind, path_filter)
+        async for doc in db[collection].aggregate(pipeline):
+            counts[doc["_id"]] = counts.get(doc["_id"], 0) + doc["count"]
+    return counts
+
+
+async def rewrite_references(db, old_path: str, new_path: str) -> int:
+    """Tüm referans alanlarında old_path'i new_path ile değiştir"""
+    modified = 0
+    for collection, field, kind in REFERENCES:
+        if kind == "value":
+            result = await db[collection].update_many({field: old_path}, {"$set": {field: new_path}})
+        elif kind == "array":
+            result = await db[collection].update_many(
+                {field: old_path},
+                {"$set": {f"{field}.$[item]": new_path}},
+                array_filters=[{"item": old_path}]
+            )
+        else:
+            result = await db[collection].update_many(
+                {f"{field}.file_path": old_path},
+                {"$set": {f"{field}.$[item].file_path": new_path}},
+                array_filters=[{"item.file_path": old_path}]
+            )
+        modified += result.modified_count
+    return modified
+
+
+async def collect_garbage(db, grace_hours: int = 24, dry_run: bool = False) -> Dict[str, int]:
+    """Referans sayılarını yeniden hesapla, sahipsiz blob'ları sil
+
+    grace_hours: yeni yüklenip henüz bir kayda bağlanmamış dosyaları korur.
+    """
+    root = os.path.normpath(blob_root())
+    counts = await count_references(db, {"$regex": f"^{re.escape(root + os.sep)}"})
+    cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    stats = {"blobs": 0, "recounted": 0, "removed": 0, "freed_bytes": 0, "stray_files": 0}
+
+    known_paths = set()
+    async for blob in db[BLOB_COLLECTION].find({}):
+        stats["blobs"] += 1
+        known_paths.add(os.path.normpath(blob["path"]))
+        refs = counts.get(blob["path"], 0)
+
+        if refs == 0 and blob.get("last_referenced_at", blob["created_at"]) < cutoff:
+            if dry_run:
+                deleted = True
+            else:
+                # Bu arada yeniden referans alan blob'a dokunma
+                result = await db[BLOB_COLLECTION].delete_one({
+                    "_id": blob["_id"],
+                    "last_referenced_at": blob.get("last_referenced_at")
+                })
+                deleted = result.deleted_count == 1
+                if deleted:
+                    try:
+                        os.remove(blob["path"])
+                    except FileNotFoundError:
+                        pass
+            if deleted:
+                stats["removed"] += 1
+                stats["freed_bytes"] += blob.get("size", 0)
+        elif refs != blob.get("ref_count"):
+            stats["recounted"] += 1
+            if not dry_run:
+                await db[BLOB_COLLECTION].update_one({"_id": blob["_id"]}, {"$set": {"ref_count": refs}})
+
+    # Kaydı olmayan dosyalar (yarım kalan yüklemeler vb.)
+    if os.path.isdir(root):
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.normpath(os.path.join(directory, filename))
+                if path in known_paths:
+                    continue
+                if datetime.utcfromtimestamp(os.path.getmtime(path)) >= cutoff:
+                    continue
+                stats["stray_files"] += 1
+                stats["freed_bytes"] += os.path.getsize(path)
+                if not dry_run:
+                    os.remove(path)
+
+    return stats
@@ -0,0 +1,249 @@
+"""
+Dashboard istatistik motoru
+
+/reports/dashboard-stats için gereken metrikleri tek bir $facet
+aggregation'ı (transactions), günlük defter özetleri (ledger_rollups) ve
+paralel çalışan, indeks kullanan küçük sorgularla hesaplar. $facet'ten önce
+alt pipeline'ların filtrelerinin $or'u ile $match yapılır; $facet indeks
+kullanamadığından aksi halde tüm koleksiyon taranır.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.core.aggregation import lookup_by_id, top_n
+from app.models.report import DashboardStats
+from app.services.balance_history import balance_history
+from app.services.ledger_rollups import ROLLUP_COLLECTION, fetch_ledger_buckets, totals_by_month
+
+
+def _recent_transactions_query() -> Dict[str, Any]:
+    """Son 10 işlem (top_n parametreleri)"""
+    return dict(
+        sort={"transaction_date": -1},
+        limit=10,
+        enrich=[
+            lookup_by_id("bank_accounts", "bank_account_id", "bank_account"),
+            lookup_by_id("people", "person_id", "person")
+        ],
+        project={
+            "type": 1,
+            "amount": 1,
+            "description": 1,
+            "transaction_date": 1,
+            "bank_account_name": {"$arrayElemAt": ["$bank_account.name", 0]},
+            "person_name": {"$arrayElemAt": ["$person.name", 0]}
+        }
+    )
+
+
+def _top_expenses_query(start_of_month: datetime) -> Dict[str, Any]:
+    """Bu ayın en büyük 5 gideri (top_n parametreleri)"""
+    return dict(
+        match={
+            "type": "expense",
+            "transaction_date": {"$gte": start_of_month},
+            "status": "completed"
+        },
+        sort={"amount": -1},
+        limit=5,
+        enrich=[lookup_by_id("people", "person_id", "person")],
+        project={
+            "amount": 1,
+            "description": 1,
+            "transaction_date": 1,
+            "person_name": {"$arrayElemAt": ["$person.name", 0]}
+        }
+    )
+
+
+def _transaction_filters(now: datetime) -> Dict[str, Dict[str, Any]]:
+    """$facet alt pipeline'larının filtreleri (facet adı -> filtre)"""
+    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return {
+        # Gider kategorileri dağılımı
+        "expense_categories": {
+            "type": "expense",
+            "transaction_date": {"$gte": start_of_month},
+            "status": "completed"
+        },
+        # Bekleyen işlemler
+        "pending_transactions": {"status": {"$in": ["pending", "planned"]}}
+    }
+
+
+def _transaction_pipeline(now: datetime) -> List[Dict[str, Any]]:
+    """transactions üzerinde çalışacak $match + $facet pipeline'ı"""
+    filters = _transaction_filters(now)
+    facets = {
+        "expense_categories": [
+            {"$match": filters["expense_categories"]},
+            *lookup_by_id("payment_orders", "payment_order_id", "payment_order"),
+            {
+                "$group": {
+                    "_id": {"$arrayElemAt": ["$payment_order.category", 0]},
+                    "amount": {"$sum": "$amount"}
+                }
+            },
+            {"$sort": {"amount": -1}}
+        ],
+        "pending_transactions": [
+            {"$match": filters["pending_transactions"]},
+            {
+                "$group": {
+                    "_id": None,
+                    "count": {"$sum": 1},
+                    "total_amount": {"$sum": "$amount"}
+                }
+            }
+        ]
+    }
+    return [
+        # Yalnızca en az bir facet'in ihtiyaç duyduğu işlemler (indeksli)
+        {"$match": {"$or": list(filters.values())}},
+        {"$facet": facets}
+    ]
+
+
+def _best_day_pipeline() -> List[Dict[str, Any]]:
+    """En yüksek gelirli gün, günlük özet kovalarından"""
+    return [
+        {"$match": {"type": "income"}},
+        {"$group": {"_id": "$date", "daily_total": {"$sum": "$amount"}}},
+        {"$sort": {"daily_total": -1}},
+        {"$limit": 1}
+    ]
+
+
+async def _aggregate_first(collection, pipeline) -> Optional[Dict[str, Any]]:
+    """Aggregation sonucunun ilk dokümanını döndür"""
+    async for doc in collection.aggregate(pipeline):
+        return doc
+    return None
+
+
+async def compute_dashboard_stats(db, now: Optional[datetime] = None) -> DashboardStats:
+    """Dashboard istatistiklerini tek round trip'te hesapla
+
+    Tutar toplamları, trendler ve en iyi gün günlük özet kovalarından,
+    ham işlem gerektiren metrikler tek bir $match + $facet ile, indeks
+    kullanan ilk-N listeleri, banka bakiyesi ve sayaçlar ise aynı anda
+    asyncio.gather ile istenir.
+    """
+    if now is None:
+        now = datetime.utcnow()
+
+    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    (
+        facets,
+        best_day_doc,
+        recent_docs,
+        top_expense_docs,
+        half_year_buckets,
+        quarter_buckets,
+        bank_balance_doc,
+        balance_accounts,
+        pending_payments,
+        active_debts
+    ) = await asyncio.gather(
+        _aggregate_first(db.transactions, _transaction_pipeline(now)),
+        _aggregate_first(db[ROLLUP_COLLECTION], _best_day_pipeline()),
+        top_n(db.transactions, **_recent_transactions_query()),
+        top_n(db.transactions, **_top_expenses_query(start_of_month)),
+        fetch_ledger_buckets(db, now - timedelta(days=180), now),
+        fetch_ledger_buckets(db, now - timedelta(days=90), now),
+        _aggregate_first(db.bank_accounts, [
+            {"$group": {"_id": None, "total": {"$sum": "$current_balance"}}}
+        ]),
+        balance_history(db, today_start - timedelta(days=7), today_start - timedelta(days=1)),
+        db.payment_orders.count_documents({"status": "pending"}),
+        db.debts.count_documents({"status": "active"})
+    )
+    facets = facets or {}
+
+    # Bu ayın gelir/gider hesaplama
+    monthly_totals = totals_by_month(
+        [bucket for bucket in half_year_buckets if bucket["date"] >= start_of_month]
+    ).get(start_of_month.strftime("%Y-%m"), {})
+    current_month_income = monthly_totals.get("income", 0.0)
+    current_month_expense = monthly_totals.get("expense", 0.0)
+    current_month_profit = current_month_income - current_month_expense
+
+    total_bank_balance = bank_balance_doc["total"] if bank_balance_doc else 0.0
+
+    recent_transactions = [
+        {
+            "id": str(doc["_id"]),
+            "type": doc["type"],
+            "amount": doc["amount"],
+            "description": doc["description"],
+            "transaction_date": doc["transaction_date"],
+            "bank_account_name": doc.get("bank_account_name"),
+            "person_name": doc.get("person_name")
+        }
+        for doc in recent_docs
+    ]
+
+    monthly_trends = [
+        {"month": month, "income": by_type.get("income", 0), "expense": by_type.get("expense", 0)}
+        for month, by_type in totals_by_month(half_year_buckets).items()
+    ]
+
+    top_expenses = [
+        {
+            "amount": doc["amount"],
+            "description": doc["description"],
+            "transaction_date": doc["transaction_date"],
+            "person_name": doc.get("person_name")
+        }
+        for doc in top_expense_docs
+    ]
+
+    # Haftalık bakiye trendi: son 7 günün gün sonu defter bakiyeleri (tüm
+    # hesaplar). İşlem yazmayan bakiye hareketleri (kart / borç ödemesi, çek
+    # tahsili) dahil değildir; total_bank_balance ile farkı bunlardır.
+    weekly_balance_trend = [
+        {"date": day.strftime("%d/%m"), "balance": 0.0}
+        for day in (today_start - timedelta(days=7 - i) for i in range(7))
+    ]
+    for account in balance_accounts:
+        for trend, point in zip(weekly_balance_trend, account["points"]):
+            trend["balance"] += point["balance"]
+
+    expense_categories = [
+        {"name": doc["_id"] or "Diğer", "amount": doc["amount"]}
+        for doc in facets.get("expense_categories", [])
+    ]
+
+    monthly_income = [
+        by_type["income"] for by_type in totals_by_month(quarter_buckets).values() if "income" in by_type
+    ]
+    monthly_average = sum(monthly_income) / len(monthly_income) if monthly_income else 0.0
+
+    best_day_amount = best_day_doc["daily_total"] if best_day_doc else 0.0
+    best_day_date = best_day_doc["_id"].strftime("%Y-%m-%d") if best_day_doc else None
+
+    pending_docs = facets.get("pending_transactions", [])
+    pending_transactions_count = pending_docs[0]["count"] if pending_docs else 0
+    pending_transactions_amount = pending_docs[0]["total_amount"] if pending_docs else 0.0
+
+    return DashboardStats(
+        current_month_income=current_month_income,
+        current_month_expense=current_month_expense,
+        current_month_profit=current_month_profit,
+        total_bank_balance=total_bank_balance,
+        pending_payments=pending_payments,
+        active_debts=active_debts,
+        recent_transactions=recent_transactions,
+        monthly_trends=monthly_trends,
+        top_expenses=top_expenses,
+        weekly_balance_trend=weekly_balance_trend,
+        expense_categories=expense_categories,
+        monthly_average=monthly_average,
+        best_day_amount=best_day_amount,
+        best_day_date=best_day_date,
+        pending_transactions_count=pending_transactions_count,
+        pending_transactions_amount=pending_transactions_amount
+    )
@@ -0,0 +1,224 @@
+"""
+Vade bildirimleri
+
+Onaylı ödeme emirleri, açık borçlar, aktif çekler ve kredi kartı hesap
+kesim / son ödeme günleri için due_notification_days gün içinde vadesi
+gelenlere bildirim üretir. Her kaynak tek sorguyla (yalnızca gereken
+alanlar) okunur; aynı vade için ikinci bildirim üretmemek adına her
+bildirime dedupe_key yazılır ve kayıtlar bu anahtar üzerinde (unique indeks)
+tek bulk_write ile $setOnInsert upsert edilir. Satır başına find_one yapılmaz.
+
+Üretici zamanlayıcıda saatlik çalışır (bkz. app.services.scheduled_jobs).
+"""
+import asyncio
+import logging
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.models.notification import (
+    NotificationChannel,
+    NotificationPriority,
+    NotificationStatus,
+    NotificationType
+)
+from app.services.notification_delivery import notification_delivery
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_USER = "system"
+DUPLICATE_KEY_ERROR = 11000
+
+
+def next_day_of_month(day: int, from_date: date) -> date:
+    """Bugün dahil, ayın day. gününün bir sonraki tarihi (kısa aylarda son gün)"""
+    year, month = from_date.year, from_date.month
+    for _ in range(2):
+        target = date(year, month, min(day, monthrange(year, month)[1]))
+        if target >= from_date:
+            return target
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return target
+
+
+def _format_amount(amount: Any, currency: str = "TRY") -> str:
+    """1500.5 -> '1.500,50 TL'"""
+    formatted = f"{amount:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    return f"{formatted} {'TL' if currency == 'TRY' else currency}"
+
+
+def _candidate(
+    notification_type: NotificationType,
+    user_id: str,
+    entity_type: str,
+    entity_id: Any,
+    due: date,
+    title: str,
+    message: str,
+    action_url: str,
+    priority: NotificationPriority = NotificationPriority.HIGH
+) -> Dict[str, Any]:
+    return {
+        "dedupe_key": f"{notification_type.value}:{entity_id}:{user_id}:{due.isoformat()}",
+        "title": title,
+        "message": message,
+        "type": notification_type,
+        "priority": priority,
+        "channels": [NotificationChannel.IN_APP],
+        "user_id": user_id,
+        "related_entity_type": entity_type,
+        "related_entity_id": str(entity_id),
+        "scheduled_at": None,
+        "expires_at": None,
+        "metadata": {"due_date": due.isoformat()},
+        "action_url": action_url,
+        "action_text": "Detayları Görüntüle",
+        "status": NotificationStatus.PENDING,
+        "delivery_attempts": 0,
+        "delivery_errors": [],
+        "created_by": SYSTEM_USER
+    }
+
+
+async def _payment_order_candidates(db, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    cursor = db.payment_orders.find(
+        {"status": "approved", "due_date": {"$gte": start, "$lt": end}},
+        {"recipient_name": 1, "amount": 1, "currency": 1, "due_date": 1, "created_by": 1}
+    )
+    return [
+        _candidate(
+            NotificationType.PAYMENT_DUE, order["created_by"], "payment_order", order["_id"],
+            order["due_date"].date(),
+            "Ödeme Vadesi Yaklaşıyor",
+            f"{order['recipient_name']} için {_format_amount(order['amount'], order.get('currency', 'TRY'))} "
+            f"ödeme vadesi yaklaşıyor ({order['due_date']:%d.%m.%Y}).",
+            f"/payment-orders/{order['_id']}"
+        )
+        async for order in cursor
+    ]
+
+
+async def _debt_candidates(db, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    cursor = db.debts.find(
+        {"status": {"$in": ["active", "partial", "overdue"]}, "due_date": {"$gte": start, "$lt": end}},
+        {"creditor_name": 1, "debtor_name": 1, "debt_type": 1, "amount": 1, "remaining_amount": 1,
+         "currency": 1, "due_date": 1, "created_by": 1}
+    )
+    candidates = []
+    async for debt in cursor:
+        amount = debt.get("remaining_amount") or debt["amount"]
+        if debt.get("debt_type") == "receivable":
+            message = f"{debt.get('debtor_name') or debt['creditor_name']} alacağının vadesi yaklaşıyor"
+        else:
+            message = f"{debt['creditor_name']} borcunun vadesi yaklaşıyor"
+        candidates.append(_candidate(
+            NotificationType.DEBT_REMINDER, debt["created_by"], "debt", debt["_id"],
+            debt["due_date"].date(),
+            "Borç Vadesi Yaklaşıyor",
+            f"{message}: {_format_amount(amount, debt.get('currency', 'TRY'))} ({debt['due_date']:%d.%m.%Y}).",
+            f"/debts/{debt['_id']}"
+        ))
+    return candidates
+
+
+async def _check_candidates(db, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    cursor = db.checks.find(
+        {"status": "active", "due_date": {"$gte": start, "$lt": end}},
+        {"check_number": 1, "drawer_name": 1, "check_type": 1, "amount": 1, "currency": 1,
+         "due_date": 1, "created_by": 1}
+    )
+    return [
+        _candidate(
+            NotificationType.CHECK_DUE, check["created_by"], "check", check["_id"],
+            check["due_date"].date(),
+            "Çek Vadesi Yaklaşıyor",
+            f"{check['drawer_name']} ({check['check_number']}) "
+            f"{'verilen' if check.get('check_type') == 'issued' else 'alınan'} çekin vadesi yaklaşıyor: "
+            f"{_format_amount(check['amount'], check.get('currency', 'TRY'))} ({check['due_date']:%d.%m.%Y}).",
+            f"/checks/{check['_id']}"
+        )
+        async for check in cursor
+    ]
+
+
+async def _credit_card_candidates(db, today: date, days: int, admin_ids: List[str]) -> List[Dict[str, Any]]:
+    """Kartların sahibi tutulmadığından bildirimler yöneticilere gider"""
+    if not admin_ids:
+        return []
+    candidates = []
+    async for card in db.credit_cards.find({}, {"name": 1, "bank_name": 1, "used_amount": 1, "statement_date": 1, "due_date": 1}):
+        statement = next_day_of_month(card["statement_date"], today)
+        due = next_day_of_month(card["due_date"], today)
+        for admin_id in admin_ids:
+            if (statement - today).days <= days:
+                candidates.append(_candidate(
+                    NotificationType.PAYMENT_REMINDER, admin_id, "credit_card_statement", card["_id"], statement,
+                    "Kredi Kartı Hesap Kesimi",
+                    f"{card['bank_name']} {card['name']} hesap kesim tarihi {statement:%d.%m.%Y}.",
+                    f"/credit-cards/{card['_id']}",
+                    NotificationPriority.MEDIUM
+                ))
+            if (due - today).days <= days:
+                candidates.append(_candidate(
+                    NotificationType.PAYMENT_DUE, admin_id, "credit_card", card["_id"], due,
+                    "Kredi Kartı Son Ödeme Tarihi",
+                    f"{card['bank_name']} {card['name']} son ödeme tarihi {due:%d.%m.%Y}, "
+                    f"kullanılan tutar {_format_amount(card.get('used_amount', 0))}.",
+                    f"/credit-cards/{card['_id']}"
+                ))
+    return candidates
+
+
+async def create_due_notifications(db, today: Optional[date] = None, days: Optional[int] = None) -> Dict[str, int]:
+    """Vadesi yaklaşan kayıtlar için eksik bildirimleri oluştur
+
+    Tekrar çalıştırmak güvenlidir: aynı kayıt + vade için bildirim yeniden
+    oluşturulmaz. {"candidates": .., "created": ..} döndürür.
+    """
+    today = today or datetime.utcnow().date()
+    days = settings.due_notification_days if days is None else days
+    start = datetime.combine(today, datetime.min.time())
+    end = start + timedelta(days=days + 1)
+
+    admin_ids = [str(user["_id"]) async for user in db.users.find({"role": "admin"}, {"_id": 1})]
+    sources = await asyncio.gather(
+        _payment_order_candidates(db, start, end),
+        _debt_candidates(db, start, end),
+        _check_candidates(db, start, end),
+        _credit_card_candidates(db, today, days, admin_ids)
+    )
+    candidates = [candidate for source in sources for candidate in source]
+    if not candidates:
+        return {"candidates": 0, "created": 0}
+
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"dedupe_key": candidate["dedupe_key"]},
+            {"$setOnInsert": {**candidate, "created_at": now, "updated_at": now}},
+            upsert=True
+        )
+        for candidate in candidates
+    ]
+    try:
+        result = await db.notifications.bulk_write(operations, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        # Eşzamanlı başka bir çalıştırma aynı anahtarı eklediyse yok say
+        if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+            raise
+        upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+
+    created = [
+        {**candidates[index], "_id": notification_id}
+        for index, notification_id in upserted.items()
+    ]
+    if created:
+        await notification_delivery.enqueue(db, created)
+
+    logger.info(f"Due notifications: {len(candidates)} candidates, {len(created)} created")
+    return {"candidates": len(candidates), "created": len(created)}
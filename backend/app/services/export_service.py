@@ -0,0 +1,113 @@
+"""
+Toplu dışa aktarma servisi
+
+Kayıtlar Motor cursor'ından okunduğu anda NDJSON veya CSV satırına çevrilip
+StreamingResponse ile gönderilir. Pydantic doğrulaması yapılmaz, yalnızca
+istenen alanlar projeksiyonla okunur ve her seferinde en fazla bir batch
+bellekte tutulur; bellek kullanımı satır sayısından bağımsızdır.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return str(value)
+
+
+def _csv_value(value) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=_json_default)
+    return value
+
+
+def select_fields(requested: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """Virgülle ayrılmış alan listesini doğrula (boşsa tüm alanlar)"""
+    if not requested:
+        return list(allowed)
+    fields = [field.strip() for field in requested.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Bilinmeyen alan(lar): {', '.join(unknown)}"
+        )
+    return fields
+
+
+async def _ndjson_chunks(cursor, fields: List[str], batch_size: int) -> AsyncIterator[bytes]:
+    buffer = []
+    async for doc in cursor:
+        row = {field: doc.get(field) for field in fields}
+        buffer.append(json.dumps(row, ensure_ascii=False, default=_json_default))
+        if len(buffer) >= batch_size:
+            yield ("\n".join(buffer) + "\n").encode("utf-8")
+            buffer = []
+    if buffer:
+        yield ("\n".join(buffer) + "\n").encode("utf-8")
+
+
+async def _csv_chunks(cursor, fields: List[str], batch_size: int) -> AsyncIterator[bytes]:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    # Excel'in UTF-8 olarak açması için BOM
+    output.write("\ufeff")
+    writer.writerow(fields)
+    rows = 0
+    async for doc in cursor:
+        writer.writerow([_csv_value(doc.get(field)) for field in fields])
+        rows += 1
+        if rows >= batch_size:
+            yield output.getvalue().encode("utf-8")
+            output.seek(0)
+            output.truncate(0)
+            rows = 0
+    if output.tell():
+        yield output.getvalue().encode("utf-8")
+
+
+def stream_export(
+    collection,
+    filter_query: Dict[str, Any],
+    sort: List[tuple],
+    fields: List[str],
+    export_format: str,
+    filename: str,
+    batch_size: int = 1000
+) -> StreamingResponse:
+    """Sorgu sonucunu NDJSON / CSV olarak akıt"""
+    projection = {field: 1 for field in fields}
+    if "_id" not in fields:
+        projection["_id"] = 0
+
+    cursor = collection.find(filter_query, projection).sort(sort).batch_size(batch_size)
+
+    if export_format == "csv":
+        chunks = _csv_chunks(cursor, fields, batch_size)
+    else:
+        chunks = _ndjson_chunks(cursor, fields, batch_size)
+
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
@@ -0,0 +1,177 @@
+"""
+Görsel ön işleme (vision model çağrılarından önce)
+
+Telefon fotoğrafları (4000px, birkaç MB) modele olduğu gibi gönderilmez:
+EXIF yönü düzeltilir, belge arka plandan kırpılır, en uzun kenar
+ai_image_max_dimension'a küçültülür ve (isteğe bağlı gri tonlamalı) JPEG
+olarak ayarlı kalitede kodlanır. Modele giden veri ve çağrı süresi azalır.
+
+Sonuç dosya içeriğinin SHA-256 özeti + ayarlar ile bellekte önbelleğe alınır;
+aynı dekont farklı prompt'larla (doğrulama tekrarı, farklı ödeme emri) tekrar
+işlenirken yeniden kodlanmaz.
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, NamedTuple, Optional, Tuple, Union
+
+import PIL.Image
+from PIL import ImageChops, ImageFilter, ImageOps
+
+from app.core.config import settings
+from app.services.ai_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Kırpma: arka plandan bu kadar farklı pikseller belge sayılır
+AUTOCROP_THRESHOLD = 40
+# Bulunan alan görüntünün bu oranından küçükse kırpılmaz (yanlış tespit)
+AUTOCROP_MIN_AREA_RATIO = 0.2
+AUTOCROP_MARGIN_RATIO = 0.02
+AUTOCROP_ANALYSIS_SIZE = 512
+
+
+class PreparedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    original_size: Tuple[int, int]
+    size: Tuple[int, int]
+
+    def as_part(self) -> Dict[str, Any]:
+        """Gemini içerik parçası (inline blob)"""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def _document_bbox(image: PIL.Image.Image) -> Optional[Tuple[int, int, int, int]]:
+    """Arka plandan ayrışan belge alanını bul (bulunamazsa None)"""
+    small = image.convert("L")
+    small.thumbnail((AUTOCROP_ANALYSIS_SIZE, AUTOCROP_ANALYSIS_SIZE))
+    small = small.filter(ImageFilter.MedianFilter(5))
+
+    # Arka plan rengi: kenar piksellerinin medyanı
+    width, height = small.size
+    pixels = small.load()
+    border = sorted(
+        [pixels[x, 0] for x in range(width)] + [pixels[x, height - 1] for x in range(width)]
+        + [pixels[0, y] for y in range(height)] + [pixels[width - 1, y] for y in range(height)]
+    )
+    background = PIL.Image.new("L", small.size, border[len(border) // 2])
+
+    mask = ImageChops.difference(small, background).point(lambda v: 255 if v > AUTOCROP_THRESHOLD else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return None
+
+    left, top, right, bottom = bbox
+    if (right - left) * (bottom - top) < AUTOCROP_MIN_AREA_RATIO * width * height:
+        return None
+
+    # Küçük görüntü koordinatlarını orijinale ölçekle, kenar payı bırak
+    scale_x = image.width / width
+    scale_y = image.height / height
+    margin_x = int(image.width * AUTOCROP_MARGIN_RATIO)
+    margin_y = int(image.height * AUTOCROP_MARGIN_RATIO)
+    return (
+        max(0, int(left * scale_x) - margin_x),
+        max(0, int(top * scale_y) - margin_y),
+        min(image.width, int(right * scale_x) + margin_x),
+        min(image.height, int(bottom * scale_y) + margin_y)
+    )
+
+
+def preprocess_image(
+    source: Union[str, BinaryIO],
+    max_dimension: int,
+    quality: int,
+    grayscale: bool = True,
+    autocrop: bool = True
+) -> PreparedImage:
+    """Görseli (dosya yolu veya bayt akışı) modele gönderilecek JPEG'e dönüştür
+
+    CPU işidir ve senkron çalışır.
+    """
+    with PIL.Image.open(source) as opened:
+        original_size = opened.size
+        image = ImageOps.exif_transpose(opened)
+        image = image.convert("L" if grayscale else "RGB")
+
+    if autocrop:
+        bbox = _document_bbox(image)
+        if bbox and bbox != (0, 0, image.width, image.height):
+            image = image.crop(bbox)
+
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), PIL.Image.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality, optimize=True)
+    return PreparedImage(output.getvalue(), "image/jpeg", original_size, image.size)
+
+
+class ImagePreprocessor:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, PreparedImage]" = OrderedDict()
+        # prepare thread havuzunda çalışır
+        self._lock = threading.Lock()
+        self.metrics = {
+            "prepared": 0,
+            "cache_hits": 0,
+            "source_bytes": 0,
+            "sent_bytes": 0
+        }
+
+    @staticmethod
+    def options() -> Tuple:
+        """Çıktıyı belirleyen ayarlar (önbellek anahtarlarına girer)"""
+        return (
+            settings.ai_image_max_dimension,
+            settings.ai_image_jpeg_quality,
+            settings.ai_image_grayscale,
+            settings.ai_image_autocrop
+        )
+
+    def _prepare(self, file_path: str) -> PreparedImage:
+        options = self.options()
+        key = hashlib.sha256(f"{file_sha256(file_path)}:{options}".encode()).hexdigest()
+
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is not None:
+                self._entries.move_to_end(key)
+                self.metrics["cache_hits"] += 1
+                return prepared
+
+        prepared = preprocess_image(file_path, *options)
+        source_bytes = os.path.getsize(file_path)
+        logger.info(
+            f"Image prepared: {prepared.original_size} -> {prepared.size}, "
+            f"{source_bytes} -> {len(prepared.data)} bytes"
+        )
+
+        with self._lock:
+            self.metrics["prepared"] += 1
+            self.metrics["source_bytes"] += source_bytes
+            self.metrics["sent_bytes"] += len(prepared.data)
+            self._entries[key] = prepared
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return prepared
+
+    async def prepare(self, file_path: str) -> PreparedImage:
+        """Görseli thread'de hazırla (önbellekte varsa doğrudan döner)"""
+        return await asyncio.to_thread(self._prepare, file_path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "memory_entries": len(self._entries)
+        }
+
+
+# Global ön işleme örneği
+image_preprocessor = ImagePreprocessor(settings.ai_image_cache_max_entries)
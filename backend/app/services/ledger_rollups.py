@@ -0,0 +1,265 @@
+"""
+Günlük defter özetleri (ledger_rollups)
+
+Tamamlanmış işlemler gün / banka hesabı / işlem türü / para birimi bazında
+önceden toplanır. Raporlar ham transactions yerine bu kovaları okur; işlem
+yazan akışlar record_transaction ile özeti artımlı olarak günceller. Aynı
+çağrı, rapor önbelleği için işlem ayının veri sürümünü de artırır.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.core.indexes import ensure_collection_indexes
+from app.services.report_cache import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "ledger_rollups"
+ROLLUP_KEY_FIELDS = ("date", "bank_account_id", "type", "currency")
+ROLLUP_SUM_FIELDS = ("amount", "net_amount", "total_fees", "balance_impact")
+RECONCILE_BATCH_SIZE = 1000
+
+_DAY_STRING = {"$dateToString": {"format": "%Y-%m-%d", "date": "$transaction_date"}}
+
+
+def _day_start(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _plain(value):
+    """Enum / ObjectId değerlerini özet anahtarı için sade tipe çevir"""
+    if value is None:
+        return None
+    value = getattr(value, "value", value)
+    return value if isinstance(value, str) else str(value)
+
+
+def _group_stage(day_expression) -> Dict[str, Any]:
+    group = {
+        "_id": {
+            "date": day_expression,
+            "bank_account_id": {"$toString": "$bank_account_id"},
+            "type": "$type",
+            "currency": "$currency"
+        },
+        "count": {"$sum": 1}
+    }
+    for field in ROLLUP_SUM_FIELDS:
+        group[field] = {"$sum": {"$ifNull": [f"${field}", 0]}}
+    return {"$group": group}
+
+
+def _flatten_stage() -> Dict[str, Any]:
+    project = {"_id": 0, "count": 1}
+    for field in ROLLUP_KEY_FIELDS:
+        project[field] = f"$_id.{field}"
+    for field in ROLLUP_SUM_FIELDS:
+        project[field] = 1
+    return {"$project": project}
+
+
+async def record_transaction(db, transaction: Dict[str, Any], sign: int = 1, session=None):
+    """Tek bir işlemi özet kovasına ekle (sign=-1 ile geri al)
+
+    Sadece tamamlanmış işlemler özete yansır. Hata durumunda işlem akışı
+    bozulmaz; özet rebuild_ledger_rollups ile yeniden kurulabilir. session
+    verilirse güncelleme transaction'ın parçasıdır ve hata yükseltilir
+    (transaction geri alınır).
+    """
+    # Bekleyen işlemler de "bekleyenler dahil" raporlarını etkiler
+    await bump_data_version(db, "transactions", [transaction.get("transaction_date")])
+    if _plain(transaction.get("status")) != "completed" or not transaction.get("transaction_date"):
+        return
+
+    key = {
+        "date": _day_start(transaction["transaction_date"]),
+        "bank_account_id": _plain(transaction.get("bank_account_id")),
+        "type": _plain(transaction.get("type")),
+        "currency": _plain(transaction.get("currency"))
+    }
+    increments = {"count": sign}
+    for field in ROLLUP_SUM_FIELDS:
+        increments[field] = sign * float(transaction.get(field) or 0)
+
+    update = {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}}
+    if session is not None:
+        await db[ROLLUP_COLLECTION].update_one(key, update, upsert=True, session=session)
+        return
+    try:
+        try:
+            await db[ROLLUP_COLLECTION].update_one(key, update, upsert=True)
+        except DuplicateKeyError:
+            # Aynı kovaya eşzamanlı upsert; kova artık var, tekrar dene
+            await db[ROLLUP_COLLECTION].update_one(key, update)
+    except Exception as e:
+        logger.error(f"Ledger rollup update failed: {e}")
+
+
+async def rebuild_ledger_rollups(db) -> int:
+    """Özet koleksiyonunu transactions üzerinden baştan oluştur
+
+    $out koleksiyonu toptan değiştirir; aggregation sırasında record_transaction
+    ile gelen artışlar kaybolur. Yalnızca yazım yokken (kurulum, bakım betiği)
+    kullanılmalı; canlı sistemde reconcile_ledger_rollups kullanılır.
+    """
+    await ensure_collection_indexes(db, ROLLUP_COLLECTION)
+    pipeline = [
+        {"$match": {"status": "completed", "transaction_date": {"$type": "date"}}},
+        _group_stage({"$dateFromString": {"dateString": _DAY_STRING}}),
+        _flatten_stage(),
+        {"$out": ROLLUP_COLLECTION}
+    ]
+    async for _ in db.transactions.aggregate(pipeline):
+        pass
+    return await db[ROLLUP_COLLECTION].count_documents({})
+
+
+async def reconcile_ledger_rollups(db, before: Optional[datetime] = None) -> Dict[str, int]:
+    """Kapanmış günlerin (before'dan, varsayılan bugünden önceki) kovalarını düzelt
+
+    Kovalar transactions'tan yeniden hesaplanıp tek tek yerine yazılır.
+    Hesaplama başladıktan sonra record_transaction ile artırılmış bir kova
+    (updated_at >= başlangıç) ezilmez, eşzamanlı artışlar kaybolmaz; bu
+    kovalar bir sonraki çalıştırmada düzeltilir. Artık karşılığı olmayan
+    eski kovalar silinir.
+    """
+    await ensure_collection_indexes(db, ROLLUP_COLLECTION)
+    started = datetime.utcnow()
+    before = before or _day_start(started)
+    untouched = {"$not": {"$gte": started}}
+    collection = db[ROLLUP_COLLECTION]
+    pipeline = [
+        {"$match": {"status": "completed", "transaction_date": {"$type": "date", "$lt": before}}},
+        _group_stage(_DAY_STRING),
+        _flatten_stage()
+    ]
+
+    counts = {"buckets": 0, "replaced": 0, "skipped": 0, "removed": 0}
+
+    async def flush(operations):
+        try:
+            details = (await collection.bulk_write(operations, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            # Eşzamanlı artırılan kovada upsert anahtar çakışması verir; atlanır
+            details = e.details
+            if any(error.get("code") != 11000 for error in details.get("writeErrors", [])):
+                raise
+            counts["skipped"] += len(details.get("writeErrors", []))
+        counts["replaced"] += details.get("nModified", 0) + details.get("nUpserted", 0)
+
+    operations = []
+    async for bucket in db.transactions.aggregate(pipeline, allowDiskUse=True):
+        counts["buckets"] += 1
+        bucket["date"] = datetime.strptime(bucket["date"], "%Y-%m-%d")
+        key = {field: bucket[field] for field in ROLLUP_KEY_FIELDS}
+        bucket.update({"rebuilt_at": started, "updated_at": started})
+        operations.append(ReplaceOne({**key, "updated_at": untouched}, bucket, upsert=True))
+        if len(operations) >= RECONCILE_BATCH_SIZE:
+            await flush(operations)
+            operations = []
+    if operations:
+        await flush(operations)
+
+    result = await collection.delete_many({
+        "date": {"$lt": before},
+        "rebuilt_at": {"$ne": started},
+        "updated_at": untouched
+    })
+    counts["removed"] = result.deleted_count
+    return counts
+
+
+async def ensure_ledger_rollups(db):
+    """Özet boşsa ve işlem varsa bir kez yeniden oluştur"""
+    if await db[ROLLUP_COLLECTION].estimated_document_count() > 0:
+        return
+    if await db.transactions.estimated_document_count() == 0:
+        return
+    count = await rebuild_ledger_rollups(db)
+    logger.info(f"Ledger rollups rebuilt: {count} buckets")
+
+
+async def fetch_ledger_buckets(
+    db,
+    start: datetime,
+    end: datetime,
+    bank_account_ids: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """[start, end] aralığındaki günlük kovaları getir
+
+    Tam kapsanan günler ledger_rollups'tan, aralığın başındaki ve sonundaki
+    kısmi günler ise ham transactions üzerinden aynı gruplama ile okunur.
+    """
+    first_full_day = _day_start(start)
+    if first_full_day < start:
+        first_full_day += timedelta(days=1)
+    last_full_day_end = _day_start(end)
+
+    rollup_filter: Dict[str, Any] = {}
+    raw_filter: Dict[str, Any] = {"status": "completed"}
+    if bank_account_ids is not None:
+        rollup_filter["bank_account_id"] = {"$in": bank_account_ids}
+        raw_filter["bank_account_id"] = {"$in": bank_account_ids}
+
+    if first_full_day < last_full_day_end:
+        rollup_filter["date"] = {"$gte": first_full_day, "$lt": last_full_day_end}
+        raw_ranges = [{"transaction_date": {"$gte": last_full_day_end, "$lte": end}}]
+        if start < first_full_day:
+            raw_ranges.append({"transaction_date": {"$gte": start, "$lt": first_full_day}})
+    else:
+        rollup_filter = None
+        raw_ranges = [{"transaction_date": {"$gte": start, "$lte": end}}]
+
+    raw_pipeline = [
+        {"$match": {**raw_filter, "$or": raw_ranges}},
+        _group_stage(_DAY_STRING),
+        _flatten_stage()
+    ]
+
+    async def _rollups():
+        if rollup_filter is None:
+            return []
+        return await db[ROLLUP_COLLECTION].find(rollup_filter, {"_id": 0, "updated_at": 0, "rebuilt_at": 0}).to_list(None)
+
+    rollup_buckets, raw_buckets = await asyncio.gather(
+        _rollups(),
+        db.transactions.aggregate(raw_pipeline).to_list(None)
+    )
+    for bucket in raw_buckets:
+        bucket["date"] = datetime.strptime(bucket["date"], "%Y-%m-%d")
+    return rollup_buckets + raw_buckets
+
+
+def totals_by_type(buckets: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Kovaları işlem türüne göre topla"""
+    totals: Dict[str, Dict[str, float]] = {}
+    for bucket in buckets:
+        entry = totals.setdefault(bucket["type"], {"count": 0, **{f: 0.0 for f in ROLLUP_SUM_FIELDS}})
+        entry["count"] += bucket.get("count", 0)
+        for field in ROLLUP_SUM_FIELDS:
+            entry[field] += bucket.get(field, 0.0)
+    return totals
+
+
+def totals_by_month(buckets: List[Dict[str, Any]], field: str = "amount") -> Dict[str, Dict[str, float]]:
+    """Kovaları ay (YYYY-MM) ve işlem türüne göre topla, aylar sıralı döner"""
+    months: Dict[str, Dict[str, float]] = {}
+    for bucket in buckets:
+        month = bucket["date"].strftime("%Y-%m")
+        by_type = months.setdefault(month, {})
+        by_type[bucket["type"]] = by_type.get(bucket["type"], 0.0) + bucket.get(field, 0.0)
+    return dict(sorted(months.items()))
+
+
+def totals_by_day(buckets: List[Dict[str, Any]], field: str = "balance_impact") -> Dict[str, float]:
+    """Kovaları gün (YYYY-MM-DD) bazında topla"""
+    days: Dict[str, float] = {}
+    for bucket in buckets:
+        day = bucket["date"].strftime("%Y-%m-%d")
+        days[day] = days.get(day, 0.0) + bucket.get(field, 0.0)
+    return days
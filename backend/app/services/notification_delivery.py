@@ -0,0 +1,387 @@
+"""
+Bildirim gönderimi (outbox + kanal bazlı worker'lar)
+
+Bildirim oluşturulurken uygulama içi dışındaki her kanal için
+notification_outbox koleksiyonuna bir teslimat kaydı yazılır. Her kanalın
+kendi worker'ı vardır; kanallar birbirini beklemez, her worker vadesi gelen
+kayıtları notification_batch_size'lık gruplar halinde alıp transport'a
+toplu olarak verir.
+
+Başarısız teslimatlar üstel geri çekilmeyle (notification_retry_base_seconds
+* 2^(deneme-1), üst sınır notification_retry_max_seconds) yeniden denenir;
+notification_max_attempts denemeden sonra kalıcı olarak başarısız sayılır.
+Kayıtlar veritabanında durduğu için yeniden başlatmada kaybolmaz; gönderim
+sırasında süreç ölürse kilit süresi dolan kayıtlar tekrar alınır. Kilit,
+partinin en kötü durumda gönderim süresinden (ceil(parti / eşzamanlılık)
+* zaman aşımı) bir zaman aşımı uzun tutulur; sonuç yazımı kilidi alan
+worker'ın claim'iyle eşleşir, kilidi başka worker'a geçmiş kayıtlar ezilmez.
+
+Transport'lar değiştirilebilir: register_transport ile kanal başına gerçek
+sağlayıcı (SMTP, SMS, push) eklenir. Varsayılan "log" transport'u yalnızca
+loglar; "memory" transport'u testler ve benchmark'lar içindir.
+"""
+import asyncio
+import logging
+import math
+from abc import ABC, abstractmethod
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.models.notification import NotificationChannel, NotificationStatus
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_OUTBOX_COLLECTION = "notification_outbox"
+
+DELIVERY_PENDING = "pending"
+DELIVERY_SENDING = "sending"
+DELIVERY_DELIVERED = "delivered"
+DELIVERY_FAILED = "failed"
+
+# Uygulama içi bildirim zaten notifications koleksiyonunda; outbox'a yazılmaz
+EXTERNAL_CHANNELS = (NotificationChannel.EMAIL, NotificationChannel.SMS, NotificationChannel.PUSH)
+
+
+class NotificationTransport(ABC):
+    """Bir kanalın gönderim sağlayıcısı
+
+    Alt sınıflar send'i (tek bildirim) uygulamak zorundadır; eksikse sınıf
+    örneklenirken hata verir. Sağlayıcı toplu gönderimi destekliyorsa
+    send_batch ayrıca ezilebilir.
+    """
+    channel: NotificationChannel
+
+    def __init__(self, channel: NotificationChannel, concurrency: int = 10):
+        self.channel = channel
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @abstractmethod
+    async def send(self, notification: Dict[str, Any]):
+        """Tek bildirimi gönder; başarısızlıkta hata yükselt"""
+
+    async def _send_one(self, notification: Dict[str, Any]) -> Optional[str]:
+        async with self._semaphore:
+            try:
+                await asyncio.wait_for(self.send(notification), timeout=settings.notification_send_timeout_seconds)
+            except asyncio.TimeoutError:
+                return f"{settings.notification_send_timeout_seconds:g} saniyede yanıt alınamadı"
+            except Exception as e:
+                return str(e) or type(e).__name__
+        return None
+
+    async def send_batch(self, notifications: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Her bildirim için hata mesajı (başarılıysa None) döndür"""
+        return await asyncio.gather(*(self._send_one(notification) for notification in notifications))
+
+
+class LogTransport(NotificationTransport):
+    """Gerçek sağlayıcı yapılandırılmamışken gönderimi yalnızca loglar"""
+
+    async def send(self, notification: Dict[str, Any]):
+        logger.info(f"{self.channel.value} notification sent to user {notification.get('user_id')}: {notification['title']}")
+
+
+class MemoryTransport(NotificationTransport):
+    """Gönderilenleri bellekte tutan yerel transport (test / benchmark)
+
+    latency: gönderim başına bekleme, failure_rate: rastgele hata oranı
+    """
+
+    def __init__(
+        self,
+        channel: NotificationChannel,
+        concurrency: int = 10,
+        latency: float = 0.0,
+        failure_rate: float = 0.0
+    ):
+        super().__init__(channel, concurrency)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent: List[Dict[str, Any]] = []
+
+    async def send(self, notification: Dict[str, Any]):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise ConnectionError("Sağlayıcı geçici olarak yanıt vermiyor")
+        self.sent.append(notification)
+
+
+def retry_delay(attempts: int) -> float:
+    """attempts. başarısız denemeden sonra beklenecek süre (sn, jitter'lı)"""
+    delay = min(
+        settings.notification_retry_base_seconds * 2 ** (attempts - 1),
+        settings.notification_retry_max_seconds
+    )
+    return delay * random.uniform(0.8, 1.2)
+
+
+def lock_seconds(batch_size: int, concurrency: int) -> float:
+    """batch_size'lık bir partinin kilit süresi: en kötü gönderim süresi + bir zaman aşımı payı"""
+    waves = math.ceil(batch_size / max(concurrency, 1))
+    return (waves + 1) * settings.notification_send_timeout_seconds
+
+
+def _default_transport(channel: NotificationChannel) -> NotificationTransport:
+    concurrency = settings.notification_channel_concurrency
+    if settings.notification_transport == "memory":
+        return MemoryTransport(channel, concurrency)
+    return LogTransport(channel, concurrency)
+
+
+class NotificationDelivery:
+    def __init__(self):
+        self._transports: Dict[NotificationChannel, NotificationTransport] = {}
+        self._db = None
+        self._wakeups: Dict[NotificationChannel, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.metrics = {"delivered": 0, "retried": 0, "failed": 0}
+
+    def register_transport(self, transport: NotificationTransport):
+        """Kanalın transport'unu değiştir"""
+        self._transports[transport.channel] = transport
+
+    def transport(self, channel: NotificationChannel) -> NotificationTransport:
+        if channel not in self._transports:
+            self._transports[channel] = _default_transport(channel)
+        return self._transports[channel]
+
+    def _ensure_started(self, db):
+        self._db = db
+        if self._tasks:
+            return
+        for channel in EXTERNAL_CHANNELS:
+            self._wakeups[channel] = asyncio.Event()
+            self._tasks.append(asyncio.create_task(self._worker(channel), name=f"notification-{channel.value}"))
+
+    async def start(self, db):
+        """Kanal worker'larını başlat (bekleyen ve yarım kalan teslimatlar da alınır)"""
+        self._ensure_started(db)
+        self.wake()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeups = {}
+
+    def wake(self, channels: Iterable[NotificationChannel] = EXTERNAL_CHANNELS):
+        for channel in channels:
+            event = self._wakeups.get(channel)
+            if event:
+                event.set()
+
+    async def enqueue(self, db, notifications: List[Dict[str, Any]]) -> int:
+        """Bildirimlerin dış kanal teslimatlarını outbox'a yaz
+
+        notifications: _id'si atanmış bildirim dokümanları. Dış kanalı
+        olmayanlar doğrudan gönderildi sayılır. Yazılan kayıt sayısını döndürür.
+        """
+        self._ensure_started(db)
+        now = datetime.utcnow()
+        entries = []
+        in_app_only = []
+        channels = set()
+
+        for notification in notifications:
+            external = [
+                NotificationChannel(channel) for channel in notification.get("channels") or []
+                if channel in EXTERNAL_CHANNELS
+            ]
+            if not external:
+                in_app_only.append(notification["_id"])
+                continue
+            not_before = notification.get("scheduled_at") or now
+            for channel in external:
+                channels.add(channel)
+                entries.append({
+                    "notification_id": notification["_id"],
+                    "channel": channel.value,
+                    "status": DELIVERY_PENDING,
+                    "attempts": 0,
+                    "next_attempt_at": max(not_before, now),
+                    "errors": [],
+                    "created_at": now,
+                    "updated_at": now
+                })
+
+        if in_app_only:
+            await db.notifications.update_many(
+                {"_id": {"$in": in_app_only}, "status": NotificationStatus.PENDING},
+                {"$set": {"status": NotificationStatus.SENT, "sent_at": now, "updated_at": now}}
+            )
+        if entries:
+            await db[NOTIFICATION_OUTBOX_COLLECTION].insert_many(entries, ordered=False)
+            self.wake(channels)
+        return len(entries)
+
+    async def _worker(self, channel: NotificationChannel):
+        wakeup = self._wakeups[channel]
+        while True:
+            try:
+                processed = await self._process_batch(self._db, channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"{channel.value} notification delivery failed: {e}")
+                processed = 0
+
+            if processed:
+                # Kuyrukta daha fazlası olabilir; beklemeden devam et
+                continue
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=settings.notification_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self, db, channel: NotificationChannel) -> List[Dict[str, Any]]:
+        """Vadesi gelen teslimatları bu worker adına kilitle"""
+        collection = db[NOTIFICATION_OUTBOX_COLLECTION]
+        now = datetime.utcnow()
+        due = {
+            "channel": channel.value,
+            "$or": [
+                {"status": DELIVERY_PENDING, "next_attempt_at": {"$lte": now}},
+                # Gönderim sırasında ölen süreçten kalanlar
+                {"status": DELIVERY_SENDING, "locked_until": {"$lt": now}}
+            ]
+        }
+        candidates = [
+            entry["_id"] async for entry in collection.find(due, {"_id": 1})
+            .sort("next_attempt_at", 1).limit(settings.notification_batch_size)
+        ]
+        if not candidates:
+            return []
+
+        claim = uuid.uuid4().hex
+        locked_until = now + timedelta(seconds=lock_seconds(len(candidates), self.transport(channel).concurrency))
+        await collection.update_many(
+            {"_id": {"$in": candidates}, **due},
+            {"$set": {
+                "status": DELIVERY_SENDING,
+                "claim": claim,
+                "locked_until": locked_until,
+                "updated_at": now
+            }}
+        )
+        return await collection.find({"claim": claim, "status": DELIVERY_SENDING}).to_list(None)
+
+    async def _process_batch(self, db, channel: NotificationChannel) -> int:
+        entries = await self._claim(db, channel)
+        if not entries:
+            return 0
+
+        notification_ids = list({entry["notification_id"] for entry in entries})
+        notifications = {
+            notification["_id"]: notification
+            async for notification in db.notifications.find({"_id": {"$in": notification_ids}})
+        }
+
+        # Silinmiş bildirimler gönderilmez
+        sendable = [entry for entry in entries if entry["notification_id"] in notifications]
+        errors = await self.transport(channel).send_batch(
+            [notifications[entry["notification_id"]] for entry in sendable]
+        )
+
+        now = datetime.utcnow()
+        # Sonuçlanan kayıtlar TTL indeksiyle silinir
+        expires_at = now + timedelta(hours=settings.notification_outbox_retention_hours)
+        # Kilit süresi dolup başka worker'a geçen kayıtlar claim eşleşmediği için atlanır
+        operations = [
+            UpdateOne(
+                {"_id": entry["_id"], "claim": entry["claim"]},
+                {"$set": {"status": DELIVERY_FAILED, "updated_at": now, "expires_at": expires_at}}
+            )
+            for entry in entries if entry["notification_id"] not in notifications
+        ]
+        for entry, error in zip(sendable, errors):
+            attempts = entry["attempts"] + 1
+            update: Dict[str, Any] = {"attempts": attempts, "updated_at": now, "last_attempt_at": now}
+            if error is None:
+                update["status"] = DELIVERY_DELIVERED
+                update["delivered_at"] = now
+                update["expires_at"] = expires_at
+                self.metrics["delivered"] += 1
+            elif attempts >= settings.notification_max_attempts:
+                update["status"] = DELIVERY_FAILED
+                update["expires_at"] = expires_at
+                self.metrics["failed"] += 1
+            else:
+                update["status"] = DELIVERY_PENDING
+                update["next_attempt_at"] = now + timedelta(seconds=retry_delay(attempts))
+                self.metrics["retried"] += 1
+            operation = {"$set": update, "$unset": {"claim": "", "locked_until": ""}}
+            if error is not None:
+                operation["$push"] = {"errors": {"at": now, "error": error}}
+            operations.append(UpdateOne({"_id": entry["_id"], "claim": entry["claim"]}, operation))
+
+        await db[NOTIFICATION_OUTBOX_COLLECTION].bulk_write(operations, ordered=False)
+        await self._update_notification_statuses(db, list(notifications))
+        return len(entries)
+
+    async def _update_notification_statuses(self, db, notification_ids: List[Any]):
+        """Tüm kanalları sonuçlanan bildirimlerin durumunu güncelle"""
+        if not notification_ids:
+            return
+        pipeline = [
+            {"$match": {"notification_id": {"$in": notification_ids}}},
+            {"$group": {
+                "_id": "$notification_id",
+                "open": {"$sum": {"$cond": [{"$in": ["$status", [DELIVERY_PENDING, DELIVERY_SENDING]]}, 1, 0]}},
+                "failed": {"$push": {"$cond": [
+                    {"$eq": ["$status", DELIVERY_FAILED]},
+                    {"channel": "$channel", "errors": "$errors"},
+                    None
+                ]}},
+                "attempts": {"$max": "$attempts"},
+                "last_attempt_at": {"$max": "$last_attempt_at"}
+            }},
+            {"$match": {"open": 0}}
+        ]
+
+        now = datetime.utcnow()
+        operations = []
+        async for group in db[NOTIFICATION_OUTBOX_COLLECTION].aggregate(pipeline):
+            failed = [item for item in group["failed"] if item]
+            update = {
+                "delivery_attempts": group["attempts"],
+                "last_delivery_attempt": group["last_attempt_at"],
+                "updated_at": now
+            }
+            if failed:
+                update["delivery_errors"] = [
+                    f"{item['channel']}: {item['errors'][-1]['error'] if item['errors'] else 'Bildirim bulunamadı'}"
+                    for item in failed
+                ]
+                result = {"status": NotificationStatus.FAILED}
+            else:
+                update["sent_at"] = now
+                result = {"status": NotificationStatus.SENT}
+            operations.append(UpdateOne({"_id": group["_id"]}, {"$set": update}))
+            # Kullanıcı bu arada okuduysa / göz ardı ettiyse durum ezilmez
+            operations.append(UpdateOne(
+                {"_id": group["_id"], "status": NotificationStatus.PENDING},
+                {"$set": result}
+            ))
+        if operations:
+            await db.notifications.bulk_write(operations, ordered=False)
+
+    async def stats(self, db) -> Dict[str, Any]:
+        counts = {}
+        async for group in db[NOTIFICATION_OUTBOX_COLLECTION].aggregate([
+            {"$group": {"_id": {"channel": "$channel", "status": "$status"}, "count": {"$sum": 1}}}
+        ]):
+            counts.setdefault(group["_id"]["channel"], {})[group["_id"]["status"]] = group["count"]
+        return {**self.metrics, "outbox": counts}
+
+
+# Global bildirim gönderici
+notification_delivery = NotificationDelivery()
@@ -0,0 +1,149 @@
+"""
+PDF dekont okuma
+
+Bankaların ürettiği PDF dekontların çoğunda metin katmanı bulunur; bu
+durumda ilk pdf_max_pages sayfanın metni çıkarılır ve model görsel yerine
+metinle çağrılır (vision gerekmez, çağrı çok daha hızlı ve ucuzdur). Metin
+katmanı olmayan (taranmış) PDF'lerde yalnızca ilk sayfalar rasterize edilip
+görsel ön işlemeden geçirilir.
+
+PyMuPDF işi CPU yoğun ve senkron olduğundan ayrı bir süreç havuzunda
+çalıştırılır; sonuç içerik özetine göre bellekte önbelleğe alınır.
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.services.ai_cache import file_sha256
+from app.services.image_preprocess import PreparedImage, preprocess_image
+
+logger = logging.getLogger(__name__)
+
+# Prompt'a eklenecek metin için üst sınır
+PDF_MAX_TEXT_CHARS = 20000
+
+
+class PdfDocument(NamedTuple):
+    page_count: int
+    text: Optional[str]
+    pages: List[PreparedImage]
+
+
+def extract_pdf(
+    file_path: str,
+    max_pages: int,
+    min_text_chars: int,
+    dpi: int,
+    image_options: Tuple
+) -> PdfDocument:
+    """İlk sayfaların metnini çıkar, metin yoksa sayfaları rasterize et
+
+    Süreç havuzunda çalışır (modül düzeyinde olmalı).
+    """
+    import fitz
+
+    with fitz.open(file_path) as document:
+        if document.needs_pass:
+            raise ValueError("Şifreli PDF dosyaları desteklenmiyor")
+
+        page_count = document.page_count
+        pages = [document[index] for index in range(min(max_pages, page_count))]
+
+        texts = [page.get_text("text").strip() for page in pages]
+        text = "\n\n".join(
+            f"--- Sayfa {index + 1} ---\n{page_text}"
+            for index, page_text in enumerate(texts) if page_text
+        )
+        if sum(len(page_text) for page_text in texts) >= min_text_chars:
+            return PdfDocument(page_count, text[:PDF_MAX_TEXT_CHARS], [])
+
+        images = []
+        for page in pages:
+            png = page.get_pixmap(dpi=dpi).tobytes("png")
+            images.append(preprocess_image(io.BytesIO(png), *image_options))
+        return PdfDocument(page_count, None, images)
+
+
+class PdfIngestor:
+    def __init__(self, max_entries: int, workers: int):
+        self.max_entries = max_entries
+        self.workers = workers
+        self._entries: "OrderedDict[str, PdfDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.metrics = {
+            "documents": 0,
+            "text_layer": 0,
+            "rasterized": 0,
+            "cache_hits": 0
+        }
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: event loop ve thread'ler içeren süreç fork edilmez
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    @staticmethod
+    def options() -> Tuple:
+        """Çıktıyı belirleyen ayarlar (önbellek anahtarlarına girer)"""
+        image_options = (
+            settings.ai_image_max_dimension,
+            settings.ai_image_jpeg_quality,
+            settings.ai_image_grayscale,
+            settings.ai_image_autocrop
+        )
+        return settings.pdf_max_pages, settings.pdf_min_text_chars, settings.pdf_render_dpi, image_options
+
+    async def ingest(self, file_path: str) -> PdfDocument:
+        """PDF'i modele gönderilecek metin veya sayfa görsellerine çevir"""
+        options = self.options()
+        digest = await asyncio.to_thread(file_sha256, file_path)
+        key = hashlib.sha256(f"{digest}:{options}".encode()).hexdigest()
+
+        with self._lock:
+            document = self._entries.get(key)
+            if document is not None:
+                self._entries.move_to_end(key)
+                self.metrics["cache_hits"] += 1
+                return document
+
+        loop = asyncio.get_running_loop()
+        document = await loop.run_in_executor(self._pool(), extract_pdf, file_path, *options)
+        logger.info(
+            f"PDF ingested: {document.page_count} pages, "
+            f"{'text layer' if document.text else f'{len(document.pages)} pages rasterized'}"
+        )
+
+        with self._lock:
+            self.metrics["documents"] += 1
+            self.metrics["text_layer" if document.text else "rasterized"] += 1
+            self._entries[key] = document
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return document
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "memory_entries": len(self._entries)
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global PDF okuyucu
+pdf_ingestor = PdfIngestor(settings.pdf_cache_max_entries, settings.pdf_workers)
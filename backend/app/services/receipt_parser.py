@@ -0,0 +1,357 @@
+"""
+Kural tabanlı dekont ayrıştırıcı
+
+Dekontların çoğu sabit şablonlu birkaç bankadan gelir. PDF metin katmanından
+(veya OCR çıktısından) IBAN, tutar, tarih, referans numarası ve alıcı
+etiketlerle yerel olarak çıkarılır; sonuç Gemini'nin analyze_receipt
+yanıtıyla aynı şemadadır. Güven skoru receipt_parser_min_confidence'ın
+altındaysa model çağrılır, üstündeyse model hiç çağrılmaz (çevrimdışı çalışır).
+
+Yeni banka eklemek için BANK_TEMPLATES'e tespit kalıpları, IBAN banka kodu
+ve gerekirse bankaya özgü etiketler eklenir. Şablon ve etiketler önbellek
+anahtarına kendiliğinden girer; ayrıştırma mantığı değiştiğinde
+PARSER_VERSION artırılmalıdır.
+"""
+import hashlib
+import re
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+# Ayrıştırma kuralları değiştiğinde artırılır (eski önbellek kayıtları kullanılmaz)
+PARSER_VERSION = "1"
+
+TURKISH_FOLD = str.maketrans("çğıİöşüÇĞÖŞÜâîû", "cgiIosuCGOSUaiu")
+
+
+def _fold(text: str) -> str:
+    """Etiket eşleştirmesi için Türkçe karakterleri sadeleştir ve büyük harfe çevir
+
+    Uzunluk korunur (büyük harfi birden fazla karakter olan "ß" gibi
+    karakterler olduğu gibi kalır); sadeleştirilmiş satırdaki eşleşme
+    konumları orijinal satırda da geçerlidir.
+    """
+    return "".join(
+        upper if len(upper := char.upper()) == 1 else char
+        for char in text.translate(TURKISH_FOLD)
+    )
+
+
+class BankTemplate(NamedTuple):
+    name: str
+    markers: Tuple[str, ...]  # Metinde geçerse bu banka (sadeleştirilmiş, büyük harf)
+    iban_bank_code: Optional[str] = None  # TRkk BBBBB ... içindeki 5 haneli kod
+    labels: Dict[str, Tuple[str, ...]] = {}
+
+
+# Tüm bankalarda kullanılan etiketler; şablon etiketleri bunların önüne eklenir
+DEFAULT_LABELS: Dict[str, Tuple[str, ...]] = {
+    "amount": (
+        "ISLEM TUTARI", "GONDERILEN TUTAR", "TRANSFER TUTARI", "EFT TUTARI",
+        "HAVALE TUTARI", "FAST TUTARI", "ODEME TUTARI", "TUTAR"
+    ),
+    "total": ("HESAPTAN CEKILEN TUTAR", "TOPLAM TUTAR", "BORC TUTARI", "TOPLAM"),
+    "date": ("ISLEM TARIHI", "ISLEM ZAMANI", "VALOR TARIHI", "DUZENLEME TARIHI", "TARIH"),
+    "reference": (
+        "REFERANS NO", "REFERANS NUMARASI", "ISLEM REFERANS NO", "SORGU NO",
+        "ISLEM NO", "DEKONT NO", "FIS NO"
+    ),
+    "recipient_name": (
+        "ALICI AD SOYAD/UNVAN", "ALICI ADI SOYADI", "ALICI UNVANI", "ALICI ADI",
+        "LEHDAR", "LEHTAR", "ALICI"
+    ),
+    "recipient_iban": ("ALICI IBAN", "ALICI HESAP IBAN", "LEHDAR IBAN", "LEHTAR IBAN"),
+    "recipient_bank": ("ALICI BANKA", "ALICI BANKASI"),
+    "sender_name": ("GONDEREN AD SOYAD/UNVAN", "GONDEREN ADI", "GONDEREN", "HESAP SAHIBI", "MUSTERI ADI"),
+    "sender_iban": ("GONDEREN IBAN", "BORCLU IBAN", "HESAP IBAN"),
+    "sender_account": ("GONDEREN HESAP NO", "HESAP NO", "HESAP NUMARASI"),
+    "branch": ("SUBE ADI", "SUBE"),
+    "description": ("ACIKLAMA", "ODEME ACIKLAMASI"),
+    "transfer_fee": ("EFT UCRETI", "HAVALE UCRETI", "FAST UCRETI", "ISLEM UCRETI", "MASRAF TUTARI", "MASRAF", "UCRET"),
+    "commission": ("KOMISYON",),
+    "vat_on_fee": ("BSMV", "KDV"),
+}
+
+BANK_TEMPLATES: Tuple[BankTemplate, ...] = (
+    BankTemplate("T.C. Ziraat Bankası", ("ZIRAAT BANKASI", "ZIRAATBANK"), "00010"),
+    BankTemplate("Türkiye Halk Bankası", ("HALKBANK", "HALK BANKASI"), "00012"),
+    BankTemplate("Türkiye Vakıflar Bankası", ("VAKIFBANK", "VAKIFLAR BANKASI"), "00015"),
+    BankTemplate("Türk Ekonomi Bankası", ("TURK EKONOMI BANKASI", "TEB A.S"), "00032"),
+    BankTemplate("Akbank", ("AKBANK",), "00046", {"reference": ("ISLEM SIRA NO",)}),
+    BankTemplate(
+        "Garanti BBVA", ("GARANTI BBVA", "GARANTI BANKASI"), "00062",
+        {"amount": ("GONDERILEN MIKTAR",), "reference": ("ISLEM REFERANSI",)}
+    ),
+    BankTemplate(
+        "Türkiye İş Bankası", ("IS BANKASI", "ISBANK"), "00064",
+        {"recipient_name": ("ALACAKLI ADI", "ALACAKLI"), "recipient_iban": ("ALACAKLI IBAN",)}
+    ),
+    BankTemplate("Yapı ve Kredi Bankası", ("YAPI KREDI", "YAPI VE KREDI"), "00067"),
+    BankTemplate("QNB Finansbank", ("QNB FINANSBANK", "FINANSBANK"), "00111"),
+    BankTemplate("Enpara.com", ("ENPARA",), "00111"),
+    BankTemplate("DenizBank", ("DENIZBANK",), "00134"),
+)
+
+# Alan ağırlıkları (toplam 1.0)
+CONFIDENCE_WEIGHTS = {
+    "amount": 0.35,
+    "date": 0.2,
+    "recipient": 0.25,
+    "reference": 0.1,
+    "bank": 0.1,
+}
+
+IBAN_PATTERN = re.compile(r"TR\s?\d{2}(?:\s?\d{4}){5}\s?\d{2}")
+AMOUNT_PATTERN = re.compile(r"(-?\d{1,3}(?:[.,\s]\d{3})+(?:[.,]\d{1,2})?|-?\d+(?:[.,]\d{1,2})?)\s*(TL|TRY|USD|EUR|₺)?")
+DATE_PATTERN = re.compile(
+    r"(\d{1,2})[./-](\d{1,2})[./-](\d{4})(?:\s*[-/]?\s*(\d{1,2}):(\d{2})(?::(\d{2}))?)?"
+    r"|(\d{4})-(\d{2})-(\d{2})(?:[T\s](\d{1,2}):(\d{2})(?::(\d{2}))?)?"
+)
+SUBLABEL_PATTERN = re.compile(r"^(?:IBAN|BANKA|BANKASI|HESAP|SUBE|UNVAN|ADI|NO)\b[^:]{0,15}:")
+# "Etiket: değer" biçimindeki satır (boş etiketin değeri olarak alınmaz)
+LABEL_LINE_PATTERN = re.compile(r"^[^\d:：]{2,40}[:：]")
+CURRENCIES = {"TL": "TRY", "₺": "TRY", "TRY": "TRY", "USD": "USD", "EUR": "EUR"}
+
+
+def normalize_iban(value: str) -> str:
+    return re.sub(r"\s", "", value).upper()
+
+
+def is_valid_iban(iban: str) -> bool:
+    """ISO 13616 mod-97 kontrolü"""
+    if not re.fullmatch(r"TR\d{24}", iban):
+        return False
+    rearranged = iban[4:] + iban[:4]
+    digits = "".join(str(int(char, 36)) for char in rearranged)
+    return int(digits) % 97 == 1
+
+
+def parse_amount(text: str) -> Optional[Tuple[float, Optional[str]]]:
+    """'1.500,00 TL' / '1500.5' / '15.000 TRY' -> (tutar, para birimi)"""
+    match = AMOUNT_PATTERN.search(text)
+    if not match:
+        return None
+    raw, currency = match.group(1).replace(" ", ""), match.group(2)
+
+    if "," in raw and "." in raw:
+        # Son ayraç ondalık ayracıdır
+        if raw.rfind(",") > raw.rfind("."):
+            raw = raw.replace(".", "").replace(",", ".")
+        else:
+            raw = raw.replace(",", "")
+    elif re.search(r"[.,]\d{3}(?:[.,]|$)", raw):
+        # 1.500 / 15.000.000 / 1,500: binlik ayracı
+        raw = raw.replace(".", "").replace(",", "")
+    else:
+        raw = raw.replace(",", ".")
+
+    try:
+        amount = abs(float(raw))
+    except ValueError:
+        return None
+    return amount, CURRENCIES.get(currency) if currency else None
+
+
+def parse_date(text: str) -> Optional[datetime]:
+    match = DATE_PATTERN.search(text)
+    if not match:
+        return None
+    groups = match.groups()
+    try:
+        if groups[0]:
+            day, month, year = int(groups[0]), int(groups[1]), int(groups[2])
+            hour, minute, second = groups[3], groups[4], groups[5]
+        else:
+            year, month, day = int(groups[6]), int(groups[7]), int(groups[8])
+            hour, minute, second = groups[9], groups[10], groups[11]
+        return datetime(year, month, day, int(hour or 0), int(minute or 0), int(second or 0))
+    except ValueError:
+        return None
+
+
+class ReceiptParser:
+    def __init__(self, templates: Sequence[BankTemplate] = BANK_TEMPLATES):
+        self.templates = templates
+        self.metrics = {"parsed": 0, "accepted": 0, "fallback": 0}
+        self._rules_digest = hashlib.sha256(
+            repr((tuple(templates), sorted(DEFAULT_LABELS.items()), CONFIDENCE_WEIGHTS)).encode()
+        ).hexdigest()[:16]
+
+    def options(self) -> Tuple:
+        """Sonucu belirleyen ayarlar ve kurallar (önbellek anahtarlarına girer)"""
+        return (
+            settings.receipt_parser_enabled,
+            settings.receipt_parser_min_confidence,
+            PARSER_VERSION,
+            self._rules_digest
+        )
+
+    def detect_bank(self, folded_text: str, ibans: List[str]) -> Optional[BankTemplate]:
+        for template in self.templates:
+            if any(marker in folded_text for marker in template.markers):
+                return template
+        # Banka adı metinde yoksa gönderen IBAN'ının banka kodundan
+        for iban in ibans[:1]:
+            for template in self.templates:
+                if template.iban_bank_code == iban[4:9]:
+                    return template
+        return None
+
+    def _labels(self, template: Optional[BankTemplate], field: str) -> Tuple[str, ...]:
+        specific = template.labels.get(field, ()) if template else ()
+        return specific + DEFAULT_LABELS.get(field, ())
+
+    @staticmethod
+    def _labeled_value(lines: List[str], folded_lines: List[str], labels: Sequence[str]) -> Optional[str]:
+        """Etiketin aynı satırdaki (veya boşsa bir sonraki satırdaki) değeri"""
+        for label in labels:
+            pattern = re.compile(rf"^\s*{re.escape(label)}\b\s*[:：]?\s*(.*)$")
+            for index, folded in enumerate(folded_lines):
+                match = pattern.match(folded)
+                if not match:
+                    continue
+                # Değer orijinal satırdan (Türkçe karakterleriyle) aynı konumdan alınır
+                value = lines[index][match.start(1):].strip()
+                if not value and index + 1 < len(lines) and not LABEL_LINE_PATTERN.match(lines[index + 1]):
+                    value = lines[index + 1].strip()
+                # "ALICI BANKA: ..." gibi daha uzun bir etiketin parçası
+                if value and not SUBLABEL_PATTERN.match(_fold(value)):
+                    return value
+        return None
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        """Dekont metnini analyze_receipt yanıt şemasına çevir"""
+        self.metrics["parsed"] += 1
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        folded_lines = [_fold(line) for line in lines]
+        folded_text = "\n".join(folded_lines)
+
+        ibans = []
+        for match in IBAN_PATTERN.finditer(folded_text):
+            iban = normalize_iban(match.group(0))
+            if is_valid_iban(iban) and iban not in ibans:
+                ibans.append(iban)
+
+        template = self.detect_bank(folded_text, ibans)
+
+        def value(field: str) -> Optional[str]:
+            return self._labeled_value(lines, folded_lines, self._labels(template, field))
+
+        def labeled_amount(field: str) -> Optional[Tuple[float, Optional[str]]]:
+            raw = value(field)
+            return parse_amount(raw) if raw else None
+
+        # IBAN'lar: önce etiketten, yoksa sırayla (gönderen, alıcı)
+        def labeled_iban(field: str) -> Optional[str]:
+            raw = value(field)
+            match = IBAN_PATTERN.search(_fold(raw)) if raw else None
+            iban = normalize_iban(match.group(0)) if match else None
+            return iban if iban and is_valid_iban(iban) else None
+
+        recipient_iban = labeled_iban("recipient_iban")
+        sender_iban = labeled_iban("sender_iban")
+        unassigned = [iban for iban in ibans if iban not in (recipient_iban, sender_iban)]
+        if not recipient_iban and unassigned:
+            recipient_iban = unassigned.pop()
+        if not sender_iban and unassigned:
+            sender_iban = unassigned.pop(0)
+
+        amount = labeled_amount("amount")
+        total = labeled_amount("total")
+        currency = (amount and amount[1]) or (total and total[1]) or "TRY"
+
+        date_text = value("date")
+        transaction_date = parse_date(date_text) if date_text else None
+        transaction_date = transaction_date or parse_date(text)
+
+        reference = value("reference")
+        if reference:
+            reference = reference.split()[0]
+
+        recipient_name = value("recipient_name")
+        if recipient_name and IBAN_PATTERN.search(_fold(recipient_name)):
+            # "ALICI: TR.. " gibi satırlar isim değildir
+            recipient_name = None
+
+        fees = {}
+        for field in ("transfer_fee", "commission", "vat_on_fee"):
+            fee = labeled_amount(field)
+            if fee:
+                fees[field] = fee[0]
+        total_fees = round(sum(fees.values()), 2)
+        fees["total_fees"] = total_fees
+
+        transaction_type = next(
+            (kind for kind in ("FAST", "EFT", "HAVALE", "SWIFT") if re.search(rf"\b{kind}\b", folded_text)),
+            None
+        )
+
+        scores = {
+            "amount": bool(amount),
+            "date": bool(transaction_date),
+            "recipient": bool(recipient_name or recipient_iban),
+            "reference": bool(reference),
+            "bank": bool(template),
+        }
+        confidence = round(sum(CONFIDENCE_WEIGHTS[field] for field, found in scores.items() if found), 2)
+
+        amount_value = amount[0] if amount else None
+        net_deducted = total[0] if total else (round(amount_value + total_fees, 2) if amount_value else None)
+
+        recipient_info = {
+            "name": recipient_name,
+            "iban": recipient_iban,
+            "bank_name": value("recipient_bank")
+        }
+        return {
+            "success": bool(amount),
+            "analysis_source": "local_parser",
+            "bank_template": template.name if template else None,
+            "transaction_details": {
+                "amount": amount_value,
+                "currency": currency,
+                "date": transaction_date.date().isoformat() if transaction_date else None,
+                "time": transaction_date.strftime("%H:%M:%S") if transaction_date and transaction_date.time() != datetime.min.time() else None,
+                "reference_number": reference
+            },
+            "bank_info": {
+                "bank_name": template.name if template else None,
+                "branch_name": value("branch"),
+                "branch_code": None
+            },
+            "sender_account": {
+                "account_holder": value("sender_name"),
+                "account_number": value("sender_account"),
+                "iban": sender_iban
+            },
+            # ReceiptAnalysisResult.recipient_info yalnızca metin değer kabul eder
+            "recipient_info": {key: item for key, item in recipient_info.items() if item},
+            "fees_and_charges": fees,
+            "amount_breakdown": {
+                "gross_amount": amount_value,
+                "total_fees": total_fees,
+                "net_deducted": net_deducted
+            },
+            "description": value("description"),
+            "transaction_type": transaction_type,
+            "status": None,
+            "confidence_score": confidence,
+            "missing_fields": [field for field, found in scores.items() if not found]
+        }
+
+    def parse_if_confident(self, text: str) -> Optional[Dict[str, Any]]:
+        """Güven eşiğini geçerse ayrıştırılmış sonucu, geçmezse None döndür"""
+        result = self.parse(text)
+        if result["success"] and result["confidence_score"] >= settings.receipt_parser_min_confidence:
+            self.metrics["accepted"] += 1
+            return result
+        self.metrics["fallback"] += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.metrics)
+
+
+# Global ayrıştırıcı
+receipt_parser = ReceiptParser()
@@ -0,0 +1,161 @@
+"""
+Rapor sonuç önbelleği
+
+Tamamen geçmişte kalan aralıkların rapor verisi report_cache koleksiyonunda
+isteğin parmak izi (rapor türü, tarihler, hesap / kişi filtreleri, bekleyenler
+dahil mi) ile saklanır. Her kayıt, üretildiği andaki veri sürümlerini de
+tutar (data_versions):
+
+- transactions: işlem tarihinin ayı başına bir sayaç
+  ("transactions:2024-03"); geriye tarihli bir işlem yalnızca o ayı
+  kapsayan raporları geçersiz kılar
+- bank_accounts, people: koleksiyon başına tek sayaç (hesap özeti güncel
+  bakiyeyi, kişi özeti kişi listesini gösterir)
+
+Yazan akışlar bump_data_version ile ilgili sayacı artırır. Okunan kaydın
+sürümleri güncel sürümlerle aynı değilse rapor yeniden üretilir. Sürümler
+hesaplamadan önce okunduğundan, hesaplama sırasında gelen bir yazım da
+sonraki okumada kaydı geçersiz kılar.
+"""
+import hashlib
+import json
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.models.report import ReportRequest, ReportType
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_COLLECTION = "report_cache"
+DATA_VERSION_COLLECTION = "data_versions"
+# Rapor hesaplama mantığı değişince artırılır; eski kayıtlar kullanılmaz
+REPORT_CACHE_VERSION = "1"
+
+# Rapor türünün işlemler dışında okuduğu koleksiyonlar
+REPORT_DEPENDENCIES = {
+    ReportType.BANK_ACCOUNT_SUMMARY: ("bank_accounts",),
+    ReportType.PERSON_SUMMARY: ("people",),
+}
+
+
+def _naive_utc(value) -> datetime:
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _month_keys(collection: str, start: datetime, end: datetime) -> List[str]:
+    keys = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        keys.append(f"{collection}:{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return keys
+
+
+async def bump_data_version(db, collection: str, dates: Iterable[Any] = ()):
+    """collection'a yazıldığını kaydet; dates verilirse yalnızca o ayların sayacı artar
+
+    Hata durumunda yazan akış bozulmaz, yalnızca loglanır.
+    """
+    dates = [_naive_utc(value) for value in dates if isinstance(value, (date, datetime))]
+    keys = {f"{collection}:{value:%Y-%m}" for value in dates} or {collection}
+    now = datetime.utcnow()
+    try:
+        await db[DATA_VERSION_COLLECTION].bulk_write(
+            [
+                UpdateOne({"_id": key}, {"$inc": {"version": 1}, "$set": {"updated_at": now}}, upsert=True)
+                for key in sorted(keys)
+            ],
+            ordered=False
+        )
+    except Exception as e:
+        logger.error(f"Data version update failed for {collection}: {e}")
+
+
+async def read_data_versions(db, keys: List[str]) -> Dict[str, int]:
+    versions = {key: 0 for key in keys}
+    async for doc in db[DATA_VERSION_COLLECTION].find({"_id": {"$in": keys}}, {"version": 1}):
+        versions[doc["_id"]] = doc["version"]
+    return versions
+
+
+def report_dependencies(report_request: ReportRequest) -> List[str]:
+    """Raporun sonucunu etkileyen sürüm anahtarları"""
+    keys = _month_keys(
+        "transactions",
+        _naive_utc(report_request.start_date),
+        _naive_utc(report_request.end_date)
+    )
+    keys.extend(REPORT_DEPENDENCIES.get(report_request.report_type, ()))
+    return keys
+
+
+def report_fingerprint(report_request: ReportRequest) -> str:
+    payload = {
+        "version": REPORT_CACHE_VERSION,
+        "report_type": report_request.report_type.value,
+        "start_date": _naive_utc(report_request.start_date).isoformat(),
+        "end_date": _naive_utc(report_request.end_date).isoformat(),
+        "bank_account_ids": sorted(report_request.bank_account_ids or []),
+        "person_ids": sorted(report_request.person_ids or []),
+        "include_pending": report_request.include_pending
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def is_cacheable(report_request: ReportRequest) -> bool:
+    """Yalnızca bitişi geçmişte kalan aralıklar önbelleğe alınır"""
+    return settings.report_cache_enabled and _naive_utc(report_request.end_date) < datetime.utcnow()
+
+
+async def cached_report_data(
+    db,
+    report_request: ReportRequest,
+    compute: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Tuple[Dict[str, Any], bool]:
+    """Rapor verisini önbellekten ver ya da compute ile üretip sakla
+
+    (veri, önbellekten mi) döndürür.
+    """
+    if not is_cacheable(report_request):
+        return await compute(), False
+
+    key = report_fingerprint(report_request)
+    versions = await read_data_versions(db, report_dependencies(report_request))
+    collection = db[REPORT_CACHE_COLLECTION]
+
+    cached: Optional[Dict[str, Any]] = await collection.find_one({"_id": key})
+    now = datetime.utcnow()
+    if cached is not None and cached.get("versions") == versions:
+        await collection.update_one(
+            {"_id": key},
+            {"$inc": {"hits": 1}, "$set": {"last_hit_at": now}}
+        )
+        return cached["data"], True
+
+    data = await compute()
+    try:
+        await collection.replace_one(
+            {"_id": key},
+            {
+                "report_type": report_request.report_type.value,
+                "start_date": _naive_utc(report_request.start_date),
+                "end_date": _naive_utc(report_request.end_date),
+                "versions": versions,
+                "data": data,
+                "hits": 0,
+                "created_at": now,
+                "expires_at": now + timedelta(days=settings.report_cache_retention_days)
+            },
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Report cache write failed: {e}")
+    return data, False
@@ -0,0 +1,401 @@
+"""
+Rapor dosyası üretimi (XLSX / PDF / CSV)
+
+Kaydedilmiş rapor verisi tablolara çevrilir ve ayrı bir süreç havuzunda
+dosyaya yazılır; event loop render sırasında bloklanmaz. Üretilen dosya
+report_export_dir altında rapor kimliği + biçim adıyla saklanır, sonraki
+indirmeler diskten akıtılır. Tamamlanmış raporların verisi değişmediğinden
+önbellek yalnızca rapor silinince temizlenir.
+
+XLSX bağımlılıksız, akan bir yazıcıyla üretilir: satırlar doğrudan zip
+içindeki sayfa XML'ine yazılır (inline string, ortak string tablosu yok),
+bellek kullanımı satır sayısından bağımsızdır.
+"""
+import asyncio
+import csv
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+from xml.sax.saxutils import escape
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REPORT_EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+class ReportTable(NamedTuple):
+    title: str
+    headers: Sequence[str]
+    rows: Iterable[Sequence[Any]]
+
+
+def report_tables(report: Dict[str, Any]) -> List[ReportTable]:
+    """Rapor verisini başlıklı tablolara çevir"""
+    data = report.get("data") or {}
+    tables = []
+
+    income_expense = data.get("income_expense")
+    if income_expense:
+        tables.append(ReportTable("Gelir-Gider", ("Kalem", "Tutar"), [
+            ("Toplam gelir", income_expense["total_income"]),
+            ("Toplam gider", income_expense["total_expense"]),
+            ("Net kar", income_expense["net_profit"]),
+            ("İşlem sayısı", income_expense["transaction_count"]),
+        ]))
+        expenses = {item["month"]: item["amount"] for item in income_expense.get("expense_by_month", [])}
+        tables.append(ReportTable("Aylık", ("Ay", "Gelir", "Gider", "Net"), [
+            (item["month"], item["amount"], expenses.get(item["month"], 0), item["amount"] - expenses.get(item["month"], 0))
+            for item in income_expense.get("income_by_month", [])
+        ]))
+
+    cash_flow = data.get("cash_flow")
+    if cash_flow:
+        tables.append(ReportTable("Nakit Akışı", ("Kalem", "Tutar"), [
+            ("Açılış bakiyesi", cash_flow["opening_balance"]),
+            ("Toplam giriş", cash_flow["total_inflow"]),
+            ("Toplam çıkış", cash_flow["total_outflow"]),
+            ("Net nakit akışı", cash_flow["net_cash_flow"]),
+            ("Kapanış bakiyesi", cash_flow["closing_balance"]),
+        ]))
+
+    if data.get("bank_accounts") is not None:
+        tables.append(ReportTable(
+            "Banka Hesapları",
+            ("Hesap", "Para birimi", "Gelir", "Gider", "İşlem sayısı", "Güncel bakiye"),
+            (
+                (account["account_name"], account["currency"], account["total_income"],
+                 account["total_expense"], account["transaction_count"], account["closing_balance"])
+                for account in data["bank_accounts"]
+            )
+        ))
+
+    if data.get("people") is not None:
+        tables.append(ReportTable(
+            "Kişi-Kurum",
+            ("Ad", "Tür", "Gönderilen", "Alınan", "Net", "İşlem sayısı", "Son işlem"),
+            (
+                (person["person_name"], "Kurum" if person["person_type"] == "company" else "Kişi",
+                 person["total_sent"], person["total_received"], person["net_balance"],
+                 person["transaction_count"], person.get("last_transaction_date"))
+                for person in data["people"]
+            )
+        ))
+
+    if data.get("payment_methods") is not None:
+        tables.append(ReportTable(
+            "Ödeme Yöntemleri",
+            ("Yöntem", "İşlem sayısı", "Toplam", "Yüzde", "Ortalama"),
+            (
+                (method["method"], method["transaction_count"], method["total_amount"],
+                 round(method["percentage"], 2), method["average_amount"])
+                for method in data["payment_methods"]
+            )
+        ))
+
+    return tables
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%d.%m.%Y %H:%M")
+    if isinstance(value, date):
+        return value.strftime("%d.%m.%Y")
+    return str(value)
+
+
+def _display(value: Any) -> str:
+    """PDF hücresi: tutarlar Türkçe biçimde (1.500,50)"""
+    if isinstance(value, float):
+        return f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    return _text(value)
+
+
+# --- CSV ---
+
+def _write_csv(title: str, tables: List[ReportTable], path: str):
+    with open(path, "w", newline="", encoding="utf-8-sig") as output:
+        writer = csv.writer(output)
+        writer.writerow([title])
+        for table in tables:
+            writer.writerow([])
+            writer.writerow([table.title])
+            writer.writerow(table.headers)
+            for row in table.rows:
+                writer.writerow([value if isinstance(value, (int, float)) else _text(value) for value in row])
+
+
+# --- XLSX ---
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{sheets}</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_XLSX_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_XLSX_SHEET_FOOTER = '</sheetData></worksheet>'
+_INVALID_SHEET_CHARS = str.maketrans({char: " " for char in "[]:*?/\\"})
+
+
+def _xlsx_cell(value: Any) -> str:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        text = escape(_text(value))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+    return f'<c><v>{value}</v></c>'
+
+
+def _xlsx_row(values: Sequence[Any]) -> bytes:
+    return ("<row>" + "".join(_xlsx_cell(value) for value in values) + "</row>").encode("utf-8")
+
+
+def _write_xlsx(title: str, tables: List[ReportTable], path: str, batch_rows: int = 1000):
+    tables = tables or [ReportTable(title, (title,), [])]
+    names = []
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for index, table in enumerate(tables, 1):
+            names.append(table.title.translate(_INVALID_SHEET_CHARS)[:31] or f"Sayfa {index}")
+            with archive.open(f"xl/worksheets/sheet{index}.xml", "w", force_zip64=True) as sheet:
+                sheet.write(_XLSX_SHEET_HEADER.encode("utf-8"))
+                sheet.write(_xlsx_row(table.headers))
+                buffer = []
+                for row in table.rows:
+                    buffer.append(_xlsx_row(row))
+                    if len(buffer) >= batch_rows:
+                        sheet.write(b"".join(buffer))
+                        buffer = []
+                sheet.write(b"".join(buffer))
+                sheet.write(_XLSX_SHEET_FOOTER.encode("utf-8"))
+
+        sheet_types = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{index}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for index in range(1, len(names) + 1)
+        )
+        archive.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES.format(sheets=sheet_types))
+        archive.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+        archive.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(
+                f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{index}" r:id="rId{index}"/>'
+                for index, name in enumerate(names, 1)
+            )
+            + '</sheets></workbook>'
+        ))
+        archive.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{index}" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{index}.xml"/>'
+                for index in range(1, len(names) + 1)
+            )
+            + '</Relationships>'
+        ))
+
+
+# --- PDF ---
+
+PDF_FONT_SIZE = 8
+PDF_TITLE_SIZE = 13
+PDF_MARGIN = 36
+PDF_LINE_HEIGHT = 13
+
+
+def _write_pdf(title: str, tables: List[ReportTable], path: str):
+    """Her sayfada sütun başına tek insert_text çağrısı (satır listesiyle) yapılır"""
+    import fitz
+
+    font = fitz.Font("helv")
+    document = fitz.open()
+    width, height = fitz.paper_size("a4-l")
+    content_width = width - 2 * PDF_MARGIN
+    state = {"page": None, "y": 0.0}
+
+    def fit(text: str, limit: float) -> str:
+        # Hiçbir glif 1 em'den geniş değil; kısa metinlerde ölçüm atlanır
+        if len(text) * PDF_FONT_SIZE <= limit or font.text_length(text, fontsize=PDF_FONT_SIZE) <= limit:
+            return text
+        while text and font.text_length(text + "…", fontsize=PDF_FONT_SIZE) > limit:
+            text = text[:-1]
+        return text + "…"
+
+    def write(x: float, lines: List[str], size: float = PDF_FONT_SIZE):
+        state["page"].insert_text(
+            (x, state["y"]), lines, fontname="F0", fontsize=size, lineheight=PDF_LINE_HEIGHT / size
+        )
+        state["y"] += PDF_LINE_HEIGHT * len(lines)
+
+    def new_page():
+        state["page"] = document.new_page(width=width, height=height)
+        state["page"].insert_font(fontname="F0", fontbuffer=font.buffer)
+        state["y"] = PDF_MARGIN
+        write(PDF_MARGIN, [title], PDF_TITLE_SIZE)
+        footer = f"Sayfa {document.page_count}"
+        state["page"].insert_text(
+            (width - PDF_MARGIN - font.text_length(footer, fontsize=PDF_FONT_SIZE), height - PDF_MARGIN / 2),
+            footer, fontname="F0", fontsize=PDF_FONT_SIZE
+        )
+        state["y"] += PDF_LINE_HEIGHT / 2
+
+    def write_rows(rows: List[List[str]], columns: List[float]):
+        top = state["y"]
+        for index, x in enumerate(columns):
+            state["y"] = top
+            write(x, [row[index] for row in rows])
+
+    def free_lines() -> int:
+        return int((height - PDF_MARGIN - state["y"]) // PDF_LINE_HEIGHT)
+
+    new_page()
+    for table in tables:
+        column_width = content_width / len(table.headers)
+        columns = [PDF_MARGIN + index * column_width for index in range(len(table.headers))]
+        headers = [fit(header, column_width - 6) for header in table.headers]
+        if free_lines() < 4:
+            new_page()
+        state["y"] += PDF_LINE_HEIGHT / 2
+        write(PDF_MARGIN, [fit(table.title, content_width)])
+        write_rows([headers], columns)
+
+        # Satırlar sayfa sayfa toplanır; bellekte en fazla bir sayfalık satır tutulur
+        page_rows: List[List[str]] = []
+        for row in table.rows:
+            if len(page_rows) >= free_lines():
+                write_rows(page_rows, columns)
+                page_rows = []
+                # Yeni sayfada başlık satırı tekrarlanır
+                new_page()
+                write_rows([headers], columns)
+            page_rows.append([fit(_display(value), column_width - 6) for value in row])
+        if page_rows:
+            write_rows(page_rows, columns)
+    # garbage=3 (yinelenen nesne taraması) binlerce sayfada çok yavaş
+    document.save(path, garbage=1, deflate=True)
+    document.close()
+
+
+_WRITERS = {"csv": _write_csv, "xlsx": _write_xlsx, "pdf": _write_pdf}
+
+
+def render_report(report: Dict[str, Any], export_format: str, path: str) -> int:
+    """Raporu path'e yaz, dosya boyutunu döndür
+
+    Süreç havuzunda çalışır (modül düzeyinde olmalı). Yarım dosya
+    bırakmamak için önce geçici dosyaya yazılır.
+    """
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        _WRITERS[export_format](report.get("title", "Rapor"), report_tables(report), temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return os.path.getsize(path)
+
+
+class ReportExporter:
+    def __init__(self, export_dir: str, workers: int):
+        self.export_dir = export_dir
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.metrics = {"rendered": 0, "cache_hits": 0, "failures": 0}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: event loop ve thread'ler içeren süreç fork edilmez
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def path(self, report_id: str, export_format: str) -> str:
+        return os.path.join(self.export_dir, f"{report_id}.{export_format}")
+
+    async def export(self, report: Dict[str, Any], export_format: str) -> str:
+        """Rapor dosyasının yolunu döndür; diskte yoksa üret
+
+        Aynı rapor + biçim için eşzamanlı istekler tek render'ı bekler.
+        """
+        report_id = str(report["_id"])
+        path = self.path(report_id, export_format)
+        if os.path.exists(path):
+            with self._lock:
+                self.metrics["cache_hits"] += 1
+            return path
+
+        key = f"{report_id}.{export_format}"
+        future = self._inflight.get(key)
+        if future is not None:
+            await asyncio.shield(future)
+            return path
+
+        os.makedirs(self.export_dir, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._pool(), render_report, report, export_format, path)
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        try:
+            size = await asyncio.shield(future)
+        except Exception:
+            with self._lock:
+                self.metrics["failures"] += 1
+            raise
+        logger.info(f"Report {report_id} rendered as {export_format} ({size} bytes)")
+        with self._lock:
+            self.metrics["rendered"] += 1
+        return path
+
+    def remove(self, report_id: str):
+        """Silinen raporun önbellekteki dosyalarını kaldır"""
+        for export_format in REPORT_EXPORT_FORMATS:
+            try:
+                os.remove(self.path(report_id, export_format))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove report export {report_id}.{export_format}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.metrics, "rendering": len(self._inflight)}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global rapor dışa aktarıcı
+report_exporter = ReportExporter(settings.report_export_dir, settings.report_export_workers)
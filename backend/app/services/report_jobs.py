@@ -0,0 +1,118 @@
+"""
+Arka plan rapor üretimi
+
+Uzun aralıklı raporlar HTTP isteğini bekletmez: rapor dokümanı
+status="running" ile yazılır ve kimliği hemen döner. Hesaplama en fazla
+settings.report_job_workers eşzamanlı görevde yürür; her parça (ay)
+bittikçe kısmi veri ve ilerleme (progress) aynı dokümana yazılır, böylece
+/reports/{id} o anki hâli döndürür. Çalışan rapor updated_at'ini düzenli
+olarak yeniler (heartbeat); zamanlanmış recover görevi heartbeat'i kesilen
+(süreci ölmüş) raporları başarısız olarak işaretler.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple
+
+from bson import ObjectId
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REPORT_RUNNING = "running"
+REPORT_COMPLETED = "completed"
+REPORT_FAILED = "failed"
+
+ProgressCallback = Callable[[int, Dict[str, Any]], Awaitable[None]]
+# (veri, önbellekten mi) döndürür
+ReportCompute = Callable[[ProgressCallback], Awaitable[Tuple[Dict[str, Any], bool]]]
+
+
+class ReportJobRunner:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._semaphore = asyncio.Semaphore(workers)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self, db):
+        """Önceki süreçten yarım kalan raporları başarısız işaretle"""
+        await self.recover(db)
+
+    async def recover(self, db) -> Dict[str, int]:
+        """Heartbeat'i kesilen "running" raporları başarısız işaretle"""
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.report_job_stale_seconds)
+        result = await db.reports.update_many(
+            {"status": REPORT_RUNNING, "updated_at": {"$lt": stale_before}},
+            {"$set": {
+                "status": REPORT_FAILED,
+                "error": "Rapor üretimi yarıda kaldı, lütfen tekrar deneyin",
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        if result.modified_count:
+            logger.warning(f"{result.modified_count} interrupted report jobs marked as failed")
+        return {"failed": result.modified_count}
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def submit(self, db, report_id: ObjectId, compute: ReportCompute):
+        """status="running" yazılmış rapor için hesaplamayı arka planda başlat"""
+        task = asyncio.create_task(self._run(db, report_id, compute), name=f"report-job-{report_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, db, report_id: ObjectId, compute: ReportCompute):
+        async def progress(percent: int, data: Dict[str, Any]):
+            await db.reports.update_one(
+                {"_id": report_id, "status": REPORT_RUNNING},
+                {"$set": {"progress": min(percent, 99), "data": data, "updated_at": datetime.utcnow()}}
+            )
+
+        async with self._semaphore:
+            heartbeat = asyncio.create_task(self._heartbeat(db, report_id), name=f"report-job-heartbeat-{report_id}")
+            try:
+                data, cache_hit = await compute(progress)
+            except Exception as e:
+                logger.exception(f"Report job {report_id} failed: {e}")
+                await db.reports.update_one(
+                    {"_id": report_id},
+                    {"$set": {"status": REPORT_FAILED, "error": str(e), "updated_at": datetime.utcnow()}}
+                )
+                return
+            finally:
+                heartbeat.cancel()
+
+        now = datetime.utcnow()
+        await db.reports.update_one(
+            {"_id": report_id},
+            {"$set": {
+                "status": REPORT_COMPLETED,
+                "error": None,
+                "progress": 100,
+                "data": data,
+                "metadata.cache_hit": cache_hit,
+                "generated_at": now,
+                "updated_at": now
+            }}
+        )
+
+    async def _heartbeat(self, db, report_id: ObjectId):
+        """Hesaplama sürdükçe updated_at'i yenile (recover canlı raporu yarım saymasın)"""
+        while True:
+            await asyncio.sleep(settings.report_job_heartbeat_seconds)
+            try:
+                await db.reports.update_one(
+                    {"_id": report_id, "status": REPORT_RUNNING},
+                    {"$set": {"updated_at": datetime.utcnow()}}
+                )
+            except Exception as e:
+                logger.warning(f"Report job {report_id} heartbeat failed: {e}")
+
+
+# Global rapor iş yürütücüsü
+report_job_runner = ReportJobRunner(settings.report_job_workers)
@@ -0,0 +1,59 @@
+"""
+Periyodik görevler
+
+İstek yolunda yapılmaması gereken bakım işleri app.core.scheduler'a burada
+kaydedilir. Saatler UTC'dir.
+"""
+from datetime import datetime
+from typing import Dict
+
+from app.core.scheduler import scheduler
+from app.models.debt import DebtStatus
+from app.services.ai_jobs import ai_job_queue
+from app.services.blob_store import collect_garbage
+from app.services.due_notifications import create_due_notifications
+from app.services.report_jobs import report_job_runner
+from app.services.ledger_rollups import reconcile_ledger_rollups
+
+
+@scheduler.job("due_notifications", "0 * * * *", jitter_seconds=120)
+async def due_notifications_job(db) -> Dict[str, int]:
+    return await create_due_notifications(db)
+
+
+@scheduler.job("debt_statuses", "5 * * * *", jitter_seconds=60)
+async def debt_statuses_job(db) -> Dict[str, int]:
+    """Vadesi geçen borçların durumunu kalıcı olarak overdue yap
+
+    update_debt_status okuma sırasında hesaplar ama yazmaz; durum filtresi ve
+    istatistikler için kayıtlı durumun güncel olması gerekir.
+    """
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    result = await db.debts.update_many(
+        {"status": {"$in": [DebtStatus.ACTIVE, DebtStatus.PARTIAL]}, "due_date": {"$lt": today}},
+        {"$set": {"status": DebtStatus.OVERDUE, "updated_at": datetime.utcnow()}}
+    )
+    return {"overdue": result.modified_count}
+
+
+@scheduler.job("ledger_rollups", "30 2 * * *", jitter_seconds=300, lease_seconds=30 * 60)
+async def ledger_rollups_job(db) -> Dict[str, int]:
+    """Artımlı güncellemelerde oluşabilecek sapmaları kapanmış günler için düzelt"""
+    return await reconcile_ledger_rollups(db)
+
+
+@scheduler.job("blob_gc", "0 3 * * *", jitter_seconds=300, lease_seconds=30 * 60)
+async def blob_gc_job(db) -> Dict[str, int]:
+    return await collect_garbage(db)
+
+
+@scheduler.job("ai_job_recovery", "* * * * *", jitter_seconds=10)
+async def ai_job_recovery_job(db) -> Dict[str, int]:
+    """Ölen süreçlerden kalan AI işlerini kurtar (bkz. AIJobQueue.recover)"""
+    return await ai_job_queue.recover(db)
+
+
+@scheduler.job("report_job_recovery", "* * * * *", jitter_seconds=10)
+async def report_job_recovery_job(db) -> Dict[str, int]:
+    """Ölen süreçlerde yarım kalan raporları başarısız işaretle (bkz. ReportJobRunner.recover)"""
+    return await report_job_runner.recover(db)
@@ -0,0 +1,57 @@
+"""
+Referans bazında işlem toplamları
+
+Hesap / kişi özetleri her hesap veya kişi dokümanına o kaydın tüm
+işlemlerini $lookup ile çekip tarih filtresini sonradan uygulamaz: önce
+transactions tarafında (indeksli) $match, ardından referans alanına göre
+$group yapılır ve sonuç sayısı hesap / kişi sayısıyla sınırlı kalır.
+Dokümanlarla birleştirme Python tarafında yapılır.
+"""
+from typing import Any, Dict
+
+EMPTY_TOTALS = {
+    "total_income": 0,
+    "total_expense": 0,
+    "total_amount": 0,
+    "transaction_count": 0,
+    "last_transaction_date": None
+}
+
+
+def _totals_pipeline(field: str, match: Dict[str, Any]):
+    match = dict(match)
+    match.setdefault(field, {"$nin": [None, ""]})
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": f"${field}",
+                "total_income": {"$sum": {"$cond": [{"$eq": ["$type", "income"]}, "$amount", 0]}},
+                "total_expense": {"$sum": {"$cond": [{"$eq": ["$type", "expense"]}, "$amount", 0]}},
+                "total_amount": {"$sum": "$amount"},
+                "transaction_count": {"$sum": 1},
+                "last_transaction_date": {"$max": "$transaction_date"}
+            }
+        }
+    ]
+
+
+async def transaction_totals_by(db, field: str, match: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """match'e uyan işlemleri field'a göre topla: {str(referans): toplamlar}
+
+    String ve ObjectId olarak saklanmış aynı referans tek satırda birleşir.
+    """
+    totals: Dict[str, Dict[str, Any]] = {}
+    async for doc in db.transactions.aggregate(_totals_pipeline(field, match)):
+        key = str(doc.pop("_id"))
+        current = totals.get(key)
+        if current is None:
+            totals[key] = doc
+            continue
+        for name in ("total_income", "total_expense", "total_amount", "transaction_count"):
+            current[name] += doc[name]
+        if doc["last_transaction_date"] and (
+            not current["last_transaction_date"] or doc["last_transaction_date"] > current["last_transaction_date"]
+        ):
+            current["last_transaction_date"] = doc["last_transaction_date"]
+    return totals
@@ -0,0 +1,88 @@
+"""
+Eşzamanlı bakiye güncelleme benchmark'ı
+
+Tek bir "sıcak" hesaba paralel olarak çok sayıda harcama yazılır. Eski
+okuma-hesaplama-yazma ($set) yaklaşımı ile balance_service içindeki koşullu
+$inc karşılaştırılır. Beklenen: $inc ile son bakiye doğru çıkar (kayıp
+güncelleme yok, bakiye eksiye düşmez) ve saniyedeki işlem sayısı artar.
+
+Kullanım (geçici bir veritabanına yazar ve sonra siler):
+    python -m benchmarks.balance_updates --writes 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.services.balance_service import adjust_bank_balance  # noqa: E402
+
+BENCH_DB = f"{settings.database_name}_bench_balance"
+AMOUNT = 10.0
+
+
+async def legacy_withdraw(db, account_id) -> bool:
+    """Eski yaklaşım: oku, Python'da kontrol et ve hesapla, $set ile yaz"""
+    account = await db.bank_accounts.find_one({"_id": account_id})
+    if account["current_balance"] < AMOUNT:
+        return False
+    await db.bank_accounts.update_one(
+        {"_id": account_id},
+        {"$set": {"current_balance": account["current_balance"] - AMOUNT, "updated_at": datetime.utcnow()}}
+    )
+    return True
+
+
+async def atomic_withdraw(db, account_id) -> bool:
+    return await adjust_bank_balance(db, account_id, -AMOUNT, require_funds=True) is not None
+
+
+async def run(db, withdraw, writes: int, concurrency: int, initial_balance: float):
+    account_id = (await db.bank_accounts.insert_one({"current_balance": initial_balance})).inserted_id
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await withdraw(db, account_id)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(writes)))
+    elapsed = time.perf_counter() - started
+
+    accepted = sum(results)
+    final = (await db.bank_accounts.find_one({"_id": account_id}))["current_balance"]
+    expected = initial_balance - accepted * AMOUNT
+    return writes / elapsed, accepted, final, expected
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Eşzamanlı bakiye güncelleme benchmark'ı")
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.mongodb_url, maxPoolSize=args.concurrency)
+    db = client[BENCH_DB]
+    # Yazımların yarısını karşılayacak bakiye: yetersiz bakiye kontrolü de sınanır
+    initial_balance = args.writes * AMOUNT / 2
+
+    try:
+        await client.drop_database(BENCH_DB)
+        print(f"{'yöntem':>8} | {'işlem/sn':>9} | {'kabul':>6} | {'son bakiye':>11} | {'beklenen':>11}")
+        for name, withdraw in (("eski", legacy_withdraw), ("$inc", atomic_withdraw)):
+            rate, accepted, final, expected = await run(db, withdraw, args.writes, args.concurrency, initial_balance)
+            flag = "" if final == expected and final >= 0 else "  <-- tutarsız"
+            print(f"{name:>8} | {rate:>9.0f} | {accepted:>6} | {final:>11.2f} | {expected:>11.2f}{flag}")
+    finally:
+        await client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,168 @@
+"""
+Dashboard istatistikleri benchmark'ı
+
+Eski sıralı (metrik başına bir sorgu) yaklaşım ile tek $facet'li
+compute_dashboard_stats karşılaştırılır. Veritabanına giden komut sayısı
+pymongo CommandListener ile sayılır.
+
+Kullanım (geçici bir veritabanına sahte veri yazar ve sonra siler):
+    python -m benchmarks.dashboard_stats --transactions 20000 --runs 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.core.aggregation import top_n  # noqa: E402
+from app.services.dashboard_stats import (  # noqa: E402
+    _recent_transactions_query,
+    _top_expenses_query,
+    _transaction_pipeline,
+    compute_dashboard_stats
+)
+from app.services.ledger_rollups import rebuild_ledger_rollups  # noqa: E402
+
+BENCH_DB = f"{settings.database_name}_bench_dashboard"
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Sunucuya gönderilen komutları say"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name in ("aggregate", "find", "count", "getMore"):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def seed(db, transaction_count: int):
+    """Sahte banka hesabı, kişi ve işlem verisi oluştur"""
+    now = datetime.utcnow()
+    accounts = await db.bank_accounts.insert_many([
+        {"name": f"Hesap {i}", "current_balance": random.uniform(1000, 100000), "currency": "TRY"}
+        for i in range(5)
+    ])
+    people = await db.people.insert_many([{"name": f"Kişi {i}"} for i in range(200)])
+
+    docs = []
+    for _ in range(transaction_count):
+        tx_type = random.choice(["income", "expense", "expense", "transfer"])
+        amount = round(random.uniform(10, 5000), 2)
+        docs.append({
+            "type": tx_type,
+            "amount": amount,
+            "description": "benchmark",
+            "status": random.choice(["completed"] * 8 + ["pending", "planned"]),
+            "balance_impact": amount if tx_type == "income" else -amount,
+            "bank_account_id": str(random.choice(accounts.inserted_ids)),
+            "person_id": str(random.choice(people.inserted_ids)),
+            "transaction_date": now - timedelta(days=random.uniform(0, 365))
+        })
+    await db.transactions.insert_many(docs)
+    await db.payment_orders.insert_many([{"status": "pending"} for _ in range(20)])
+    await db.debts.insert_many([{"status": "active"} for _ in range(10)])
+
+
+async def legacy_dashboard_stats(db, now: datetime):
+    """Eski yaklaşım: her metrik ve haftalık trendin her günü ayrı sorgu"""
+    facets = _transaction_pipeline(now)[-1]["$facet"]
+    # Eski en iyi gün: tüm tamamlanmış gelirler taranır
+    facets["best_day"] = [
+        {"$match": {"type": "income", "status": "completed"}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$transaction_date"}},
+            "daily_total": {"$sum": "$amount"}
+        }},
+        {"$sort": {"daily_total": -1}},
+        {"$limit": 1}
+    ]
+    results = {}
+    for name, pipeline in facets.items():
+        results[name] = [doc async for doc in db.transactions.aggregate(pipeline)]
+
+    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    results["recent_transactions"] = await top_n(db.transactions, **_recent_transactions_query())
+    results["top_expenses"] = await top_n(db.transactions, **_top_expenses_query(start_of_month))
+
+    six_months_ago = now - timedelta(days=180)
+    results["monthly_trends"] = [doc async for doc in db.transactions.aggregate([
+        {"$match": {"transaction_date": {"$gte": six_months_ago}, "status": "completed"}},
+        {"$group": {
+            "_id": {"year": {"$year": "$transaction_date"}, "month": {"$month": "$transaction_date"}, "type": "$type"},
+            "total": {"$sum": "$amount"}
+        }}
+    ])]
+
+    results["bank_balance"] = [doc async for doc in db.bank_accounts.aggregate([
+        {"$group": {"_id": None, "total": {"$sum": "$current_balance"}}}
+    ])]
+    results["pending_payments"] = await db.payment_orders.count_documents({"status": "pending"})
+    results["active_debts"] = await db.debts.count_documents({"status": "active"})
+
+    seven_days_ago = now - timedelta(days=7)
+    for i in range(7):
+        day_start = (seven_days_ago + timedelta(days=i)).replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = day_start + timedelta(days=1)
+        [doc async for doc in db.transactions.aggregate([
+            {"$match": {"transaction_date": {"$gte": day_start, "$lt": day_end}, "status": "completed"}},
+            {"$group": {"_id": None, "balance_change": {"$sum": "$balance_impact"}}}
+        ])]
+    return results
+
+
+async def measure(label, func, counter: CommandCounter, runs: int):
+    """Fonksiyonu birden çok kez çalıştırıp süre ve komut sayısını yazdır"""
+    timings = []
+    counter.count = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{label:<10} ortalama {sum(timings) / len(timings):8.1f} ms | "
+        f"min {min(timings):8.1f} ms | istek başına komut {counter.count / runs:.0f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Dashboard istatistikleri benchmark'ı")
+    parser.add_argument("--transactions", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(settings.mongodb_url, event_listeners=[counter])
+    db = client[BENCH_DB]
+
+    try:
+        await client.drop_database(BENCH_DB)
+        print(f"{args.transactions} işlem oluşturuluyor...")
+        await seed(db, args.transactions)
+        await rebuild_ledger_rollups(db)
+
+        now = datetime.utcnow()
+        await measure("sıralı", lambda: legacy_dashboard_stats(db, now), counter, args.runs)
+        await measure("facet", lambda: compute_dashboard_stats(db, now), counter, args.runs)
+    finally:
+        await client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Vade bildirimi üretimi benchmark'ı
+
+Vadesi yaklaşan N kayıt (ödeme emri, borç, çek karışık) oluşturulur. Eski
+yöntem (her kayıt için find_one ile varlık kontrolü + tek tek insert_one)
+ile create_due_notifications'ın tek sorgu + bulk upsert yaklaşımı
+karşılaştırılır. İkinci çalıştırma, hepsi zaten bildirilmişken tekrar
+kontrolün maliyetini gösterir.
+
+Kullanım (geçici bir veritabanına yazar ve sonra siler):
+    python -m benchmarks.due_notifications --items 10000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.core.indexes import ensure_collection_indexes  # noqa: E402
+from app.services.due_notifications import create_due_notifications  # noqa: E402
+
+BENCH_DB = f"{settings.database_name}_bench_due_notifications"
+
+
+async def seed(db, items: int):
+    now = datetime.utcnow()
+    per_source = items // 3
+    await db.payment_orders.insert_many([
+        {"status": "approved", "recipient_name": f"Alıcı {i}", "amount": 1000 + i, "currency": "TRY",
+         "due_date": now + timedelta(days=i % 3), "created_by": f"user{i % 20}"}
+        for i in range(per_source)
+    ])
+    await db.debts.insert_many([
+        {"status": "active", "creditor_name": f"Tedarikçi {i}", "amount": 500 + i, "remaining_amount": 500 + i,
+         "debt_type": "payable", "currency": "TRY", "due_date": now + timedelta(days=i % 3), "created_by": f"user{i % 20}"}
+        for i in range(per_source)
+    ])
+    await db.checks.insert_many([
+        {"status": "active", "check_number": f"{100000 + i}", "drawer_name": f"Firma {i}", "check_type": "received",
+         "amount": 2500, "currency": "TRY", "due_date": now + timedelta(days=i % 3), "created_by": f"user{i % 20}"}
+        for i in range(items - 2 * per_source)
+    ])
+
+
+async def legacy(db):
+    """Eski yaklaşım (yalnızca ödeme emirleri vardı; burada üç kaynağa genişletildi)"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    window = {"$gte": today, "$lt": today + timedelta(days=settings.due_notification_days + 1)}
+    sources = (
+        ("payment_orders", {"status": "approved"}, "payment_due"),
+        ("debts", {"status": {"$in": ["active", "partial", "overdue"]}}, "debt_reminder"),
+        ("checks", {"status": "active"}, "check_due"),
+    )
+    created = 0
+    for collection, query, notification_type in sources:
+        async for item in db[collection].find({**query, "due_date": window}):
+            existing = await db.legacy_notifications.find_one({
+                "type": notification_type,
+                "related_entity_id": str(item["_id"]),
+                "user_id": item["created_by"]
+            })
+            if not existing:
+                await db.legacy_notifications.insert_one({
+                    "type": notification_type,
+                    "related_entity_id": str(item["_id"]),
+                    "user_id": item["created_by"],
+                    "title": "Vade Yaklaşıyor",
+                    "created_at": datetime.utcnow()
+                })
+                created += 1
+    return created
+
+
+async def timed(label: str, func):
+    started = time.perf_counter()
+    result = await func()
+    print(f"  {label:<28}: {time.perf_counter() - started:8.2f} sn  ({result})")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Vade bildirimi üretimi benchmark'ı")
+    parser.add_argument("--items", type=int, default=10000)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db = client[BENCH_DB]
+    try:
+        await client.drop_database(BENCH_DB)
+        await ensure_collection_indexes(db, "notifications")
+        await db.legacy_notifications.create_index([("related_entity_id", 1), ("type", 1), ("user_id", 1)])
+        await seed(db, args.items)
+
+        print(f"{args.items} vadesi yaklaşan kayıt:")
+        await timed("eski (find_one + insert_one)", lambda: legacy(db))
+        await timed("eski, tekrar", lambda: legacy(db))
+        await timed("toplu upsert", lambda: create_due_notifications(db))
+        await timed("toplu upsert, tekrar", lambda: create_due_notifications(db))
+    finally:
+        await client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
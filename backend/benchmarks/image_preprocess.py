@@ -0,0 +1,91 @@
+"""
+Görsel ön işleme benchmark'ı
+
+Masa üzerinde çekilmiş dekont fotoğrafına benzeyen sentetik görseller
+(varsayılan 4000x3000, gürültülü arka plan + metin satırlı beyaz belge)
+üretilir. Modele giden bayt miktarı eski yolla (PIL görseli doğrudan SDK'ya
+verilir, SDK yeniden kodlar) ve image_preprocessor ile karşılaştırılır.
+
+Kullanım:
+    python -m benchmarks.image_preprocess --images 5 --width 4000 --height 3000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import PIL.Image
+from PIL import ImageDraw
+from google.generativeai.types.content_types import pil_to_blob
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.image_preprocess import image_preprocessor  # noqa: E402
+
+
+def make_photo(path: str, width: int, height: int, seed: int, image_format: str):
+    rng = random.Random(seed)
+    photo = PIL.Image.effect_noise((width, height), 40).convert("RGB")
+    photo = PIL.Image.blend(photo, PIL.Image.new("RGB", (width, height), (120, 90, 60)), 0.6)
+
+    # Belge: ortada, çerçevenin yaklaşık yarısı
+    doc_left, doc_top = int(width * 0.3), int(height * 0.1)
+    doc_right, doc_bottom = int(width * 0.7), int(height * 0.9)
+    draw = ImageDraw.Draw(photo)
+    draw.rectangle((doc_left, doc_top, doc_right, doc_bottom), fill=(245, 245, 240))
+    line_height = max(12, height // 60)
+    for y in range(doc_top + line_height * 2, doc_bottom - line_height * 2, line_height * 2):
+        line_width = rng.randint((doc_right - doc_left) // 3, doc_right - doc_left - line_height * 4)
+        draw.rectangle((doc_left + line_height * 2, y, doc_left + line_height * 2 + line_width, y + line_height // 2), fill=(30, 30, 30))
+
+    photo.save(path, format=image_format, **({"quality": 92} if image_format == "JPEG" else {}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Görsel ön işleme benchmark'ı")
+    parser.add_argument("--images", type=int, default=5)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="image_bench_")
+    try:
+        print(f"{args.width}x{args.height} sentetik fotoğraf")
+        for image_format in ("JPEG", "PNG"):
+            source_bytes = raw_bytes = prepared_bytes = 0
+            raw_seconds = prepared_seconds = 0.0
+            for i in range(args.images):
+                path = os.path.join(work_dir, f"photo_{image_format}_{i}.{image_format.lower()}")
+                make_photo(path, args.width, args.height, i, image_format)
+                source_bytes += os.path.getsize(path)
+
+                started = time.perf_counter()
+                with PIL.Image.open(path) as image:
+                    raw_bytes += len(pil_to_blob(image).data)
+                raw_seconds += time.perf_counter() - started
+
+                started = time.perf_counter()
+                prepared = image_preprocessor._prepare(path)
+                prepared_seconds += time.perf_counter() - started
+                prepared_bytes += len(prepared.data)
+
+            count = args.images
+            print(f"{image_format} ({count} görsel, ortalama):")
+            print(f"  dosya boyutu            : {source_bytes / count / 1024:10.1f} KB")
+            print(f"  modele giden (ham)      : {raw_bytes / count / 1024:10.1f} KB  ({raw_seconds / count * 1000:.0f} ms kodlama)")
+            print(f"  modele giden (işlenmiş) : {prepared_bytes / count / 1024:10.1f} KB  ({prepared_seconds / count * 1000:.0f} ms ön işleme, {prepared.size[0]}x{prepared.size[1]})")
+            print(f"  azalma                  : {raw_bytes / max(prepared_bytes, 1):10.1f}x")
+
+        # Aynı içerik ikinci kez: önbellekten
+        started = time.perf_counter()
+        image_preprocessor._prepare(path)
+        print(f"Önbellekten ikinci çağrı: {(time.perf_counter() - started) * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Toplu dekont analizi benchmark'ı
+
+Sahte AI modeliyle (AI_BACKEND=fake, sabit gecikme) N dekont önce tek tek,
+sonra toplu endpoint'in yaptığı gibi eşzamanlı analiz edilir. Eşzamanlı
+sürenin, AI_MAX_CONCURRENCY >= N iken tek çağrının süresine yaklaşması
+beklenir.
+
+Kullanım:
+    python -m benchmarks.receipt_batch --receipts 50 --latency 1.0
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_receipts(directory: str, prefix: str, offset: int, count: int):
+    import PIL.Image
+
+    paths = []
+    for i in range(offset, offset + count):
+        # Her görsel farklı: sonuç önbelleği devreye girmesin
+        path = os.path.join(directory, f"{prefix}_{i}.png")
+        PIL.Image.new("RGB", (32 + i, 32), "white").save(path, "PNG")
+        paths.append(path)
+    return paths
+
+
+async def run(paths, ai_service, concurrent: bool) -> float:
+    started = time.perf_counter()
+    if concurrent:
+        await asyncio.gather(*(ai_service.analyze_receipt(path) for path in paths))
+    else:
+        for path in paths:
+            await ai_service.analyze_receipt(path)
+    return time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Toplu dekont analizi benchmark'ı")
+    parser.add_argument("--receipts", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=1.0, help="Sahte model çağrı süresi (sn)")
+    args = parser.parse_args()
+
+    os.environ["AI_BACKEND"] = "fake"
+    os.environ["AI_FAKE_LATENCY_SECONDS"] = str(args.latency)
+    os.environ.setdefault("AI_MAX_CONCURRENCY", str(args.receipts))
+    os.environ.setdefault("AI_MAX_WORKERS", str(args.receipts))
+
+    from app.services.ai_service import ai_service
+
+    work_dir = tempfile.mkdtemp(prefix="receipt_batch_")
+    try:
+        serial_paths = make_receipts(work_dir, "serial", 0, args.receipts)
+        batch_paths = make_receipts(work_dir, "batch", args.receipts, args.receipts)
+
+        serial = await run(serial_paths, ai_service, concurrent=False)
+        concurrent = await run(batch_paths, ai_service, concurrent=True)
+
+        print(f"{args.receipts} dekont, model gecikmesi {args.latency:g} sn:")
+        print(f"  tek tek     : {serial:8.2f} sn")
+        print(f"  eşzamanlı   : {concurrent:8.2f} sn")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        ai_service.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,159 @@
+"""
+Banka hesabı / kişi özet raporu benchmark'ı
+
+Birkaç yıla yayılmış N işlem, hesaplar ve kişiler oluşturulur. Eski yöntem
+(her hesap / kişi dokümanına tüm işlemlerini $lookup ile çekip tarih
+filtresini sonradan $filter ile uygulamak) ile işlemler tarafında önce
+$match, sonra referansa göre $group yapan yeni rapor fonksiyonları tek
+aylık bir aralık için karşılaştırılır.
+
+Eski $lookup ObjectId _id'yi string referansla karşılaştırdığından hiç
+eşleşmiyordu; ölçüm adil olsun diye burada string'e çevrilmiş _id ile
+eşleşen (pipeline'lı) $lookup kullanılır.
+
+Kullanım (geçici bir veritabanına yazar ve sonra siler):
+    python -m benchmarks.report_summaries --transactions 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.core.indexes import ensure_collection_indexes  # noqa: E402
+from app.api.routes.reports import _generate_bank_account_summary, _generate_person_summary  # noqa: E402
+
+BENCH_DB = f"{settings.database_name}_bench_report_summaries"
+YEARS = 3
+BATCH_SIZE = 10000
+
+
+async def seed(db, transactions: int, accounts: int, people: int):
+    account_result = await db.bank_accounts.insert_many([
+        {"name": f"Hesap {i}", "currency": "TRY", "current_balance": 0, "initial_balance": 0}
+        for i in range(accounts)
+    ])
+    people_result = await db.people.insert_many([
+        {"name": f"Kişi {i}", "person_type": "company" if i % 4 == 0 else "individual"}
+        for i in range(people)
+    ])
+    account_ids = [str(value) for value in account_result.inserted_ids]
+    person_ids = [str(value) for value in people_result.inserted_ids]
+
+    rng = random.Random(42)
+    end = datetime.utcnow()
+    span = YEARS * 365 * 24 * 3600
+    for offset in range(0, transactions, BATCH_SIZE):
+        await db.transactions.insert_many([
+            {
+                "bank_account_id": rng.choice(account_ids),
+                "person_id": rng.choice(person_ids),
+                "type": "income" if rng.random() < 0.5 else "expense",
+                "amount": round(rng.uniform(10, 10000), 2),
+                "status": "completed",
+                "transaction_date": end - timedelta(seconds=rng.randrange(span))
+            }
+            for _ in range(min(BATCH_SIZE, transactions - offset))
+        ])
+
+
+def _legacy_pipeline(date_filter, reference_field: str):
+    """Eski rapor pipeline'ı: tüm geçmiş çekilir, tarih sonradan süzülür"""
+    return [
+        {
+            "$lookup": {
+                "from": "transactions",
+                "let": {"ref": {"$toString": "$_id"}},
+                "pipeline": [{"$match": {"$expr": {"$eq": [f"${reference_field}", "$$ref"]}}}],
+                "as": "transactions"
+            }
+        },
+        {
+            "$addFields": {
+                "filtered_transactions": {
+                    "$filter": {
+                        "input": "$transactions",
+                        "cond": {
+                            "$and": [
+                                {"$gte": ["$$this.transaction_date", date_filter["transaction_date"]["$gte"]]},
+                                {"$lte": ["$$this.transaction_date", date_filter["transaction_date"]["$lte"]]}
+                            ]
+                        }
+                    }
+                }
+            }
+        },
+        {
+            "$project": {
+                "name": 1,
+                "total_income": {"$sum": {"$map": {
+                    "input": {"$filter": {"input": "$filtered_transactions", "cond": {"$eq": ["$$this.type", "income"]}}},
+                    "as": "t",
+                    "in": "$$t.amount"
+                }}},
+                "total_expense": {"$sum": {"$map": {
+                    "input": {"$filter": {"input": "$filtered_transactions", "cond": {"$eq": ["$$this.type", "expense"]}}},
+                    "as": "t",
+                    "in": "$$t.amount"
+                }}},
+                "transaction_count": {"$size": "$filtered_transactions"}
+            }
+        }
+    ]
+
+
+async def legacy(db, collection: str, reference_field: str, date_filter):
+    return len([doc async for doc in db[collection].aggregate(
+        _legacy_pipeline(date_filter, reference_field), allowDiskUse=True
+    )])
+
+
+async def timed(label: str, func):
+    started = time.perf_counter()
+    result = await func()
+    rows = result if isinstance(result, int) else len(result)
+    print(f"  {label:<24}: {time.perf_counter() - started:8.2f} sn  ({rows} satır)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Banka hesabı / kişi özet raporu benchmark'ı")
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--people", type=int, default=2000)
+    parser.add_argument("--skip-legacy", action="store_true", help="Eski pipeline'ı çalıştırma (çok yavaş)")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db = client[BENCH_DB]
+    try:
+        await client.drop_database(BENCH_DB)
+        await ensure_collection_indexes(db, "transactions")
+        await seed(db, args.transactions, args.accounts, args.people)
+
+        end = datetime.utcnow()
+        date_filter = {
+            "transaction_date": {"$gte": end - timedelta(days=30), "$lte": end},
+            "status": "completed"
+        }
+
+        print(f"{args.transactions} işlem, {args.accounts} hesap, {args.people} kişi; son 30 günlük rapor:")
+        if not args.skip_legacy:
+            await timed("hesap, eski $lookup", lambda: legacy(db, "bank_accounts", "bank_account_id", date_filter))
+        await timed("hesap, $match + $group", lambda: _generate_bank_account_summary(db, date_filter))
+        if not args.skip_legacy:
+            await timed("kişi, eski $lookup", lambda: legacy(db, "people", "person_id", date_filter))
+        await timed("kişi, $match + $group", lambda: _generate_person_summary(db, date_filter))
+    finally:
+        await client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+İlk-N + zenginleştirme benchmark'ı
+
+"Önce $lookup, sonra $sort/$limit" şeklindeki eski pipeline ile
+app.core.aggregation.top_n yardımcı fonksiyonu, artan transactions
+boyutlarında karşılaştırılır. Yardımcı fonksiyonun süresi koleksiyon
+büyüdükçe sabit kalmalıdır.
+
+Kullanım (geçici bir veritabanına sahte veri yazar ve sonra siler):
+    python -m benchmarks.top_n_enrich --sizes 1000 10000 50000 --runs 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.aggregation import top_n  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.services.dashboard_stats import _recent_transactions_query  # noqa: E402
+
+BENCH_DB = f"{settings.database_name}_bench_top_n"
+
+# Eski yaklaşım: tüm koleksiyon için join, ardından sıralama
+LEGACY_PIPELINE = [
+    {
+        "$addFields": {
+            "bank_account_oid": {"$toObjectId": "$bank_account_id"},
+            "person_oid": {"$toObjectId": "$person_id"}
+        }
+    },
+    {"$lookup": {"from": "bank_accounts", "localField": "bank_account_oid", "foreignField": "_id", "as": "bank_account"}},
+    {"$lookup": {"from": "people", "localField": "person_oid", "foreignField": "_id", "as": "person"}},
+    {"$sort": {"transaction_date": -1}},
+    {"$limit": 10}
+]
+
+
+async def grow(db, target: int, accounts, people):
+    """transactions koleksiyonunu hedef boyuta kadar doldur"""
+    now = datetime.utcnow()
+    missing = target - await db.transactions.count_documents({})
+    batch = []
+    for _ in range(max(missing, 0)):
+        batch.append({
+            "type": random.choice(["income", "expense"]),
+            "amount": round(random.uniform(10, 5000), 2),
+            "description": "benchmark",
+            "status": "completed",
+            "bank_account_id": str(random.choice(accounts)),
+            "person_id": str(random.choice(people)),
+            "transaction_date": now - timedelta(minutes=random.randint(0, 525600))
+        })
+        if len(batch) == 5000:
+            await db.transactions.insert_many(batch)
+            batch = []
+    if batch:
+        await db.transactions.insert_many(batch)
+
+
+async def timed(func, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="İlk-N + zenginleştirme benchmark'ı")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db = client[BENCH_DB]
+
+    try:
+        await client.drop_database(BENCH_DB)
+        await db.transactions.create_index([("transaction_date", -1)])
+        accounts = (await db.bank_accounts.insert_many([{"name": f"Hesap {i}"} for i in range(5)])).inserted_ids
+        people = (await db.people.insert_many([{"name": f"Kişi {i}"} for i in range(500)])).inserted_ids
+
+        print(f"{'işlem':>8} | {'eski (ms)':>10} | {'top_n (ms)':>10}")
+        for size in sorted(args.sizes):
+            await grow(db, size, accounts, people)
+            legacy_ms = await timed(lambda: db.transactions.aggregate(LEGACY_PIPELINE).to_list(None), args.runs)
+            helper_ms = await timed(lambda: top_n(db.transactions, **_recent_transactions_query()), args.runs)
+            print(f"{size:>8} | {legacy_ms:>10.1f} | {helper_ms:>10.1f}")
+    finally:
+        await client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
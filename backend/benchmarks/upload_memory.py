@@ -0,0 +1,79 @@
+"""
+Eşzamanlı yükleme bellek benchmark'ı
+
+N adet dosya aynı anda diske yazılır; eski "await file.read()" yaklaşımı ile
+app.core.uploads.save_upload'ın tepe bellek kullanımı (tracemalloc)
+karşılaştırılır. Parçalı yazımda tepe bellek dosya boyutundan bağımsız
+olarak yaklaşık N x UPLOAD_CHUNK_SIZE kalmalıdır.
+
+Kullanım (geçici bir klasöre yazar ve sonra siler):
+    python -m benchmarks.upload_memory --files 20 --size-mb 10
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+import aiofiles
+from starlette.datastructures import UploadFile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.uploads import save_upload  # noqa: E402
+
+
+async def legacy_save(file: UploadFile, destination: str):
+    async with aiofiles.open(destination, 'wb') as f:
+        content = await file.read()
+        await f.write(content)
+
+
+def make_uploads(source_dir: str, count: int):
+    # Starlette de büyük yüklemeleri diskte (SpooledTemporaryFile) tutar
+    return [
+        UploadFile(file=open(os.path.join(source_dir, "source.bin"), "rb"), filename=f"dosya_{i}.pdf")
+        for i in range(count)
+    ]
+
+
+async def measure(save, source_dir: str, target_dir: str, count: int) -> float:
+    uploads = make_uploads(source_dir, count)
+    tracemalloc.start()
+    await asyncio.gather(*(
+        save(upload, os.path.join(target_dir, f"{i}.bin")) for i, upload in enumerate(uploads)
+    ))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for upload in uploads:
+        upload.file.close()
+    return peak / (1024 * 1024)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Eşzamanlı yükleme bellek benchmark'ı")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--size-mb", type=int, default=10)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="upload_bench_")
+    try:
+        with open(os.path.join(work_dir, "source.bin"), "wb") as f:
+            f.write(os.urandom(args.size_mb * 1024 * 1024 - 1))
+
+        legacy_mb = await measure(legacy_save, work_dir, work_dir, args.files)
+        chunked_mb = await measure(
+            lambda file, path: save_upload(file, path, max_size=args.size_mb * 1024 * 1024),
+            work_dir, work_dir, args.files
+        )
+        print(f"{args.files} x {args.size_mb}MB eşzamanlı yükleme, tepe bellek:")
+        print(f"  file.read()  : {legacy_mb:8.1f} MB")
+        print(f"  save_upload  : {chunked_mb:8.1f} MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
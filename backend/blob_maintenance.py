@@ -0,0 +1,96 @@
+"""
+Blob store maintenance script
+migrate: moves existing uploads (uploads/receipts, uploads/payment_receipts,
+         uploads/employee_documents, ...) into the content-addressed store and
+         rewrites the referencing fields; duplicate files collapse into one blob.
+gc:      recounts blob references and removes orphaned blobs.
+
+Usage:
+    python blob_maintenance.py migrate [--dry-run] [--keep-originals]
+    python blob_maintenance.py gc [--dry-run] [--grace-hours 24]
+"""
+import argparse
+import asyncio
+import os
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.services.ai_cache import file_sha256
+from app.services.blob_store import (
+    collect_garbage,
+    count_references,
+    is_blob_path,
+    rewrite_references,
+    store_file
+)
+
+async def migrate(db, dry_run: bool, keep_originals: bool):
+    """Eski yüklemeleri depoya taşı"""
+    references = await count_references(db)
+    legacy_paths = [path for path in references if not is_blob_path(path)]
+
+    missing = 0
+    legacy_bytes = 0
+    unique_sizes = {}
+    migrated = 0
+
+    for path in legacy_paths:
+        if not os.path.isfile(path):
+            missing += 1
+            continue
+
+        size = os.path.getsize(path)
+        legacy_bytes += size
+        unique_sizes[file_sha256(path)] = size
+        if dry_run:
+            continue
+
+        new_path = await store_file(db, path, move=False)
+        await rewrite_references(db, path, new_path)
+        if not keep_originals:
+            os.remove(path)
+        migrated += 1
+
+    print(f"Referans verilen eski dosya: {len(legacy_paths)} (diskte olmayan: {missing})")
+    print(f"Eski toplam boyut : {legacy_bytes / (1024 * 1024):.1f} MB")
+    print(f"Tekil içerik      : {len(unique_sizes)} dosya, {sum(unique_sizes.values()) / (1024 * 1024):.1f} MB")
+    if dry_run:
+        print("Deneme modu: hiçbir dosya taşınmadı.")
+        return
+
+    print(f"Taşınan dosya     : {migrated}")
+    # Referans sayılarını alanlardan yeniden hesapla
+    stats = await collect_garbage(db)
+    print(f"Referans sayısı düzeltilen blob: {stats['recounted']}")
+
+async def gc(db, dry_run: bool, grace_hours: int):
+    """Sahipsiz blob'ları temizle"""
+    stats = await collect_garbage(db, grace_hours=grace_hours, dry_run=dry_run)
+    prefix = "[deneme] " if dry_run else ""
+    print(f"{prefix}Blob: {stats['blobs']}, sayısı düzeltilen: {stats['recounted']}, "
+          f"silinen: {stats['removed']}, kayıtsız dosya: {stats['stray_files']}, "
+          f"boşalan alan: {stats['freed_bytes'] / (1024 * 1024):.1f} MB")
+
+async def main(args):
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db = client[settings.database_name]
+
+    if args.command == "migrate":
+        await migrate(db, args.dry_run, args.keep_originals)
+    else:
+        await gc(db, args.dry_run, args.grace_hours)
+
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Blob store bakımı")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help="Eski yüklemeleri depoya taşı")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="Sadece raporla")
+    migrate_parser.add_argument("--keep-originals", action="store_true", help="Eski dosyaları silme")
+
+    gc_parser = subparsers.add_parser("gc", help="Sahipsiz blob'ları temizle")
+    gc_parser.add_argument("--dry-run", action="store_true", help="Sadece raporla")
+    gc_parser.add_argument("--grace-hours", type=int, default=24, help="Yeni dosyalar için bekleme süresi")
+
+    asyncio.run(main(parser.parse_args()))
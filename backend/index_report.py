@@ -0,0 +1,109 @@
+"""
+Index report script
+Compares declared indexes (app/core/indexes.py) with the live database:
+missing indexes, unused indexes ($indexStats) and collection scans in the
+explain plans of the main route query shapes.
+
+Usage:
+    python index_report.py            # report only
+    python index_report.py --apply    # create missing indexes first
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.core.indexes import INDEX_SPECS, ensure_indexes
+
+# Route'ların tipik filtre + sıralama şekilleri (örnek değerlerle)
+QUERY_SHAPES = [
+    ("transactions", {}, [("transaction_date", -1)]),
+    ("transactions", {"status": "completed", "transaction_date": {"$gte": datetime(2024, 1, 1)}}, None),
+    ("transactions", {"type": "expense", "status": "completed", "transaction_date": {"$gte": datetime(2024, 1, 1)}}, [("amount", -1)]),
+    ("transactions", {"bank_account_id": "000000000000000000000000"}, [("transaction_date", -1)]),
+    ("transactions", {"person_id": "000000000000000000000000"}, [("transaction_date", -1)]),
+    ("transactions", {"created_by": "000000000000000000000000"}, [("transaction_date", -1)]),
+    ("payment_orders", {"status": "pending"}, [("created_at", -1)]),
+    ("payment_orders", {"created_by": "000000000000000000000000"}, [("created_at", -1)]),
+    ("payment_details", {"person_id": "000000000000000000000000"}, [("payment_date", -1)]),
+    ("checks", {"status": "active"}, [("due_date", 1)]),
+    ("check_operations", {"check_id": "000000000000000000000000"}, [("operation_date", -1)]),
+    ("debts", {"status": "active"}, [("due_date", 1)]),
+    ("debt_payments", {"debt_id": "000000000000000000000000"}, [("payment_date", -1)]),
+    ("credit_card_transactions", {"credit_card_id": "000000000000000000000000"}, [("transaction_date", -1)]),
+    ("notifications", {"user_id": "000000000000000000000000"}, [("created_at", -1)]),
+    ("income_records", {}, [("expected_date", -1)]),
+    ("income_records", {"status": "verified"}, [("created_at", -1)]),
+    ("people", {}, [("name", 1)]),
+    ("employees", {"status": "active"}, [("hire_date", -1)]),
+    ("reports", {}, [("generated_at", -1)]),
+]
+
+def key_of(index_keys) -> tuple:
+    """İndeks anahtarını karşılaştırılabilir tuple'a çevir"""
+    return tuple((field, int(direction)) for field, direction in index_keys.items())
+
+def plan_stages(plan) -> list:
+    """Explain planındaki tüm aşama isimlerini topla"""
+    stages = [plan.get("stage")]
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            stages.extend(plan_stages(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    return stages
+
+async def report(apply: bool):
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db = client[settings.database_name]
+
+    if apply:
+        await ensure_indexes(db)
+        print("Tanımlı indeksler uygulandı.\n")
+
+    existing_collections = set(await db.list_collection_names())
+
+    print("=== Eksik / tanımsız / kullanılmayan indeksler ===")
+    for collection_name, models in INDEX_SPECS.items():
+        if collection_name not in existing_collections:
+            continue
+
+        live = {}
+        async for index in db[collection_name].list_indexes():
+            live[key_of(index["key"])] = index["name"]
+
+        usage = {}
+        async for stat in db[collection_name].aggregate([{"$indexStats": {}}]):
+            usage[stat["name"]] = (stat["accesses"]["ops"], stat["accesses"]["since"])
+
+        declared = {key_of(dict(model.document["key"])) for model in models}
+
+        for key in declared - set(live):
+            print(f"[EKSİK]       {collection_name}: {key}")
+        for key, name in live.items():
+            if name == "_id_":
+                continue
+            if key not in declared:
+                print(f"[TANIMSIZ]    {collection_name}.{name}")
+            ops, since = usage.get(name, (None, None))
+            if ops == 0:
+                print(f"[KULLANILMAZ] {collection_name}.{name} (0 erişim, {since:%Y-%m-%d %H:%M} tarihinden beri)")
+
+    print("\n=== Sorgu planları ===")
+    for collection_name, query_filter, sort in QUERY_SHAPES:
+        command = {"find": collection_name, "filter": query_filter}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = await db.command("explain", command, verbosity="queryPlanner")
+        winning = explain["queryPlanner"]["winningPlan"]
+        stages = plan_stages(winning)
+        flag = "COLLSCAN" if "COLLSCAN" in stages else ("SORT" if "SORT" in stages else "OK")
+        print(f"[{flag:<8}] {collection_name} filter={list(query_filter)} sort={sort}")
+
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="İndeks raporu")
+    parser.add_argument("--apply", action="store_true", help="Eksik indeksleri oluştur")
+    args = parser.parse_args()
+    asyncio.run(report(args.apply))
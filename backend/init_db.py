@@ -6,6 +6,7 @@ import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import settings
 from app.core.security import get_password_hash
+from app.core.indexes import ensure_indexes
 from datetime import datetime
 
 async def init_database():
@@ -14,9 +15,7 @@ async def init_database():
     db = client[settings.database_name]
     
     # Create indexes
-    await db.users.create_index("username", unique=True)
-    await db.bank_accounts.create_index("iban", unique=True)
-    await db.people.create_index("iban")
+    await ensure_indexes(db)
     
     # Check if admin user exists
     admin_exists = await db.users.find_one({"username": "admin"})
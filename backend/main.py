@@ -3,9 +3,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
-from app.api.routes import auth, payment_orders, bank_accounts, credit_cards, people, transactions, debts, checks, ai_services, reports, income, notifications, dashboard, income_records, employees
+from app.api.routes import auth, payment_orders, bank_accounts, credit_cards, people, transactions, debts, checks, ai_services, reports, income, notifications, dashboard, income_records, employees, system
 from app.core.config import settings
-from app.core.database import connect_to_mongo, close_mongo_connection
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.services.ledger_rollups import ensure_ledger_rollups
+from app.services.ai_service import ai_service
+from app.services.ai_jobs import ai_job_queue
+from app.services.report_jobs import report_job_runner
+from app.services.notification_delivery import notification_delivery
+from app.core.scheduler import scheduler
+from app.services import scheduled_jobs  # noqa: F401  (görevleri zamanlayıcıya kaydeder)
+from app.services.pdf_ingest import pdf_ingestor
+from app.services.report_export import report_exporter
 
 app = FastAPI(
     title="Muhasebe Yönetim Sistemi API",
@@ -27,6 +37,7 @@ app.add_middleware(
     allow_credentials=True,  # Now we can use credentials with specific origins
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Static files for uploads
@@ -49,14 +60,44 @@ app.include_router(notifications.router, prefix="/notifications", tags=["notific
 app.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
 app.include_router(income_records.router, prefix="/income-records", tags=["income-records"])
 app.include_router(employees.router, prefix="/employees", tags=["employees"])
+app.include_router(system.router, prefix="/system", tags=["system"])
 
 @app.on_event("startup")
 async def startup_event():
     await connect_to_mongo()
+    # Özet koleksiyonu boşsa (ilk kurulum / eski veri) bir kez oluştur
+    try:
+        await ensure_ledger_rollups(get_database())
+    except Exception as e:
+        print(f"Ledger rollups could not be prepared: {e}")
+    # AI iş worker'larını başlat, bekleyen işleri kuyruğa geri al
+    try:
+        await ai_job_queue.start(get_database())
+    except Exception as e:
+        print(f"AI job queue could not be started: {e}")
+    # Önceki süreçte yarım kalan rapor işleri
+    try:
+        await report_job_runner.start(get_database())
+    except Exception as e:
+        print(f"Report jobs could not be started: {e}")
+    # Bildirim kanal worker'ları (outbox'ta bekleyenler dahil)
+    try:
+        await notification_delivery.start(get_database())
+    except Exception as e:
+        print(f"Notification delivery could not be started: {e}")
+    # Periyodik bakım görevleri (her çalıştırmayı tek bir worker yapar)
+    scheduler.start(get_database())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await ai_job_queue.stop()
+    await report_job_runner.stop()
+    await scheduler.stop()
+    await notification_delivery.stop()
     await close_mongo_connection()
+    ai_service.shutdown()
+    pdf_ingestor.shutdown()
+    report_exporter.shutdown()
 
 @app.get("/")
 async def root():
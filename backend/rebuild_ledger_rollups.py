@@ -0,0 +1,22 @@
+"""
+Ledger rollup rebuild script
+Recomputes the ledger_rollups collection from completed transactions
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.services.ledger_rollups import rebuild_ledger_rollups
+
+async def rebuild():
+    """Rebuild daily ledger rollups"""
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db = client[settings.database_name]
+    
+    print("Ledger rollups yeniden oluşturuluyor...")
+    bucket_count = await rebuild_ledger_rollups(db)
+    print(f"Tamamlandı: {bucket_count} günlük özet kovası yazıldı")
+    
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
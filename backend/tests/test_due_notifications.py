@@ -0,0 +1,39 @@
+"""
+Vade bildirimi yardımcılarının testleri
+"""
+from datetime import date
+
+import pytest
+
+from app.services.due_notifications import _format_amount, next_day_of_month
+
+
+@pytest.mark.parametrize("day, from_date, expected", [
+    # Bugün dahil
+    (15, date(2024, 3, 15), date(2024, 3, 15)),
+    (20, date(2024, 3, 15), date(2024, 3, 20)),
+    # Geçtiyse sonraki ay
+    (10, date(2024, 3, 15), date(2024, 4, 10)),
+    # Yıl sonu
+    (5, date(2024, 12, 20), date(2025, 1, 5)),
+    # Kısa aylarda ayın son günü
+    (31, date(2024, 4, 1), date(2024, 4, 30)),
+    (31, date(2024, 2, 10), date(2024, 2, 29)),
+    (30, date(2023, 2, 10), date(2023, 2, 28)),
+    (31, date(2024, 1, 31), date(2024, 1, 31)),
+    # Kısaltılmış son gün bugünse bugün
+    (30, date(2024, 2, 29), date(2024, 2, 29)),
+    (1, date(2024, 1, 31), date(2024, 2, 1)),
+])
+def test_next_day_of_month(day, from_date, expected):
+    assert next_day_of_month(day, from_date) == expected
+
+
+@pytest.mark.parametrize("amount, currency, expected", [
+    (1500.5, "TRY", "1.500,50 TL"),
+    (0, "TRY", "0,00 TL"),
+    (1234567.891, "USD", "1.234.567,89 USD"),
+    (999.999, "EUR", "1.000,00 EUR"),
+])
+def test_format_amount(amount, currency, expected):
+    assert _format_amount(amount, currency) == expected
@@ -0,0 +1,81 @@
+"""
+Bildirim teslimatı yardımcılarının testleri (geri çekilme, kilit süresi, transport)
+"""
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.models.notification import NotificationChannel
+from app.services import notification_delivery
+from app.services.notification_delivery import (
+    MemoryTransport,
+    NotificationTransport,
+    lock_seconds,
+    retry_delay,
+)
+
+
+@pytest.fixture
+def timings(monkeypatch):
+    monkeypatch.setattr(settings, "notification_retry_base_seconds", 30.0)
+    monkeypatch.setattr(settings, "notification_retry_max_seconds", 3600.0)
+    monkeypatch.setattr(settings, "notification_send_timeout_seconds", 10.0)
+
+
+@pytest.mark.parametrize("attempts, base", [
+    (1, 30.0),
+    (2, 60.0),
+    (3, 120.0),
+    (7, 1920.0),
+    # Üst sınır
+    (8, 3600.0),
+    (20, 3600.0),
+])
+def test_retry_delay(timings, monkeypatch, attempts, base):
+    # Jitter sınırları: ±%20
+    monkeypatch.setattr(notification_delivery.random, "uniform", lambda low, high: low)
+    assert retry_delay(attempts) == pytest.approx(base * 0.8)
+    monkeypatch.setattr(notification_delivery.random, "uniform", lambda low, high: high)
+    assert retry_delay(attempts) == pytest.approx(base * 1.2)
+
+
+@pytest.mark.parametrize("batch_size, concurrency, expected", [
+    # Tek dalga + bir zaman aşımı payı
+    (10, 10, 20.0),
+    (1, 10, 20.0),
+    (11, 10, 30.0),
+    (100, 10, 110.0),
+    (50, 1, 510.0),
+    # Eşzamanlılık 0 verilse de bölme hatası olmaz
+    (3, 0, 40.0),
+])
+def test_lock_seconds(timings, batch_size, concurrency, expected):
+    assert lock_seconds(batch_size, concurrency) == expected
+
+
+def test_transport_without_send_fails_on_construction():
+    class Incomplete(NotificationTransport):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete(NotificationChannel.EMAIL)
+
+
+def test_send_batch_reports_errors_per_notification(timings, monkeypatch):
+    monkeypatch.setattr(settings, "notification_send_timeout_seconds", 0.05)
+
+    class Flaky(MemoryTransport):
+        async def send(self, notification):
+            if notification["title"] == "slow":
+                await asyncio.sleep(1)
+            if notification["title"] == "bad":
+                raise ConnectionError("bağlantı koptu")
+            await super().send(notification)
+
+    transport = Flaky(NotificationChannel.SMS, concurrency=2)
+    results = asyncio.run(transport.send_batch([{"title": "ok"}, {"title": "bad"}, {"title": "slow"}]))
+    assert results[0] is None
+    assert results[1] == "bağlantı koptu"
+    assert "saniyede yanıt alınamadı" in results[2]
+    assert [item["title"] for item in transport.sent] == ["ok"]
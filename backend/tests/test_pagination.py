@@ -0,0 +1,150 @@
+"""
+İmleç (keyset) sayfalama testleri
+
+keyset_filter'ın ürettiği filtre, MongoDB'nin sıralama ve karşılaştırma
+kurallarını (null / eksik değer en küçük, $lt / $gt null ile eşleşmez)
+taklit eden küçük bir eşleştiriciyle bellekteki dokümanlar üzerinde
+sayfa sayfa yürütülür; her dokümanın tam bir kez ve sırasıyla gelmesi
+beklenir.
+"""
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.core.pagination import decode_cursor, encode_cursor, keyset_filter
+
+FIELD = "due_date"
+START = datetime(2024, 1, 1)
+
+
+def _value_matches(value, condition) -> bool:
+    if isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+        for op, operand in condition.items():
+            if op == "$ne":
+                if value == operand:
+                    return False
+            elif op in ("$lt", "$gt"):
+                # MongoDB'de aralık karşılaştırması null / eksik değerle eşleşmez
+                if value is None:
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$gt" and not value > operand:
+                    return False
+            else:
+                raise AssertionError(f"Desteklenmeyen operatör: {op}")
+        return True
+    return value == condition
+
+
+def matches(doc, query) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, branch) for branch in condition):
+                return False
+        elif not _value_matches(doc.get(key), condition):
+            return False
+    return True
+
+
+def sort_key(doc):
+    # null / eksik değerler her türlü değerden küçük sıralanır
+    value = doc.get(FIELD)
+    return (value is not None, value or START, doc["_id"])
+
+
+def walk(docs, direction: int, limit: int):
+    """Tüm sayfaları imleçle gez, okunan _id'leri sırasıyla döndür"""
+    ordered = sorted(docs, key=sort_key, reverse=direction < 0)
+    seen, cursor = [], None
+    while True:
+        page = [doc for doc in ordered if cursor is None or matches(doc, keyset_filter(FIELD, direction, cursor))]
+        has_more = len(page) > limit
+        page = page[:limit]
+        seen.extend(doc["_id"] for doc in page)
+        if not has_more:
+            return seen, [doc["_id"] for doc in ordered]
+        cursor = encode_cursor(page[-1], FIELD)
+
+
+@pytest.fixture
+def docs():
+    items = []
+    for index in range(23):
+        doc = {"_id": ObjectId()}
+        if index % 5 == 0:
+            doc[FIELD] = None
+        elif index % 7 == 0:
+            pass  # alan hiç yok
+        else:
+            # Tekrarlayan değerler _id ile sıralanmalı
+            doc[FIELD] = START + timedelta(days=index % 4)
+        items.append(doc)
+    return items
+
+
+@pytest.mark.parametrize("direction", [1, -1], ids=["asc", "desc"])
+@pytest.mark.parametrize("limit", [1, 3, 10])
+def test_walk_reaches_every_document_once_in_order(docs, direction, limit):
+    seen, expected = walk(docs, direction, limit)
+    assert seen == expected
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    cursor = encode_cursor({"_id": oid, FIELD: START}, FIELD)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (START, oid)
+    # Alan eksikse null imleç
+    assert decode_cursor(encode_cursor({"_id": str(oid)}, FIELD)) == (None, oid)
+
+
+@pytest.mark.parametrize("direction, op", [(1, "$gt"), (-1, "$lt")])
+def test_filter_for_non_null_cursor(direction, op):
+    oid = ObjectId()
+    query = keyset_filter(FIELD, direction, encode_cursor({"_id": oid, FIELD: START}, FIELD))
+    branches = [{FIELD: {op: START}}, {FIELD: START, "_id": {op: oid}}]
+    if direction < 0:
+        # Azalan sırada null / eksik değerler henüz okunmamıştır
+        branches.append({FIELD: None})
+    assert query == {"$or": branches}
+
+
+def test_filter_for_null_cursor():
+    oid = ObjectId()
+    cursor = encode_cursor({"_id": oid, FIELD: None}, FIELD)
+    # Artan sırada null'lar önce gelir: kalan null'lar ve tüm null olmayanlar
+    assert keyset_filter(FIELD, 1, cursor) == {
+        "$or": [{FIELD: None, "_id": {"$gt": oid}}, {FIELD: {"$ne": None}}]
+    }
+    # Azalan sırada null'lar en sondadır: yalnızca kalan null'lar
+    assert keyset_filter(FIELD, -1, cursor) == {FIELD: None, "_id": {"$lt": oid}}
+
+
+def test_null_rows_after_non_null_cursor_in_descending_order():
+    dated = [{"_id": ObjectId(), FIELD: START + timedelta(days=day)} for day in range(3)]
+    missing = [{"_id": ObjectId(), FIELD: None}, {"_id": ObjectId()}]
+    last_dated = min(dated, key=sort_key)
+    query = keyset_filter(FIELD, -1, encode_cursor(last_dated, FIELD))
+    assert [doc["_id"] for doc in dated + missing if matches(doc, query)] == [doc["_id"] for doc in missing]
+
+
+def _b64(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+@pytest.mark.parametrize("cursor", [
+    "!!!",
+    "a",
+    _b64("not json"),
+    _b64('{"v": 1}'),
+    _b64('{"v": 1, "id": "not-an-object-id"}'),
+    _b64("[1, 2]"),
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        keyset_filter(FIELD, -1, cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,206 @@
+"""
+Kural tabanlı dekont ayrıştırıcı testleri
+
+Her banka şablonu için örnek dekont metni; tutar biçimleri, IBAN mod-97
+kontrolü, gönderen / alıcı IBAN ataması ve güven eşiği.
+
+Çalıştırma (backend dizininde):
+    python -m pytest tests
+"""
+from datetime import datetime
+
+import pytest
+
+from app.core.config import settings
+from app.services.receipt_parser import (
+    BANK_TEMPLATES,
+    BankTemplate,
+    ReceiptParser,
+    _fold,
+    is_valid_iban,
+    parse_amount,
+)
+
+
+def make_iban(bank_code: str, account: str) -> str:
+    """Geçerli kontrol haneli TR IBAN üret (bank_code 5, account 16 hane)"""
+    bban = f"{bank_code}0{account}"
+    digits = "".join(str(int(char, 36)) for char in f"{bban}TR00")
+    return f"TR{98 - int(digits) % 97:02d}{bban}"
+
+
+def spaced(iban: str) -> str:
+    return " ".join(iban[i:i + 4] for i in range(0, len(iban), 4))
+
+
+def template_labels(template, field: str, default: str) -> str:
+    """Şablona özgü etiket varsa onu, yoksa ortak etiketi kullan"""
+    return template.labels.get(field, (default,))[0]
+
+
+def sample_receipt(template, sender_iban: str, recipient_iban: str) -> str:
+    return "\n".join([
+        f"{template.markers[0].title()} A.Ş.",
+        "EFT GİDEN DEKONTU",
+        "İşlem Tarihi: 14.03.2024 10:42",
+        f"{template_labels(template, 'reference', 'REFERANS NO')}: 20240314ABC123",
+        "Gönderen: Örnek Ticaret Ltd. Şti.",
+        f"Gönderen IBAN: {spaced(sender_iban)}",
+        f"{template_labels(template, 'recipient_name', 'ALICI ADI')}: Çelik Yapı İnşaat",
+        f"{template_labels(template, 'recipient_iban', 'ALICI IBAN')}: {spaced(recipient_iban)}",
+        f"{template_labels(template, 'amount', 'İŞLEM TUTARI')}: 12.345,67 TL",
+        "EFT Ücreti: 5,50 TL",
+        "BSMV: 0,28 TL",
+        "Açıklama: Mart ayı faturası",
+    ])
+
+
+@pytest.fixture
+def parser():
+    return ReceiptParser()
+
+
+@pytest.mark.parametrize("template", BANK_TEMPLATES, ids=lambda template: template.name)
+def test_bank_templates(parser, template):
+    sender = make_iban(template.iban_bank_code, "1234567890123456")
+    recipient = make_iban("00062", "7654321098765432")
+    result = parser.parse(sample_receipt(template, sender, recipient))
+
+    assert result["success"] is True
+    assert result["bank_template"] in {t.name for t in BANK_TEMPLATES if t.iban_bank_code == template.iban_bank_code}
+    assert result["transaction_details"]["amount"] == 12345.67
+    assert result["transaction_details"]["currency"] == "TRY"
+    assert result["transaction_details"]["date"] == "2024-03-14"
+    assert result["transaction_details"]["time"] == "10:42:00"
+    assert result["transaction_details"]["reference_number"] == "20240314ABC123"
+    assert result["sender_account"]["iban"] == sender
+    assert result["recipient_info"]["iban"] == recipient
+    assert result["recipient_info"]["name"] == "Çelik Yapı İnşaat"
+    assert result["fees_and_charges"]["total_fees"] == 5.78
+    assert result["amount_breakdown"]["net_deducted"] == 12351.45
+    assert result["transaction_type"] == "EFT"
+    assert result["confidence_score"] == 1.0
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1.500,00 TL", (1500.0, "TRY")),
+    ("1,500.00 USD", (1500.0, "USD")),
+    ("1.500", (1500.0, None)),
+    ("1,500", (1500.0, None)),
+    ("15.000.000,25 ₺", (15000000.25, "TRY")),
+    ("1500,5 EUR", (1500.5, "EUR")),
+    ("1500.50", (1500.5, None)),
+    ("-250,00 TRY", (250.0, "TRY")),
+    ("tutar yok", None),
+])
+def test_parse_amount_formats(text, expected):
+    assert parse_amount(text) == expected
+
+
+def test_iban_mod97():
+    iban = make_iban("00010", "1234567890123456")
+    assert is_valid_iban(iban)
+    # Tek hane değişince kontrol tutmaz
+    broken = iban[:-1] + str((int(iban[-1]) + 1) % 10)
+    assert not is_valid_iban(broken)
+    assert not is_valid_iban(iban[:-1])
+    assert not is_valid_iban("DE" + iban[2:])
+
+
+def test_invalid_iban_is_not_assigned(parser):
+    sender = make_iban("00010", "1234567890123456")
+    recipient = make_iban("00062", "7654321098765432")
+    broken = recipient[:-1] + str((int(recipient[-1]) + 1) % 10)
+    text = "\n".join([
+        "ZIRAAT BANKASI",
+        f"Gönderen IBAN: {sender}",
+        f"Alıcı IBAN: {broken}",
+        "İşlem Tutarı: 100,00 TL",
+    ])
+    result = parser.parse(text)
+    assert result["sender_account"]["iban"] == sender
+    assert "iban" not in result["recipient_info"]
+
+
+def test_unlabeled_ibans_assigned_in_order(parser):
+    # Etiketsiz IBAN'larda ilki gönderen, sonuncusu alıcı sayılır
+    sender = make_iban("00046", "1111111111111111")
+    recipient = make_iban("00064", "2222222222222222")
+    text = "\n".join([
+        "AKBANK",
+        spaced(sender),
+        spaced(recipient),
+        "Tutar: 250,00 TL",
+    ])
+    result = parser.parse(text)
+    assert result["sender_account"]["iban"] == sender
+    assert result["recipient_info"]["iban"] == recipient
+
+
+def test_labeled_recipient_iban_wins_over_order(parser):
+    sender = make_iban("00046", "1111111111111111")
+    recipient = make_iban("00064", "2222222222222222")
+    text = "\n".join([
+        "AKBANK",
+        f"Alıcı IBAN: {recipient}",
+        f"Hesap IBAN: {sender}",
+        "Tutar: 250,00 TL",
+    ])
+    result = parser.parse(text)
+    assert result["sender_account"]["iban"] == sender
+    assert result["recipient_info"]["iban"] == recipient
+
+
+def test_value_on_next_line(parser):
+    text = "AKBANK\nAlıcı Adı:\nŞükrü Öztürk\nTutar:\n1.250,00 TL"
+    result = parser.parse(text)
+    assert result["recipient_info"]["name"] == "Şükrü Öztürk"
+    assert result["transaction_details"]["amount"] == 1250.0
+
+
+def test_value_offset_with_length_changing_characters(parser):
+    # "ß".upper() == "SS"; değer orijinal satırdan kaymadan alınmalı
+    assert len(_fold("Straße")) == len("Straße")
+    text = "AKBANK\nAlıcı Adı: Weiß GmbH Straße\nTutar: 10,00 TL"
+    result = parser.parse(text)
+    assert result["recipient_info"]["name"] == "Weiß GmbH Straße"
+
+
+def test_confidence_threshold(parser, monkeypatch):
+    monkeypatch.setattr(settings, "receipt_parser_min_confidence", 0.8)
+    sender = make_iban("00010", "1234567890123456")
+    recipient = make_iban("00062", "7654321098765432")
+    full = sample_receipt(BANK_TEMPLATES[0], sender, recipient)
+    assert parser.parse_if_confident(full) is not None
+
+    # Yalnızca tutar ve tarih: 0.35 + 0.2 = 0.55 < 0.8, modele gidilir
+    partial = "Tutar: 100,00 TL\nTarih: 01.02.2024"
+    result = parser.parse(partial)
+    assert result["success"] is True
+    assert result["confidence_score"] == 0.55
+    assert set(result["missing_fields"]) == {"recipient", "reference", "bank"}
+    assert parser.parse_if_confident(partial) is None
+
+    # Tutar yoksa güven ne olursa olsun kabul edilmez
+    no_amount = full.replace("12.345,67 TL", "")
+    assert parser.parse(no_amount)["success"] is False
+    assert parser.parse_if_confident(no_amount) is None
+    assert parser.stats() == {"parsed": 5, "accepted": 1, "fallback": 2}
+
+
+def test_iso_date_fallback(parser):
+    result = parser.parse("AKBANK\nTutar: 10,00 TL\n2024-05-06T08:15:00")
+    assert result["transaction_details"]["date"] == datetime(2024, 5, 6).date().isoformat()
+    assert result["transaction_details"]["time"] == "08:15:00"
+
+
+def test_options_change_with_threshold_and_templates(parser, monkeypatch):
+    # Önbellek anahtarına girer; eşik veya şablon değişince farklı olmalı
+    options = parser.options()
+    assert options == ReceiptParser().options()
+
+    extended = ReceiptParser(BANK_TEMPLATES + (BankTemplate("Örnek Bank", ("ORNEK BANK",), "00999"),))
+    assert extended.options() != options
+
+    monkeypatch.setattr(settings, "receipt_parser_min_confidence", 0.9)
+    assert parser.options() != options
@@ -0,0 +1,132 @@
+"""
+Ay ay rapor üretimi yardımcılarının testleri (parçalama ve birleştirme)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.routes.reports import _merge_report_data, _month_chunks
+from app.models.report import (
+    BankAccountSummaryData,
+    CashFlowReportData,
+    IncomeExpenseReportData,
+    PaymentMethodAnalysisData,
+    PersonSummaryData,
+    ReportData,
+)
+
+MS = timedelta(milliseconds=1)
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    # Tek ay içinde: uçlar aynen korunur
+    (datetime(2024, 3, 5, 10), datetime(2024, 3, 20, 18), [
+        (datetime(2024, 3, 5, 10), datetime(2024, 3, 20, 18)),
+    ]),
+    # Ay sınırını geçen aralık; ara aylar tam, son an milisaniye hassasiyetinde
+    (datetime(2024, 1, 15), datetime(2024, 3, 10), [
+        (datetime(2024, 1, 15), datetime(2024, 2, 1) - MS),
+        (datetime(2024, 2, 1), datetime(2024, 3, 1) - MS),
+        (datetime(2024, 3, 1), datetime(2024, 3, 10)),
+    ]),
+    # Yıl sonu
+    (datetime(2023, 12, 31, 23), datetime(2024, 1, 1, 1), [
+        (datetime(2023, 12, 31, 23), datetime(2024, 1, 1) - MS),
+        (datetime(2024, 1, 1), datetime(2024, 1, 1, 1)),
+    ]),
+    # Bitiş tam ay başıysa son parça tek an
+    (datetime(2024, 2, 1), datetime(2024, 3, 1), [
+        (datetime(2024, 2, 1), datetime(2024, 3, 1) - MS),
+        (datetime(2024, 3, 1), datetime(2024, 3, 1)),
+    ]),
+    (datetime(2024, 3, 1), datetime(2024, 3, 1), [
+        (datetime(2024, 3, 1), datetime(2024, 3, 1)),
+    ]),
+    (datetime(2024, 3, 2), datetime(2024, 3, 1), []),
+])
+def test_month_chunks(start, end, expected):
+    assert _month_chunks(start, end) == expected
+
+
+def test_month_chunks_cover_range_without_gaps():
+    chunks = _month_chunks(datetime(2023, 1, 31, 12), datetime(2025, 2, 28, 23, 59))
+    assert len(chunks) == 26
+    assert chunks[0][0] == datetime(2023, 1, 31, 12)
+    assert chunks[-1][1] == datetime(2025, 2, 28, 23, 59)
+    for (_, previous_end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert next_start - previous_end == MS
+        assert next_start.day == 1
+
+
+def _chunk(month: int, income: float, expense: float) -> ReportData:
+    return ReportData(
+        income_expense=IncomeExpenseReportData(
+            total_income=income,
+            total_expense=expense,
+            net_profit=income - expense,
+            transaction_count=2,
+            income_by_month=[{"month": f"2024-{month:02d}", "amount": income}],
+            expense_by_month=[{"month": f"2024-{month:02d}", "amount": expense}],
+        ),
+        cash_flow=CashFlowReportData(total_inflow=income, total_outflow=expense, net_cash_flow=income - expense),
+        bank_accounts=[
+            BankAccountSummaryData(
+                account_id="a1", account_name="Ana", currency="TRY",
+                total_income=income, total_expense=expense, transaction_count=2,
+                closing_balance=1000.0 + month
+            )
+        ],
+        people=[
+            PersonSummaryData(
+                person_id="p1", person_name="Ali", person_type="individual",
+                total_sent=expense, total_received=income, net_balance=income - expense,
+                transaction_count=2, last_transaction_date=datetime(2024, month, 10)
+            )
+        ],
+        payment_methods=[
+            PaymentMethodAnalysisData(method="eft", transaction_count=1, total_amount=expense),
+            PaymentMethodAnalysisData(method=f"m{month}", transaction_count=1, total_amount=income),
+        ],
+    )
+
+
+def test_merge_report_data_accumulates_chunks():
+    total = ReportData()
+    for month, (income, expense) in enumerate([(100.0, 40.0), (300.0, 60.0)], 1):
+        _merge_report_data(total, _chunk(month, income, expense))
+
+    assert total.income_expense.total_income == 400.0
+    assert total.income_expense.total_expense == 100.0
+    assert total.income_expense.net_profit == 300.0
+    assert total.income_expense.transaction_count == 4
+    assert [row["month"] for row in total.income_expense.income_by_month] == ["2024-01", "2024-02"]
+
+    assert total.cash_flow.net_cash_flow == 300.0
+
+    [account] = total.bank_accounts
+    assert (account.total_income, account.total_expense, account.transaction_count) == (400.0, 100.0, 4)
+    # Kapanış bakiyesi son parçadan
+    assert account.closing_balance == 1002.0
+
+    [person] = total.people
+    assert (person.total_sent, person.total_received, person.net_balance) == (100.0, 400.0, 300.0)
+    assert person.last_transaction_date == datetime(2024, 2, 10)
+
+    methods = {method.method: method for method in total.payment_methods}
+    assert methods["eft"].total_amount == 100.0
+    assert methods["eft"].transaction_count == 2
+    assert methods["eft"].average_amount == 50.0
+    # Yüzdeler birleşik toplamdan: 100 + 100 + 300 = 500
+    assert methods["eft"].percentage == 20.0
+    assert methods["m2"].percentage == 60.0
+    # Toplam tutara göre azalan
+    assert total.payment_methods[0].method == "m2"
+
+
+def test_merge_report_data_skips_missing_sections():
+    total = ReportData()
+    _merge_report_data(total, ReportData(cash_flow=CashFlowReportData(total_inflow=5.0)))
+    assert total.income_expense is None
+    assert total.bank_accounts is None
+    assert total.cash_flow.total_inflow == 5.0
+    assert total.cash_flow.net_cash_flow == 5.0
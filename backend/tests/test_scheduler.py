@@ -0,0 +1,78 @@
+"""
+Cron ifadesi ayrıştırma ve sonraki çalıştırma zamanı testleri
+"""
+from datetime import datetime
+
+import pytest
+
+from app.core.scheduler import CronSchedule, _parse_cron_field
+
+
+@pytest.mark.parametrize("field, low, high, expected", [
+    ("*", 0, 6, set(range(0, 7))),
+    ("5", 0, 59, {5}),
+    ("1,15,30", 1, 31, {1, 15, 30}),
+    ("1-5", 0, 7, {1, 2, 3, 4, 5}),
+    ("*/15", 0, 59, {0, 15, 30, 45}),
+    ("10-20/5", 0, 59, {10, 15, 20}),
+    # Tek değer + adım: değerden alanın sonuna kadar
+    ("5/20", 0, 59, {5, 25, 45}),
+    ("0,30-32,*/20", 0, 59, {0, 20, 30, 31, 32, 40}),
+])
+def test_parse_cron_field(field, low, high, expected):
+    assert _parse_cron_field(field, low, high) == expected
+
+
+@pytest.mark.parametrize("field, low, high", [
+    ("60", 0, 59),
+    ("0", 1, 31),
+    ("5-1", 0, 59),
+    ("*/0", 0, 59),
+    ("a", 0, 59),
+    ("", 0, 59),
+    ("1-2-3", 0, 59),
+])
+def test_parse_cron_field_rejects_invalid(field, low, high):
+    with pytest.raises(ValueError):
+        _parse_cron_field(field, low, high)
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "* * * * * *", "0 24 * * *", "0 0 * 13 *", "0 0 * * 8"])
+def test_invalid_expression(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+@pytest.mark.parametrize("expression, moment, expected", [
+    # Her 15 dakika; saniyeler yok sayılır, tam eşleşen an "sonra" değildir
+    ("*/15 * * * *", datetime(2024, 3, 14, 10, 7, 30), datetime(2024, 3, 14, 10, 15)),
+    ("*/15 * * * *", datetime(2024, 3, 14, 10, 15), datetime(2024, 3, 14, 10, 30)),
+    ("*/15 * * * *", datetime(2024, 3, 14, 23, 50), datetime(2024, 3, 15, 0, 0)),
+    # Hafta içi 03:00 (cuma sonrası pazartesi)
+    ("0 3 * * 1-5", datetime(2024, 3, 15, 4, 0), datetime(2024, 3, 18, 3, 0)),
+    ("0 3 * * 1-5", datetime(2024, 3, 18, 2, 59), datetime(2024, 3, 18, 3, 0)),
+    # Ayın 1'i ve 15'i
+    ("30 8 1,15 * *", datetime(2024, 3, 1, 8, 30), datetime(2024, 3, 15, 8, 30)),
+    ("30 8 1,15 * *", datetime(2024, 3, 15, 9, 0), datetime(2024, 4, 1, 8, 30)),
+    # Pazar: 0 ve 7 aynı gün
+    ("0 0 * * 0", datetime(2024, 3, 14), datetime(2024, 3, 17)),
+    ("0 0 * * 7", datetime(2024, 3, 14), datetime(2024, 3, 17)),
+    # Gün ve haftanın günü birlikte kısıtlıysa "veya": 13'ü ya da cuma
+    ("0 0 13 * 5", datetime(2024, 9, 1), datetime(2024, 9, 6)),
+    ("0 0 13 * 5", datetime(2024, 9, 7), datetime(2024, 9, 13)),
+    # "*" ile başlayan alan kısıtsız sayılır: çift günlerden pazartesi olanı ("ve")
+    ("0 0 */2 * 1", datetime(2024, 3, 1), datetime(2024, 3, 11)),
+    # Ay sınırı ve artık yıl
+    ("0 0 31 * *", datetime(2024, 4, 1), datetime(2024, 5, 31)),
+    ("0 0 29 2 *", datetime(2024, 3, 1), datetime(2028, 2, 29)),
+    ("59 23 31 12 *", datetime(2024, 12, 31, 23, 59), datetime(2025, 12, 31, 23, 59)),
+    # Gece yarısını geçen saat listesi
+    ("0 22,2 * * *", datetime(2024, 3, 14, 22, 30), datetime(2024, 3, 15, 2, 0)),
+])
+def test_next_after(expression, moment, expected):
+    assert CronSchedule(expression).next_after(moment) == expected
+
+
+def test_never_matching_expression():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 31 2 *").next_after(datetime(2024, 1, 1))